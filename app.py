@@ -2,22 +2,43 @@
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="numpy")
 
+import json
 import streamlit as st
 # from etl_utils.ui import render_db_ui, display_schema_preview, editable_code_section
-from modules.ui import render_db_ui, display_schema_preview, editable_code_section
-from modules.generator import generate_etl_code
-from modules.executor import run_etl_script_remote_password
+from modules.ui import render_db_ui, display_schema_preview, editable_code_section, display_jobs, display_plan, display_dry_run
+from modules.generator import stream_etl_code, generate_transform_plan, code_cache
+from modules.codecache import fill_credentials
+from modules.transform import make_transform
+from modules.transfer import transfer_table
+from modules.extractor import DEFAULT_BATCH_SIZE
+from modules.checkpoint import run_checkpointed
+from modules.incremental import run_incremental
+from modules.parallel import plan_partitions, run_parallel_transfer
+from modules.planner import plan_transfer
+from modules.dryrun import dry_run, code_fingerprint, DRY_RUN_ROWS
+from modules.flatten import compile_plan, create_tables_sql, transfer_flattened
+from modules.migrate import MIGRATE_CONCURRENCY, plan_migration, run_migration
 # app.py
-from modules.validator import validate_and_fetch_schema
+from modules.validator import check_connection, validate_and_fetch_schema, validate_pair, invalidate_schema_cache
+from modules.typemap import create_table
 from modules.validator import validate_db_connection
-from modules.executor import run_etl_script 
+from modules.executor import warm_worker_pool
+from modules.connectors import connector_names
+from modules.metrics import RunMetrics
+from modules.upsert import ROW_HASH_COLUMN
+from modules.jobs import JOB_TIMEOUT, get_job_manager, partitioned_script_job, script_job
+
+# start the pre-warmed script workers in the background rather than on the first run
+warm_worker_pool()
+# shared by every browser session, so jobs survive reruns and page reloads
+job_manager = get_job_manager()
 
 # app.py
 st.set_page_config(page_title=" Smart ETL", layout="wide")
 st.title("🔁Smart ETL Workflow")
 
 # --- Step 1: Select Source and Target DB Types ---
-db_types = ["PostgreSQL", "MySQL", "MSSQL", "MongoDB", "SQLite"]
+db_types = connector_names()
 
 col1, col2 = st.columns(2)
 with col1:
@@ -31,9 +52,15 @@ with col2:
     target_creds = render_db_ui("Target", target_type)
 
 # --- Step 2: Validate connections and preview schema ---
-if st.button("🔍 Validate and Preview Schema"):
-    src_status, src_preview ,src_schema = validate_and_fetch_schema(source_type, source_creds)
-    tgt_status, tgt_preview , tgt_schema = validate_and_fetch_schema(target_type, target_creds)
+# previews are cached (modules.validator.schema_cache); refresh re-reads the catalogs
+b1, b2 = st.columns([1, 4])
+with b1:
+    validate_clicked = st.button("🔍 Validate and Preview Schema")
+with b2:
+    refresh_clicked = st.button("🔄 Refresh Schema")
+if validate_clicked or refresh_clicked:
+    (src_status, src_preview ,src_schema), (tgt_status, tgt_preview , tgt_schema) = validate_pair(
+        source_type, source_creds, target_type, target_creds, refresh=refresh_clicked)
     #print(tgt_preview,tgt_status)
     print(source_type,source_creds,target_type,target_creds)
     if tgt_preview ==[]:
@@ -45,6 +72,11 @@ if st.button("🔍 Validate and Preview Schema"):
             display_schema_preview("Source", src_preview, src_schema,"green")
         with col4:
             display_schema_preview("Target", tgt_preview, tgt_schema,"orange")
+        # catalog statistics only, so planning stays as cheap as the preview
+        try:
+            display_plan(plan_transfer(source_type, source_creds, target_type, target_creds, schema=src_schema))
+        except Exception as e:
+            st.warning(f"Could not estimate the transfer: {e}")
     else:
         st.error("❌ Connection failed. Please check credentials.")
 
@@ -53,32 +85,283 @@ if st.button("🔍 Validate and Preview Schema"):
 st.subheader("🛠️ Describe Transformations")
 transformations = st.text_area("What changes should be made to the data?", placeholder="e.g., Change column 'created_at' format, drop rows where salary is null...")
     
+bypass_code_cache = st.checkbox("Bypass generated-code cache", value=False)
+
 if st.button("🧠 Generate ETL Code"):
-    src_status, src_preview ,src_schema = validate_and_fetch_schema(source_type, source_creds)
-    tgt_status, tgt_preview , tgt_schema = validate_and_fetch_schema(target_type, target_creds)
-    etl_code = generate_etl_code(source_type, source_creds, target_type, target_creds, transformations, src_preview, tgt_preview,src_schema,tgt_schema)
-    st.session_state["etl_code"] = etl_code
+    # served from the schema cache when the databases were just validated
+    (src_status, src_preview ,src_schema), (tgt_status, tgt_preview , tgt_schema) = validate_pair(
+        source_type, source_creds, target_type, target_creds)
+    # consumed by the editor below, which shows the script while the model writes it
+    pending_code = stream_etl_code(source_type, source_creds, target_type, target_creds, transformations, src_preview, tgt_preview,src_schema,tgt_schema, use_cache=not bypass_code_cache)
+else:
+    pending_code = None
+
+# --- Alternative: declarative transform plan run by the built-in engine ---
+with st.expander("🧮 Transform plan (built-in vectorized engine)"):
+    if st.button("🧠 Generate Transform Plan"):
+        src_status, src_preview, src_schema = validate_and_fetch_schema(source_type, source_creds)
+        try:
+            plan = generate_transform_plan(transformations, src_schema, source_type)
+            st.session_state["transform_plan"] = json.dumps(plan, indent=2)
+        except ValueError as e:
+            st.error(f"❌ The generated plan is invalid: {e}")
+    plan_text = st.text_area("Transform plan (JSON)", value=st.session_state.get("transform_plan", "[]"), height=250)
+    defer_indexes = st.checkbox("Drop secondary indexes during the load and rebuild them afterwards", value=False)
+    # checkpointed runs commit every batch and pick up after the last one if interrupted
+    checkpoint_key = st.text_input("Resume key (unique column, optional)", placeholder="e.g. id")
+    restart_checkpoint = st.checkbox("Restart from scratch (forget the interrupted run's checkpoint)", value=False)
+    # incremental runs copy only the rows above the last run's high watermark
+    incremental_key = st.text_input("Incremental key (ever-growing column, optional)", placeholder="e.g. updated_at")
+    # upserts update rows in place and skip the ones whose content didn't change
+    upsert_key = st.text_input("Upsert key (update existing rows by these columns, optional)", placeholder="e.g. id")
+    # comparing a stored hash is cheaper than comparing every column, but it alters the target
+    add_hash_column = bool(upsert_key.strip()) and st.checkbox(
+        f"Add a {ROW_HASH_COLUMN} column to the target to detect unchanged rows faster", value=False)
+    if add_hash_column:
+        st.warning(f"The target table gets a new {ROW_HASH_COLUMN} column if it doesn't have one yet.")
+    use_plan = st.checkbox("Let the planner choose batch size, parallelism and load strategy", value=True)
+    transfer_limit = st.number_input("Time limit in minutes (0 = none)", min_value=0, value=0, key="transfer_limit")
+    # subdocuments become columns and arrays become child tables, one batch at a time
+    flatten = source_type == "MongoDB" and target_type != "MongoDB" and st.checkbox(
+        "Flatten nested documents into columns and child tables", value=False)
+    if st.button("▶️ Run Built-in Transfer"):
+        try:
+            transform = make_transform(json.loads(plan_text or "[]"))
+        except ValueError as e:
+            # JSONDecodeError is a ValueError too
+            st.error(f"❌ The transform plan is invalid: {e}")
+            st.stop()
+        # each of these is its own load path; combined, all but one would be silently ignored.
+        # An upsert key goes with an incremental key, which then updates changed rows in place
+        modes = [label for label, chosen in (("flattening", flatten), ("a resume key", checkpoint_key.strip()),
+                                              ("an incremental key", incremental_key.strip()),
+                                              ("an upsert key", upsert_key.strip() and not incremental_key.strip()))
+                 if chosen]
+        if len(modes) > 1:
+            st.error(f"❌ Choose only one of {', '.join(modes)}.")
+            st.stop()
+        (src_status, src_preview, src_schema), (tgt_status, tgt_preview, tgt_schema) = validate_pair(
+            source_type, source_creds, target_type, target_creds)
+        if src_status.startswith("Error"):
+            st.error(f"❌ Source: {src_status}")
+            st.stop()
+        if tgt_status.startswith("Error"):
+            # a missing target table fails the preview too; only then is it created below
+            unreachable = check_connection(target_type, target_creds)
+            if unreachable:
+                st.error(f"❌ Target: {unreachable}")
+                st.stop()
+        if flatten:
+            # the job creates whichever of these tables are missing
+            st.code(";\n\n".join(create_tables_sql(compile_plan(src_schema, target_creds["table"]), target_type)),
+                    language="sql")
+            if transform is not None:
+                st.warning("The transform plan is not applied to flattened loads.")
+        elif tgt_preview == [] and not tgt_schema:
+            try:
+                ddl = create_table(target_type, target_creds, source_type, src_schema)
+            except Exception as e:
+                st.error(f"❌ Could not create the target table: {e}")
+                st.stop()
+            if ddl:
+                st.code(ddl, language="sql")
+                invalidate_schema_cache(target_type, target_creds)
+        transfer_plan = None
+        if use_plan:
+            try:
+                transfer_plan = plan_transfer(source_type, source_creds, target_type, target_creds,
+                                              schema=src_schema, checkpoint_key=checkpoint_key)
+            except Exception as e:
+                st.warning(f"Could not plan the transfer, running it with the defaults: {e}")
+            else:
+                display_plan(transfer_plan)
+
+        def builtin_transfer(job, source_type=source_type, source_creds=source_creds, target_type=target_type,
+                             target_creds=target_creds, checkpoint_key=checkpoint_key, restart_checkpoint=restart_checkpoint,
+                             incremental_key=incremental_key.strip(),
+                             defer_indexes=defer_indexes,
+                             transfer_plan=transfer_plan, flatten=flatten, src_schema=src_schema,
+                             upsert_key=[column.strip() for column in upsert_key.split(",") if column.strip()] or None,
+                             add_hash_column=add_hash_column):
+            batch_size, parallelism = DEFAULT_BATCH_SIZE, 1
+            if transfer_plan:
+                batch_size, parallelism = transfer_plan["batch_size"], transfer_plan["parallelism"]
+                if flatten or upsert_key or incremental_key:
+                    parallelism = 1
+                defer_indexes = defer_indexes or transfer_plan["defer_indexes"]
+                job.log(f"Plan: {transfer_plan['strategy']}, batches of {batch_size}, {parallelism} worker(s), "
+                        f"~{transfer_plan['predicted_seconds']:.0f} s, ~{transfer_plan['predicted_memory_mb']} MB")
+            metrics = RunMetrics(job_id=job.id, source_type=source_type, target_type=target_type,
+                                 mode="upsert" if upsert_key else "incremental" if incremental_key else "built-in",
+                                 parallelism=parallelism)
+            try:
+                if flatten:
+                    counts = transfer_flattened(source_creds, target_type, target_creds, schema=src_schema,
+                                                batch_size=batch_size, progress=job.progress, metrics=metrics)
+                    job.log("Rows per table: " + ", ".join(f"{table} {count}" for table, count in counts.items()))
+                    rows = counts[target_creds["table"]]
+                elif checkpoint_key:
+                    rows, checkpoint = run_checkpointed(source_type, source_creds, target_type, target_creds, checkpoint_key,
+                                                        transform, batch_size, progress=job.progress,
+                                                        restart=restart_checkpoint, metrics=metrics)
+                    job.log(f"Checkpoint: {checkpoint['rows']} rows in {checkpoint['batches']} batches, last key {checkpoint['last_key']}")
+                elif incremental_key:
+                    rows, watermark = run_incremental(source_type, source_creds, target_type, target_creds, incremental_key,
+                                                      transform, batch_size, progress=job.progress,
+                                                      upsert_key=upsert_key, add_hash_column=add_hash_column)
+                    job.log(f"Watermark: {incremental_key} = {watermark}")
+                elif parallelism > 1:
+                    done = {}
+
+                    def progress(index, rows_done):
+                        done[index] = rows_done
+                        job.progress(sum(done.values()))
+                    rows = sum(run_parallel_transfer(source_type, source_creds, target_type, target_creds, parallelism,
+                                                     transfer_plan["partition_key"], transform, batch_size, progress,
+                                                     metrics, defer_indexes))
+                else:
+                    rows = transfer_table(source_type, source_creds, target_type, target_creds, transform, batch_size,
+                                          progress=job.progress, metrics=metrics, defer_indexes=defer_indexes,
+                                          upsert_key=upsert_key, add_hash_column=add_hash_column)
+                    if upsert_key:
+                        unchanged = metrics.stages.get("unchanged", {}).get("rows", 0)
+                        job.log(f"Upsert: {rows - unchanged} rows written, {unchanged} unchanged rows skipped")
+            except Exception as e:
+                job.report = metrics.finish(error=str(e))
+                metrics.write()
+                raise
+            job.report = metrics.finish()
+            metrics.write()
+            job.log(f"✅ Loaded {rows} rows into the target")
+            return rows
+
+        job = job_manager.submit(f"Built-in transfer {source_type} → {target_type}", builtin_transfer,
+                                 resources=[(source_type, source_creds), (target_type, target_creds)],
+                                 timeout=transfer_limit * 60 or None)
+        st.info(f"Job {job.id} submitted")
+
+# --- Alternative: every table of the source database, parents before children ---
+with st.expander("🗄️ Migrate the whole database"):
+    st.caption("Copies every table (collection) of the source database into the target database; "
+               "the table and collection fields above are ignored.")
+    migrate_only = st.text_input("Only these tables (comma-separated, optional)", placeholder="e.g. customers, orders")
+    migrate_concurrency = st.number_input("Tables at a time", min_value=1, max_value=32, value=MIGRATE_CONCURRENCY)
+    migrate_limit = st.number_input("Time limit in minutes (0 = none)", min_value=0, value=0, key="migrate_limit")
+    m1, m2 = st.columns([1, 4])
+    with m1:
+        plan_migration_clicked = st.button("📋 Plan Migration")
+    with m2:
+        run_migration_clicked = st.button("▶️ Run Migration")
+    if plan_migration_clicked or run_migration_clicked:
+        include = [name.strip() for name in migrate_only.split(",") if name.strip()] or None
+        try:
+            migration = plan_migration(source_type, source_creds, target_type, include)
+        except Exception as e:
+            st.error(f"❌ Could not read the source catalog: {e}")
+            migration = None
+        if migration is not None:
+            for level, names in enumerate(migration.levels):
+                st.markdown(f"**Level {level}:** " + ", ".join(names))
+        if migration is not None and run_migration_clicked:
+            def migration_job(job, migration=migration, source_creds=source_creds, target_creds=target_creds,
+                              concurrency=int(migrate_concurrency)):
+                job.detail = migration
+                job.report = run_migration(migration, source_creds, target_creds, concurrency, progress=job.progress)
+                if job.report["error"]:
+                    raise RuntimeError(job.report["error"])
+                job.log(f"✅ Migrated {len(migration.tables)} tables, {migration.rows()} rows")
+                return migration.rows()
+
+            job = job_manager.submit(f"Migration {source_type} → {target_type} ({len(migration.tables)} tables)",
+                                     migration_job, resources=[(source_type, source_creds), (target_type, target_creds)],
+                                     timeout=migrate_limit * 60 or None)
+            st.info(f"Job {job.id} submitted")
 
 # --- Step 4: Show editable ETL code and allow execution ---
 
-if "etl_code" in st.session_state:
+if pending_code is not None or "etl_code" in st.session_state:
     st.subheader("📝 Review and Edit Generated Code")
-    edited_code = editable_code_section(st.session_state["etl_code"])
+    edited_code = editable_code_section(st.session_state.get("etl_code", ""), stream=pending_code)
+    if pending_code is not None:
+        st.session_state["etl_code"] = edited_code
+        stats = code_cache.stats()
+        st.caption(f"Code cache: {stats['hits']} hits / {stats['misses']} misses, {stats['entries']} scripts stored")
+    st.caption("Credentials appear as __ATOA_…__ placeholders and are filled in when the script runs.")
+    runnable_code = fill_credentials(edited_code, source_creds, target_creds)
+
+    # a dry run on a sample replica gates the full run, so a broken script fails in seconds
+    sample_rows = st.number_input("Dry-run sample rows", min_value=1, max_value=100_000, value=DRY_RUN_ROWS)
+    if st.button("🧪 Dry Run on Sample"):
+        with st.spinner("Running the script against sample replicas..."):
+            # the placeholders stay in: the dry run fills them with stand-ins only the replicas answer to
+            st.session_state["dry_run"] = dry_run(edited_code, source_type, source_creds, target_type, target_creds,
+                                                  rows=int(sample_rows))
+    last_dry_run = st.session_state.get("dry_run")
+    dry_run_passed = bool(last_dry_run and last_dry_run["ok"] and last_dry_run["code"] == code_fingerprint(edited_code))
+    if last_dry_run:
+        display_dry_run(last_dry_run)
+        if last_dry_run["code"] != code_fingerprint(edited_code):
+            st.info("The code changed since this dry run; run it again before the full run.")
+    allow_full_run = dry_run_passed or st.checkbox("Allow the full run without a passing dry run", value=False)
 
-    if st.button("▶️ Run ETL Script LOCAL"):
-        stdout, stderr = run_etl_script(edited_code)
-        st.success("✅ ETL process completed successfully!")
+    resources = [(source_type, source_creds), (target_type, target_creds)]
+    if st.button("▶️ Run ETL Script LOCAL", disabled=not allow_full_run):
+        # runs in the background; progress and logs show up under Jobs
+        job = job_manager.submit(f"Local script {source_type} → {target_type}",
+                                 script_job(runnable_code, source_type=source_type, target_type=target_type),
+                                 resources=resources, timeout=JOB_TIMEOUT)
+        st.info(f"Job {job.id} submitted")
     # c1,c2=st.columns([1,3])
     ssh_host = st.text_input("Host (e.g., 192.168.1.100)", placeholder="Enter IP or domain")
     ssh_user = st.text_input("Username", placeholder="e.g., ubuntu")
     ssh_password = st.text_input("Password", type="password")
-    if st.button("▶️ Run ETL Script SSH"):
-        stdout, stderr = run_etl_script_remote_password(edited_code,ssh_user,ssh_host,ssh_password)
-        st.success("✅ ETL process completed successfully!")
-        if stdout:
-            st.text(stdout)
+    if st.button("▶️ Run ETL Script SSH", disabled=not allow_full_run):
+        ssh = {"host": ssh_host, "user": ssh_user, "password": ssh_password}
+        job = job_manager.submit(f"SSH script on {ssh_host} {source_type} → {target_type}",
+                                 script_job(runnable_code, ssh, source_type=source_type, target_type=target_type, host=ssh_host),
+                                 resources=resources, timeout=JOB_TIMEOUT)
+        st.info(f"Job {job.id} submitted")
 
+    # one run per key range of the source, spread round-robin over the hosts
+    with st.expander("🌐 Run partitioned over several SSH hosts"):
+        st.caption("Each run gets ATOA_PARTITION_INDEX, ATOA_PARTITION_LOWER and ATOA_PARTITION_UPPER; the script "
+                   "must only read source rows with LOWER <= key < UPPER (an empty bound is open).")
+        ssh_hosts = st.text_area("Hosts, one per line (user@host:port; the username and password above are the defaults)",
+                                 placeholder="ubuntu@10.0.0.11\nubuntu@10.0.0.12:2222")
+        p1, p2 = st.columns(2)
+        with p1:
+            partition_count = st.number_input("Partitions", min_value=1, max_value=64, value=2)
+        with p2:
+            partition_on = st.text_input("Partition key (optional)", placeholder="e.g. id")
+        if st.button("▶️ Run Partitioned over SSH", disabled=not allow_full_run):
+            hosts = []
+            for line in ssh_hosts.splitlines():
+                if not line.strip():
+                    continue
+                user, _, address = line.strip().rpartition("@")
+                host, _, port = address.partition(":")
+                hosts.append({"host": host, "user": user or ssh_user, "password": ssh_password, "port": int(port or 22)})
+            if not hosts:
+                st.error("❌ Enter at least one host.")
+            elif "ATOA_PARTITION" not in runnable_code:
+                # every run would copy the whole source
+                st.error("❌ The script doesn't read ATOA_PARTITION_LOWER / ATOA_PARTITION_UPPER.")
+            else:
+                try:
+                    partitions = plan_partitions(source_type, source_creds, int(partition_count), partition_on.strip() or None)
+                except Exception as e:
+                    st.error(f"❌ Could not split the source: {e}")
+                    partitions = None
+                if partitions:
+                    job = job_manager.submit(
+                        f"Partitioned SSH script on {len(hosts)} host(s) {source_type} → {target_type}",
+                        partitioned_script_job(runnable_code, partitions, hosts, source_type=source_type,
+                                               target_type=target_type),
+                        resources=resources, timeout=JOB_TIMEOUT)
+                    st.info(f"Job {job.id} submitted: {len(partitions)} partition(s) over {len(hosts)} host(s)")
 
+    st.download_button("📥 Download ETL Script", runnable_code, "etl_script.py", mime="text/x-python")
 
-    st.download_button("📥 Download ETL Script", edited_code, "etl_script.py", mime="text/x-python")
+# --- Background jobs ---
+display_jobs(job_manager)
 
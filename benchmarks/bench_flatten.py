@@ -0,0 +1,108 @@
+# benchmarks/bench_flatten.py
+#
+# MongoDB -> SQL loads of nested documents (benchmarks.datasets "nested" shape) into SQLite:
+#
+#   flat            one table, subdocuments and arrays stored as JSON text (modules.loader.as_rows)
+#   flatten         modules.flatten: dotted columns plus child tables, batch by batch
+#   json_normalize  what generated scripts do: pd.json_normalize over the whole collection
+#
+#   python -m benchmarks.bench_flatten --rows 100000
+#
+# Peak memory is the tracemalloc peak of the load itself, so the generated documents
+# held by the json_normalize case count against it, as they would in a script.
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.datasets import generate_batches
+from modules.flatten import compile_plan, create_tables_sql, load_flattened
+from modules.loader import as_rows, insert_statement
+from modules.mongo_schema import infer_schema
+
+TABLE = "atoa_bench"
+SCHEMA_SAMPLE = 1_000
+
+
+def documents(rows, batch_size):
+    for _, batch in generate_batches("nested", rows, batch_size):
+        for doc in batch:
+            doc["_id"] = doc["id"]
+        yield None, batch
+
+
+def run_flat(path, rows, batch_size):
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    created = False
+    for _, batch in documents(rows, batch_size):
+        columns, values = as_rows(None, batch)
+        if not created:
+            cursor.execute(f"CREATE TABLE {TABLE} ({', '.join(columns)})")
+            created = True
+        cursor.executemany(insert_statement("SQLite", TABLE, columns), values)
+    connection.commit()
+    connection.close()
+    return rows
+
+
+def run_flatten(path, rows, batch_size):
+    sample = next(documents(SCHEMA_SAMPLE, SCHEMA_SAMPLE))[1]
+    plan = compile_plan(infer_schema(sample), TABLE)
+    connection = sqlite3.connect(path)
+    for ddl in create_tables_sql(plan, "SQLite"):
+        connection.execute(ddl)
+    connection.commit()
+    connection.close()
+    counts = load_flattened("SQLite", {"file_path": path, "table": TABLE}, plan, documents(rows, batch_size))
+    return sum(counts.values())
+
+
+def run_json_normalize(path, rows, batch_size):
+    import pandas as pd
+
+    collection = [doc for _, batch in documents(rows, batch_size) for doc in batch]
+    frame = pd.json_normalize(collection)
+    # lists stay Python objects in the frame; sqlite3 can't bind them
+    for column in frame.columns[frame.dtypes == object]:
+        frame[column] = frame[column].map(lambda v: str(v) if isinstance(v, list) else v)
+    frame.columns = [column.replace(".", "_") for column in frame.columns]
+    connection = sqlite3.connect(path)
+    frame.to_sql(TABLE, connection, index=False)
+    connection.close()
+    return len(frame)
+
+
+CASES = {"flat": run_flat, "flatten": run_flatten, "json_normalize": run_json_normalize}
+
+
+def bench(name, rows, batch_size):
+    with tempfile.TemporaryDirectory(prefix="atoa_bench_") as workdir:
+        path = os.path.join(workdir, f"{name}.db")
+        tracemalloc.start()
+        started = time.perf_counter()
+        written = CASES[name](path, rows, batch_size)
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"case": name, "seconds": seconds, "docs_per_sec": rows / seconds, "rows_written": written,
+            "peak_mb": peak / (1024 * 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--cases", default=",".join(CASES))
+    args = parser.parse_args()
+
+    for name in args.cases.split(","):
+        r = bench(name, args.rows, args.batch_size)
+        print(f"{r['case']:>15}: {r['seconds']:6.2f} s  {r['docs_per_sec']:9,.0f} docs/s  "
+              f"{r['rows_written']:>9,} rows written  peak {r['peak_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_loaders.py
+#
+# Compares the bulk loaders in modules/loader.py with the row-by-row
+# INSERT + commit loop the generated scripts use today.
+#
+#   python -m benchmarks.bench_loaders --rows 50000
+#
+# SQLite always runs against a temp file. The other targets run when an
+# ATOA_BENCH_<TYPE> environment variable holds their credentials as JSON, e.g.
+#   ATOA_BENCH_POSTGRESQL='{"host": "localhost", "port": "5432", "user": "etl", "password": "...", "database": "bench"}'
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from modules.connections import open_connection
+from modules.loader import load_batches, insert_statement
+
+BENCH_TABLE = "atoa_bench"
+COLUMNS = ["id", "name", "amount"]
+DB_TYPES = ["PostgreSQL", "MySQL", "MSSQL", "MongoDB", "SQLite"]
+
+
+def synthetic_batches(rows, batch_size):
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        yield COLUMNS, [(i, f"name-{i}", i * 0.5) for i in range(start, stop)]
+
+
+def bench_creds(db_type, workdir):
+    if db_type == "SQLite":
+        return {"file_path": os.path.join(workdir, "bench.db")}
+    raw = os.environ.get(f"ATOA_BENCH_{db_type.upper()}")
+    return json.loads(raw) if raw else None
+
+
+def reset_target(db_type, creds):
+    if db_type == "MongoDB":
+        client = open_connection(db_type, creds)
+        client[creds["database"]][BENCH_TABLE].drop()
+        client.close()
+        return
+    connection = open_connection(db_type, creds)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TABLE {BENCH_TABLE}")
+    except Exception:
+        connection.rollback()
+    cursor.execute(f"CREATE TABLE {BENCH_TABLE} (id INT, name VARCHAR(64), amount FLOAT)")
+    connection.commit()
+    connection.close()
+
+
+def load_per_row(db_type, creds, batches):
+    # what the LLM scripts do: one statement and one commit per row
+    if db_type == "MongoDB":
+        client = open_connection(db_type, creds)
+        collection = client[creds["database"]][creds["collection"]]
+        for columns, rows in batches:
+            for row in rows:
+                collection.insert_one(dict(zip(columns, row)))
+        client.close()
+        return
+    connection = open_connection(db_type, creds)
+    cursor = connection.cursor()
+    statement = insert_statement(db_type, BENCH_TABLE, COLUMNS)
+    for _, rows in batches:
+        for row in rows:
+            cursor.execute(statement, row)
+            connection.commit()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'target':<12}{'per-row rows/s':>18}{'bulk rows/s':>16}{'speedup':>10}")
+    with tempfile.TemporaryDirectory(prefix="atoa_bench_") as workdir:
+        for db_type in DB_TYPES:
+            creds = bench_creds(db_type, workdir)
+            if creds is None:
+                print(f"{db_type:<12}skipped (set ATOA_BENCH_{db_type.upper()})")
+                continue
+            creds = {**creds, "table": BENCH_TABLE, "collection": BENCH_TABLE}
+
+            results = []
+            for loader in (load_per_row, load_batches):
+                reset_target(db_type, creds)
+                started = time.perf_counter()
+                loader(db_type, creds, synthetic_batches(args.rows, args.batch_size))
+                results.append(args.rows / (time.perf_counter() - started))
+
+            per_row, bulk = results
+            print(f"{db_type:<12}{per_row:>18,.0f}{bulk:>16,.0f}{bulk / per_row:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_startup.py
+#
+# Cold-start cost of the modules app.py imports, each run in a fresh interpreter.
+#
+#   python -m benchmarks.bench_startup              # lazy (current) vs eager driver imports
+#   python -m benchmarks.bench_startup --runs 10
+#
+# "lazy" imports the app modules only, which is what a Streamlit cold start pays now.
+# "eager" also imports every database driver, paramiko and the LLM client first, which
+# is what the app paid before drivers moved behind modules.connectors.
+# Packages that aren't installed are skipped and listed in the output.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_MODULES = [
+    "modules.ui", "modules.generator", "modules.transform", "modules.transfer", "modules.checkpoint",
+    "modules.validator", "modules.typemap", "modules.executor", "modules.connectors", "modules.metrics",
+    "modules.jobs",
+]
+# imported at startup before the registry made them lazy
+EAGER_MODULES = [
+    "psycopg2", "pymysql", "pyodbc", "pymongo", "paramiko",
+    "langchain_core.messages", "langchain_google_genai",
+]
+WATCHED = ["psycopg2", "pymysql", "pyodbc", "pymongo", "bson", "paramiko", "langchain_core", "langchain_google_genai"]
+
+PROBE = """
+import importlib, json, sys, time
+modules, watched = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+skipped = []
+started = time.perf_counter()
+for name in modules:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        skipped.append(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "skipped": skipped,
+                  "loaded": [name for name in watched if name in sys.modules]}))
+"""
+
+
+def probe(modules):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(modules), json.dumps(WATCHED)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench(mode, runs):
+    modules = APP_MODULES if mode == "lazy" else EAGER_MODULES + APP_MODULES
+    results = [probe(modules) for _ in range(runs)]
+    times = sorted(r["seconds"] for r in results)
+    return {
+        "mode": mode,
+        "median_ms": round(statistics.median(times) * 1000, 1),
+        "min_ms": round(times[0] * 1000, 1),
+        "max_ms": round(times[-1] * 1000, 1),
+        "drivers_loaded": results[0]["loaded"],
+        "skipped": results[0]["skipped"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = [bench(mode, args.runs) for mode in ("eager", "lazy")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(f"{r['mode']:>6}: median {r['median_ms']:8.1f} ms  (min {r['min_ms']:.1f}, max {r['max_ms']:.1f})"
+              f"  drivers loaded: {', '.join(r['drivers_loaded']) or 'none'}")
+        if r["skipped"]:
+            print(f"        not importable here: {', '.join(r['skipped'])}")
+    eager, lazy = results
+    if lazy["median_ms"] > 0:
+        print(f"speed-up: {eager['median_ms'] / lazy['median_ms']:.2f}x "
+              f"({eager['median_ms'] - lazy['median_ms']:.1f} ms saved per cold start)")
+
+
+if __name__ == "__main__":
+    main()
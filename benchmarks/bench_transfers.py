@@ -0,0 +1,261 @@
+# benchmarks/bench_transfers.py
+#
+# End-to-end transfer benchmarks for every source -> target pair in app.py's db_types.
+#
+#   python -m benchmarks.bench_transfers                      # 10k rows, compare with baseline
+#   python -m benchmarks.bench_transfers --sizes 10k,1m,10m --shapes narrow,wide,nested
+#   python -m benchmarks.bench_transfers --update-baseline    # record new numbers
+#
+# SQLite always runs on temp files and MongoDB falls back to an in-process mongomock
+# stand-in. PostgreSQL/MySQL/MSSQL (and a real MongoDB) run when ATOA_BENCH_<TYPE>
+# holds their credentials as JSON, e.g.
+#   ATOA_BENCH_POSTGRESQL='{"host": "localhost", "port": "5432", "user": "etl", "password": "...", "database": "bench"}'
+#
+# Each case runs in a fresh process so peak RSS belongs to that case alone.
+# The run exits with status 1 when a case is slower or bigger than the baseline allows.
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.datasets import SHAPES, SIZES, columns_for, create_table_sql, generate_batches
+
+DB_TYPES = ["PostgreSQL", "MySQL", "MSSQL", "MongoDB", "SQLite"]
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+BATCH_SIZE = 10_000
+# RSS at small sizes is mostly interpreter noise, so allow this much on top of the tolerance
+RSS_SLACK_MB = 32
+
+
+def bench_creds(db_type, workdir, name):
+    if db_type == "SQLite":
+        return {"file_path": os.path.join(workdir, f"{name}.db"), "table": name}
+    raw = os.environ.get(f"ATOA_BENCH_{db_type.upper()}")
+    if raw:
+        return {**json.loads(raw), "table": name, "collection": name}
+    if db_type == "MongoDB":
+        return {"uri": "mongodb://standin", "database": "atoa_bench", "collection": name}
+    return None
+
+
+def available_types():
+    types = []
+    for db_type in DB_TYPES:
+        if db_type in ("SQLite", "MongoDB") or os.environ.get(f"ATOA_BENCH_{db_type.upper()}"):
+            types.append(db_type)
+    return types
+
+
+def use_mongo_standin():
+    # one shared in-process client plays the MongoDB server for source and target
+    import mongomock
+    from modules import connections
+
+    client = mongomock.MongoClient()
+    open_connection = connections.open_connection
+
+    def open_with_standin(db_type, creds):
+        if db_type == "MongoDB":
+            return client
+        return open_connection(db_type, creds)
+
+    connections.open_connection = open_with_standin
+
+
+def reset_peak_rss():
+    # Linux lets a process reset its own high-water mark; elsewhere the peak covers setup too
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # macOS reports bytes here, Linux kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def prepare(db_type, creds, shape):
+    from modules.connections import open_connection
+
+    if db_type == "MongoDB":
+        client = open_connection(db_type, creds)
+        client[creds["database"]][creds["collection"]].drop()
+        return
+    connection = open_connection(db_type, creds)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TABLE {creds['table']}")
+    except Exception:
+        connection.rollback()
+    cursor.execute(create_table_sql(shape, creds["table"]))
+    connection.commit()
+    connection.close()
+
+
+def _scalar(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def project(names):
+    # documents -> the benchmark table's columns (drops _id and sparse fields)
+    def transform(columns, rows):
+        if columns is not None:
+            return columns, rows
+        return names, [tuple(_scalar(doc.get(name)) for name in names) for doc in rows]
+    return transform
+
+
+def timed(iterable, stats, stage):
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats[stage] += time.perf_counter() - started
+            return
+        stats[stage] += time.perf_counter() - started
+        yield item
+
+
+def run_case(case):
+    """
+    Runs in a child process: seeds the source, transfers it, and reports metrics.
+    """
+    from modules.extractor import stream_batches
+    from modules.loader import load_batches
+
+    source_type, target_type, shape, rows = case["source"], case["target"], case["shape"], case["rows"]
+    if not os.environ.get("ATOA_BENCH_MONGODB") and "MongoDB" in (source_type, target_type):
+        use_mongo_standin()
+
+    with tempfile.TemporaryDirectory(prefix="atoa_bench_") as workdir:
+        source_creds = bench_creds(source_type, workdir, "bench_src")
+        target_creds = bench_creds(target_type, workdir, "bench_tgt")
+        prepare(source_type, source_creds, shape)
+        prepare(target_type, target_creds, shape)
+        load_batches(source_type, source_creds,
+                     generate_batches(shape, rows, BATCH_SIZE, as_documents=source_type == "MongoDB"))
+
+        reset_peak_rss()
+        stats = {"extract": 0.0, "transform": 0.0}
+        names = [name for name, _ in columns_for(shape)]
+        transform = project(names) if target_type != "MongoDB" else None
+
+        def batches():
+            for columns, batch in timed(stream_batches(source_type, source_creds, BATCH_SIZE), stats, "extract"):
+                if transform is not None:
+                    started = time.perf_counter()
+                    columns, batch = transform(columns, batch)
+                    stats["transform"] += time.perf_counter() - started
+                yield columns, batch
+
+        started = time.perf_counter()
+        loaded = load_batches(target_type, target_creds, batches())
+        total = time.perf_counter() - started
+        return {
+            "rows": loaded,
+            "seconds": round(total, 4),
+            "rows_per_sec": round(loaded / total, 1) if total else 0.0,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": {
+                "extract": round(stats["extract"], 4),
+                "transform": round(stats["transform"], 4),
+                "load": round(total - stats["extract"] - stats["transform"], 4),
+            },
+        }
+
+
+def build_cases(sizes, shapes):
+    types = available_types()
+    cases = []
+    for size in sizes:
+        for shape in shapes:
+            for source in types:
+                # nested documents only exist in MongoDB sources
+                if shape == "nested" and source != "MongoDB":
+                    continue
+                for target in types:
+                    cases.append({
+                        "id": f"{size}/{shape}/{source}->{target}",
+                        "source": source, "target": target, "shape": shape, "rows": SIZES[size],
+                    })
+    return cases
+
+
+def compare(case_id, result, baseline, tolerance):
+    base = baseline.get(case_id)
+    if base is None:
+        return []
+    problems = []
+    if result["rows_per_sec"] < base["rows_per_sec"] * (1 - tolerance):
+        problems.append(f"rows/s {result['rows_per_sec']:,.0f} < baseline {base['rows_per_sec']:,.0f}")
+    if result["peak_rss_mb"] > max(base["peak_rss_mb"] * (1 + tolerance), base["peak_rss_mb"] + RSS_SLACK_MB):
+        problems.append(f"peak RSS {result['peak_rss_mb']:.0f} MB > baseline {base['peak_rss_mb']:.0f} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10k", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--shapes", default=",".join(SHAPES))
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed fractional regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="write all results as JSON here")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    cases = build_cases(args.sizes.split(","), args.shapes.split(","))
+    context = multiprocessing.get_context("spawn")
+    results, regressions = {}, {}
+    print(f"{'case':<44}{'rows/s':>12}{'peak MB':>10}{'extract s':>11}{'load s':>9}")
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        results[case["id"]] = result
+        problems = compare(case["id"], result, baseline, args.tolerance)
+        if problems:
+            regressions[case["id"]] = problems
+        flag = "  REGRESSION" if problems else ""
+        print(f"{case['id']:<44}{result['rows_per_sec']:>12,.0f}{result['peak_rss_mb']:>10.1f}"
+              f"{result['stages']['extract']:>11.3f}{result['stages']['load']:>9.3f}{flag}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        baseline.update({case_id: {"rows_per_sec": r["rows_per_sec"], "peak_rss_mb": r["peak_rss_mb"]}
+                         for case_id, r in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed beyond {args.tolerance:.0%}:", file=sys.stderr)
+        for case_id, problems in regressions.items():
+            print(f"  {case_id}: {'; '.join(problems)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_upsert.py
+#
+# Reloading a mostly-unchanged SQLite table:
+#
+#   reload        DELETE everything, then the bulk loader (modules.loader.load_batches)
+#   upsert        staging table + INSERT ... ON CONFLICT for every row (hash_column=None)
+#   upsert_values the same, with unchanged rows dropped by comparing every column first
+#   upsert_hash   the same, with unchanged rows dropped by their content hash first
+#
+#   python -m benchmarks.bench_upsert --rows 200000 --changed 0.01
+#
+# "rows written" is what reached the target table, i.e. the rows that took locks and
+# produced WAL/journal pages there. The upsert_hash case first runs once to add the hash
+# column and store the hashes.
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from modules.loader import load_batches
+from modules.metrics import RunMetrics
+from modules.upsert import upsert_batches
+
+TABLE = "atoa_bench"
+COLUMNS = ["id", "name", "amount"]
+
+
+def source_batches(rows, batch_size, changed):
+    # every 1/changed-th row differs from the initial load
+    step = int(1 / changed) if changed else 0
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        yield COLUMNS, [(i, f"name-{i}" + ("-v2" if step and i % step == 0 else ""), i * 0.5)
+                        for i in range(start, stop)]
+
+
+def fresh_target(path, rows, batch_size):
+    creds = {"file_path": path, "table": TABLE}
+    connection = sqlite3.connect(creds["file_path"])
+    connection.execute(f"CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY, name TEXT, amount REAL)")
+    connection.commit()
+    connection.close()
+    load_batches("SQLite", creds, source_batches(rows, batch_size, 0))
+    return creds
+
+
+def run_reload(creds, rows, batch_size, changed):
+    connection = sqlite3.connect(creds["file_path"])
+    connection.execute(f"DELETE FROM {TABLE}")
+    connection.commit()
+    connection.close()
+    return load_batches("SQLite", creds, source_batches(rows, batch_size, changed))
+
+
+def run_upsert(creds, rows, batch_size, changed, hash_column=None, add_hash_column=False):
+    metrics = RunMetrics()
+    total = upsert_batches("SQLite", creds, source_batches(rows, batch_size, changed), "id",
+                           hash_column=hash_column, metrics=metrics, add_hash_column=add_hash_column)
+    return total - metrics.stages.get("unchanged", {}).get("rows", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--changed", type=float, default=0.01, help="fraction of rows that differ")
+    args = parser.parse_args()
+
+    cases = [
+        ("reload", lambda creds: run_reload(creds, args.rows, args.batch_size, args.changed)),
+        ("upsert", lambda creds: run_upsert(creds, args.rows, args.batch_size, args.changed)),
+        ("upsert_values", lambda creds: run_upsert(creds, args.rows, args.batch_size, args.changed,
+                                                   "atoa_row_hash")),
+        ("upsert_hash", lambda creds: run_upsert(creds, args.rows, args.batch_size, args.changed, "atoa_row_hash")),
+    ]
+    with tempfile.TemporaryDirectory(prefix="atoa_bench_") as workdir:
+        for name, run in cases:
+            creds = fresh_target(os.path.join(workdir, f"{name}.db"), args.rows, args.batch_size)
+            if name == "upsert_hash":
+                run_upsert(creds, args.rows, args.batch_size, 0, "atoa_row_hash", add_hash_column=True)
+            started = time.perf_counter()
+            written = run(creds)
+            seconds = time.perf_counter() - started
+            print(f"{name:>13}: {seconds:6.2f} s  {written:>9,} rows written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/datasets.py
+#
+# Deterministic synthetic tables/collections for the transfer benchmarks.
+import datetime
+import random
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SHAPES = ["narrow", "wide", "nested"]
+WIDE_COLUMNS = 40
+SEED = 42
+
+NARROW_COLUMNS = [
+    ("id", "INT"),
+    ("name", "VARCHAR(64)"),
+    ("amount", "FLOAT"),
+    ("created_at", "VARCHAR(32)"),
+    ("active", "INT"),
+]
+NESTED_COLUMNS = [
+    ("id", "INT"),
+    ("name", "VARCHAR(64)"),
+    ("address", "VARCHAR(512)"),
+    ("tags", "VARCHAR(512)"),
+]
+
+
+def columns_for(shape):
+    if shape == "narrow":
+        return NARROW_COLUMNS
+    if shape == "wide":
+        kinds = ["INT", "FLOAT", "VARCHAR(32)"]
+        return [("id", "INT")] + [(f"c{i}", kinds[i % 3]) for i in range(1, WIDE_COLUMNS)]
+    return NESTED_COLUMNS
+
+
+def create_table_sql(shape, table):
+    columns = ", ".join(f"{name} {kind}" for name, kind in columns_for(shape))
+    return f"CREATE TABLE {table} ({columns})"
+
+
+def _narrow_row(rng, i, epoch):
+    return (
+        i,
+        None if i % 7 == 0 else f"name-{rng.randint(0, 10**6)}",
+        None if i % 11 == 0 else round(rng.random() * 1000, 2),
+        (epoch + datetime.timedelta(seconds=i)).isoformat(sep=" "),
+        i % 2,
+    )
+
+
+def _wide_row(rng, i):
+    row = [i]
+    for c in range(1, WIDE_COLUMNS):
+        if i % 13 == c % 13:
+            row.append(None)
+        elif c % 3 == 1:
+            row.append(rng.randint(0, 10**6))
+        elif c % 3 == 2:
+            row.append(rng.random())
+        else:
+            row.append(f"v{rng.randint(0, 10**4)}")
+    return tuple(row)
+
+
+def _nested_document(rng, i):
+    doc = {
+        "id": i,
+        "name": f"name-{rng.randint(0, 10**6)}",
+        "address": {"city": f"city-{i % 100}", "geo": {"lat": rng.random(), "lon": rng.random()}},
+        "tags": [f"t{rng.randint(0, 20)}" for _ in range(i % 4)],
+    }
+    if i % 5 == 0:
+        # sparse field: missing from most documents
+        doc["vip"] = True
+    return doc
+
+
+def generate_batches(shape, rows, batch_size, as_documents=False):
+    """
+    Yields extractor-style (columns, rows) batches, or (None, documents) with as_documents=True.
+    The nested shape is always produced as documents.
+    """
+    rng = random.Random(SEED)
+    epoch = datetime.datetime(2024, 1, 1)
+    names = [name for name, _ in columns_for(shape)]
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        if shape == "nested":
+            yield None, [_nested_document(rng, i) for i in range(start, stop)]
+            continue
+        if shape == "narrow":
+            batch = [_narrow_row(rng, i, epoch) for i in range(start, stop)]
+        else:
+            batch = [_wide_row(rng, i) for i in range(start, stop)]
+        if as_documents:
+            yield None, [dict(zip(names, row)) for row in batch]
+        else:
+            yield names, batch
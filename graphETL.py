@@ -1,11 +1,16 @@
 # langgraph_etl_graph.py
 
-from langgraph.graph import StateGraph, END
+import operator
+import time
+
+from langgraph.graph import StateGraph, START, END
 from langchain_core.runnables import Runnable
-from typing import TypedDict, Literal
+from typing import Annotated, TypedDict, Literal
 from modules.validator import validate_and_fetch_schema
 from modules.generator import generate_etl_code
-from modules.executor import run_etl_script
+from modules.executor import run_etl_job
+from modules.codecache import fill_credentials
+from modules.metrics import RunMetrics
 
 # -------- STATE --------
 class ETLState(TypedDict):
@@ -29,31 +34,47 @@ class ETLState(TypedDict):
     stdout: str
     stderr: str
 
+    # seconds per node; merged because the validation branches write it in the same step
+    timings: Annotated[dict, operator.or_]
+    metrics: dict
+    report_path: str
+
 # --------- NODES ---------
 
+# The two validation nodes run in parallel, so each returns only the keys it owns
+# (writing the same key from both branches in one step is rejected by langgraph).
+
 # Validate Source DB
-def src_connection_node(state: ETLState) -> ETLState:
+def src_connection_node(state: ETLState) -> dict:
+    started = time.perf_counter()
     status, preview, schema = validate_and_fetch_schema(
         state["source_type"], state["source_creds"]
     )
-    return {**state, "src_status": status, "src_preview": preview, "src_schema": schema}
+    return {
+        "src_status": status,
+        "src_preview": preview,
+        "src_schema": schema,
+        "timings": {"validate_source": time.perf_counter() - started},
+    }
 
 # Validate Target DB
-def tgt_connection_node(state: ETLState) -> ETLState:
+def tgt_connection_node(state: ETLState) -> dict:
+    started = time.perf_counter()
     status, preview, schema = validate_and_fetch_schema(
         state["target_type"], state["target_creds"]
     )
     create_new = preview == []
     return {
-        **state,
         "tgt_status": status,
         "tgt_preview": preview,
         "tgt_schema": schema,
         "create_new": create_new,
+        "timings": {"validate_target": time.perf_counter() - started},
     }
 
 # Generate ETL Code Node
 def generate_code_node(state: ETLState) -> ETLState:
+    started = time.perf_counter()
     code = generate_etl_code(
         state["source_type"],
         state["source_creds"],
@@ -65,7 +86,8 @@ def generate_code_node(state: ETLState) -> ETLState:
         state["src_schema"],
         state["tgt_schema"],
     )
-    return {**state, "etl_code": code, "ask_for_edit": "Yes"}
+    spent = state.get("timings", {}).get("generate", 0.0) + time.perf_counter() - started
+    return {**state, "etl_code": code, "ask_for_edit": "Yes", "timings": {"generate": spent}}
 
 # Show code and ask if user wants to edit
 def show_code_node(state: ETLState) -> ETLState:
@@ -75,8 +97,16 @@ def show_code_node(state: ETLState) -> ETLState:
 
 # Execute ETL
 def execute_etl_node(state: ETLState) -> ETLState:
-    stdout, stderr = run_etl_script(state["etl_code"])
-    return {**state, "stdout": stdout, "stderr": stderr}
+    metrics = RunMetrics(source_type=state["source_type"], target_type=state["target_type"], mode="graph")
+    for name, seconds in state.get("timings", {}).items():
+        metrics.add_time(name, seconds)
+    with metrics.stage("execute"):
+        # the generated code carries credential placeholders until it runs
+        stdout, stderr, status = run_etl_job(fill_credentials(state["etl_code"], state["source_creds"], state["target_creds"]))
+    # the exit status decides success; scripts print warnings to stderr too
+    metrics.finish(error=(stderr or f"exit status {status}") if status != 0 else None)
+    path = metrics.write()
+    return {**state, "stdout": stdout, "stderr": stderr, "metrics": metrics.report(), "report_path": path}
 
 # -------- DECISION FUNCTIONS --------
 
@@ -94,10 +124,10 @@ workflow.add_node("generate", generate_code_node)
 workflow.add_node("show_code", show_code_node)
 workflow.add_node("execute", execute_etl_node)
 
-workflow.set_entry_point("src_connection")
-
-workflow.add_edge("src_connection", "tgt_connection")
-workflow.add_edge("tgt_connection", "generate")
+# fan out to both validations, fan back in before generating
+workflow.add_edge(START, "src_connection")
+workflow.add_edge(START, "tgt_connection")
+workflow.add_edge(["src_connection", "tgt_connection"], "generate")
 workflow.add_edge("generate", "show_code")
 workflow.add_conditional_edges("show_code", should_regenerate, {
     "generate": "generate",
@@ -0,0 +1,179 @@
+# modules/batches.py
+import datetime
+import decimal
+import io
+import json
+import re
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# PostgreSQL reports type OIDs in cursor.description; NUMERIC (1700) is handled in arrow_type
+POSTGRES_OIDS = {
+    16: pa.bool_(),
+    20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+    700: pa.float64(), 701: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+    17: pa.binary(),
+}
+POSTGRES_NUMERIC = 1700
+
+# DECIMAL marks exact numerics, whose Arrow type needs the column's precision and scale
+DECIMAL = "decimal"
+# decimal128 holds up to 38 digits; wider or unconstrained numerics travel as strings
+MAX_DECIMAL_PRECISION = 38
+
+# checked in order against the lower-cased type name (MySQL DESCRIBE, SQLite PRAGMA,
+# pyodbc python types, Mongo value type names); each pattern has to match whole
+# words, so "int" doesn't catch "point"; anything unmatched becomes a string
+TYPE_PATTERNS = [
+    ("objectid", pa.string()),
+    ("interval", pa.string()),
+    (r"bool(ean)?", pa.bool_()),
+    (r"tinyint\(1\)", pa.bool_()),
+    (r"(tiny|small|medium|big)?int(eger|2|4|8|32|64)?", pa.int64()),
+    (r"float\d*", pa.float64()),
+    ("double", pa.float64()),
+    ("real", pa.float64()),
+    (r"decimal(128)?", DECIMAL),
+    ("numeric", DECIMAL),
+    (r"datetime\d*", pa.timestamp("us")),
+    (r"timestamp(tz)?", pa.timestamp("us")),
+    ("date", pa.date32()),
+    (r"(tiny|medium|long)?blob", pa.binary()),
+    (r"(var)?binary", pa.binary()),
+    ("bytes", pa.binary()),
+]
+TYPE_REGEXES = [(re.compile(rf"(?<![a-z0-9_]){pattern}(?![a-z0-9_])"), arrow) for pattern, arrow in TYPE_PATTERNS]
+
+
+def decimal_type(precision, scale):
+    if not precision or precision > MAX_DECIMAL_PRECISION:
+        return pa.string()
+    return pa.decimal128(precision, min(scale or 0, precision))
+
+
+def _declared_params(name):
+    match = re.search(r"\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)", name)
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+
+def arrow_type(type_value, precision=None, scale=None):
+    """
+    Arrow type for a column type from a schema's "type" entry. Exact numerics take
+    precision and scale from the cursor description, or from the declared type name.
+    """
+    if isinstance(type_value, int):
+        if type_value == POSTGRES_NUMERIC:
+            return decimal_type(precision, scale)
+        return POSTGRES_OIDS.get(type_value, pa.string())
+    name = str(type_value).lower()
+    for regex, arrow in TYPE_REGEXES:
+        if regex.search(name):
+            break
+    else:
+        return pa.string()
+    if isinstance(arrow, str):
+        if precision is None:
+            precision, scale = _declared_params(name)
+        return decimal_type(precision, scale)
+    return arrow
+
+
+def arrow_schema(schema):
+    """
+    Fixed Arrow schema from the [{"name", "type", ...}] metadata returned by
+    modules.validator.validate_and_fetch_schema. Every column is nullable.
+    """
+    return pa.schema([pa.field(col["name"], arrow_type(col.get("type"), col.get("precision"), col.get("scale"))) for col in schema])
+
+
+def _coerce(value, arrow):
+    if value is None:
+        return None
+    if pa.types.is_string(arrow) and not isinstance(value, str):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=str)
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        return str(value)
+    if pa.types.is_floating(arrow) and isinstance(value, decimal.Decimal):
+        return float(value)
+    if pa.types.is_decimal(arrow):
+        # SQLite NUMERIC comes back as int/float; round to the column's scale like the target would
+        return decimal.Decimal(str(value)).quantize(decimal.Decimal(1).scaleb(-arrow.scale))
+    if pa.types.is_timestamp(arrow) and isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    if pa.types.is_date(arrow) and isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    return value
+
+
+def to_record_batch(columns, rows, schema):
+    """
+    Converts a (columns, rows) batch from the extractor into a RecordBatch with the given schema.
+    Document batches (columns=None) are read by the schema's field names.
+    """
+    if columns is None:
+        values = [[doc.get(field.name) for doc in rows] for field in schema]
+    else:
+        positions = {name: index for index, name in enumerate(columns)}
+        values = [[row[positions[field.name]] for row in rows] if field.name in positions
+                  else [None] * len(rows) for field in schema]
+    arrays = []
+    for field, column in zip(schema, values):
+        try:
+            arrays.append(pa.array(column, type=field.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array([_coerce(v, field.type) for v in column], type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def from_record_batch(batch):
+    """
+    Back to (columns, list of row tuples) for drivers that bind Python values.
+    """
+    columns = [column.to_pylist() for column in batch.columns]
+    return batch.schema.names, list(zip(*columns))
+
+
+def _copy_column(column):
+    # COPY reads bytea in its hex form; Arrow would write the raw bytes
+    if pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type):
+        return pa.array([None if value is None else "\\x" + value.hex() for value in column.to_pylist()],
+                        type=pa.string())
+    return column
+
+
+def to_csv_buffer(batch):
+    """
+    CSV for COPY ... WITH (FORMAT csv, NULL ''). Arrow quotes every string value and
+    writes nulls as bare empty fields, so an empty string stays "" and only a null
+    matches the NULL marker. Binary columns are hex encoded.
+    """
+    batch = pa.RecordBatch.from_arrays([_copy_column(column) for column in batch.columns],
+                                       names=batch.schema.names)
+    buffer = io.BytesIO()
+    pa_csv.write_csv(batch, buffer, pa_csv.WriteOptions(include_header=False))
+    buffer.seek(0)
+    return buffer
+
+
+def spill_to_parquet(batches, path, schema):
+    """
+    Writes a stream of RecordBatches to a Parquet file and returns the row count.
+    """
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def read_parquet_batches(path, batch_size):
+    yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
@@ -0,0 +1,205 @@
+# modules/checkpoint.py
+import hashlib
+import json
+import os
+import time
+
+from modules.connections import PLACEHOLDERS, borrow_connection
+from modules.extractor import DEFAULT_BATCH_SIZE, stream_batches
+from modules.incremental import key_values
+from modules.loader import as_documents, write_batch
+from modules.metrics import batch_rows, estimate_bytes
+from modules.state import StateStore, decode_value, encode_value, pipeline_id
+
+# lives next to the loaded data, so a chunk and its checkpoint commit together
+CHECKPOINT_TABLE = os.getenv("ATOA_CHECKPOINT_TABLE", "atoa_checkpoints")
+
+CHECKPOINT_COLUMNS = (
+    "pipeline VARCHAR(64) PRIMARY KEY, last_key {text} NOT NULL, rows_loaded BIGINT NOT NULL,"
+    " batches BIGINT NOT NULL, batch_hash VARCHAR(64) NOT NULL"
+)
+
+
+def batch_hash(columns, rows):
+    payload = json.dumps([columns, rows], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _ensure_checkpoint_table(db_type, cursor):
+    if db_type == "MSSQL":
+        columns = CHECKPOINT_COLUMNS.format(text="NVARCHAR(MAX)")
+        cursor.execute(f"IF OBJECT_ID(N'{CHECKPOINT_TABLE}', N'U') IS NULL CREATE TABLE {CHECKPOINT_TABLE} ({columns})")
+    else:
+        columns = CHECKPOINT_COLUMNS.format(text="TEXT")
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} ({columns})")
+
+
+def read_target_checkpoint(db_type, creds, pipeline):
+    """
+    The checkpoint committed in the target itself, or None.
+    """
+    if db_type == "MongoDB":
+        with borrow_connection("MongoDB", creds) as client:
+            doc = client[creds["database"]][CHECKPOINT_TABLE].find_one({"_id": pipeline})
+        if doc is None:
+            return None
+        return {"last_key": decode_value(doc["last_key"]), "rows": doc["rows"],
+                "batches": doc["batches"], "batch_hash": doc["batch_hash"]}
+
+    placeholder = PLACEHOLDERS[db_type]
+    with borrow_connection(db_type, creds) as connection:
+        cursor = connection.cursor()
+        _ensure_checkpoint_table(db_type, cursor)
+        connection.commit()
+        cursor.execute(
+            f"SELECT last_key, rows_loaded, batches, batch_hash FROM {CHECKPOINT_TABLE} WHERE pipeline = {placeholder}",
+            (pipeline,),
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    if row is None:
+        return None
+    return {"last_key": decode_value(json.loads(row[0])), "rows": row[1], "batches": row[2], "batch_hash": row[3]}
+
+
+def _write_target_checkpoint(db_type, cursor, pipeline, checkpoint):
+    placeholder = PLACEHOLDERS[db_type]
+    # delete + insert is an upsert every dialect understands
+    cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE pipeline = {placeholder}", (pipeline,))
+    cursor.execute(
+        f"INSERT INTO {CHECKPOINT_TABLE} (pipeline, last_key, rows_loaded, batches, batch_hash) "
+        f"VALUES ({', '.join([placeholder] * 5)})",
+        (pipeline, json.dumps(encode_value(checkpoint["last_key"])), checkpoint["rows"],
+         checkpoint["batches"], checkpoint["batch_hash"]),
+    )
+
+
+def clear_checkpoint(target_type, target_creds, pipeline, store):
+    store.reset_checkpoint(pipeline)
+    if target_type == "MongoDB":
+        with borrow_connection("MongoDB", target_creds) as client:
+            client[target_creds["database"]][CHECKPOINT_TABLE].delete_one({"_id": pipeline})
+        return
+    placeholder = PLACEHOLDERS[target_type]
+    with borrow_connection(target_type, target_creds) as connection:
+        cursor = connection.cursor()
+        _ensure_checkpoint_table(target_type, cursor)
+        cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE pipeline = {placeholder}", (pipeline,))
+        connection.commit()
+        cursor.close()
+
+
+def resume_point(target_type, target_creds, pipeline, store):
+    """
+    Where a run picks up. SQL targets commit their checkpoint with the data, so theirs
+    wins over the local state file (which may lag by one chunk after a crash).
+    MongoDB writes are idempotent upserts, so the further of the two is safe.
+    """
+    local = store.get_checkpoint(pipeline)
+    remote = read_target_checkpoint(target_type, target_creds, pipeline)
+    if target_type != "MongoDB":
+        return remote
+    candidates = [c for c in (local, remote) if c is not None]
+    return max(candidates, key=lambda c: c["batches"]) if candidates else None
+
+
+def _upsert_documents(collection, documents, key):
+    from pymongo import ReplaceOne, UpdateOne
+
+    operations = []
+    for doc in documents:
+        if "_id" in doc:
+            operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        elif key in doc:
+            operations.append(UpdateOne({key: doc[key]}, {"$set": doc}, upsert=True))
+        else:
+            raise ValueError(f"Checkpointed loads into MongoDB need '_id' or '{key}' in every document")
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def run_checkpointed(source_type, source_creds, target_type, target_creds, key, transform=None,
+                     batch_size=DEFAULT_BATCH_SIZE, store=None, progress=None, restart=False, metrics=None):
+    """
+    Copies the source in key order and commits a checkpoint (last key, row count, batch
+    hash) after every chunk, so a run that dies resumes after the last committed chunk.
+    key must be unique (a primary key or Mongo _id).
+
+    On SQL targets each chunk and its checkpoint row are one transaction, which makes the
+    copy exactly-once. MongoDB targets get idempotent upserts instead, so replaying a chunk
+    whose checkpoint was lost changes nothing. The local state file mirrors every checkpoint.
+    Once the source is exhausted the checkpoint is cleared, so the next run copies the
+    table from the beginning instead of only the keys above the old last key.
+    restart=True forgets the checkpoint of an interrupted run and starts from the beginning.
+    Returns (rows_loaded_this_run, checkpoint), checkpoint being the finished run's last one.
+    """
+    store = store or StateStore()
+    pipeline = pipeline_id(source_type, source_creds, target_type, target_creds, key)
+    if restart:
+        clear_checkpoint(target_type, target_creds, pipeline, store)
+    checkpoint = resume_point(target_type, target_creds, pipeline, store) or {
+        "last_key": None, "rows": 0, "batches": 0, "batch_hash": ""}
+    loaded = 0
+
+    def chunks():
+        for columns, rows in stream_batches(source_type, source_creds, batch_size, key=key,
+                                            after=checkpoint["last_key"], ordered=True):
+            # the checkpoint is taken from the source rows, before any transform renames the key
+            values = key_values(key, columns, rows)
+            if not values:
+                continue
+            digest = batch_hash(columns, rows)
+            if transform is not None:
+                columns, rows = transform(columns, rows)
+            yield (columns, rows), max(values), digest
+
+    if target_type == "MongoDB":
+        with borrow_connection("MongoDB", target_creds) as client:
+            database = client[target_creds["database"]]
+            collection = database[target_creds["collection"]]
+            for item, last_key, digest in chunks():
+                started = time.perf_counter()
+                count = _upsert_documents(collection, as_documents(*item), key)
+                checkpoint = _advance(checkpoint, last_key, count, digest)
+                database[CHECKPOINT_TABLE].replace_one(
+                    {"_id": pipeline},
+                    {"_id": pipeline, **checkpoint, "last_key": encode_value(last_key)},
+                    upsert=True,
+                )
+                loaded += count
+                _committed(store, pipeline, key, checkpoint, progress, metrics, item, started)
+        clear_checkpoint(target_type, target_creds, pipeline, store)
+        return loaded, checkpoint
+
+    with borrow_connection(target_type, target_creds) as connection:
+        cursor = connection.cursor()
+        if target_type == "MSSQL":
+            cursor.fast_executemany = True
+        for item, last_key, digest in chunks():
+            started = time.perf_counter()
+            count = write_batch(target_type, cursor, target_creds["table"], item)
+            checkpoint = _advance(checkpoint, last_key, count, digest)
+            _write_target_checkpoint(target_type, cursor, pipeline, checkpoint)
+            connection.commit()
+            loaded += count
+            _committed(store, pipeline, key, checkpoint, progress, metrics, item, started)
+        cursor.close()
+    # a complete copy leaves nothing to resume
+    clear_checkpoint(target_type, target_creds, pipeline, store)
+    return loaded, checkpoint
+
+
+def _advance(checkpoint, last_key, count, digest):
+    return {"last_key": last_key, "rows": checkpoint["rows"] + count,
+            "batches": checkpoint["batches"] + 1, "batch_hash": digest}
+
+
+def _committed(store, pipeline, key, checkpoint, progress, metrics, item, started):
+    store.set_checkpoint(pipeline, key, checkpoint["last_key"], checkpoint["rows"],
+                         checkpoint["batches"], checkpoint["batch_hash"])
+    if metrics is not None:
+        metrics.record_batch("load", time.perf_counter() - started, batch_rows(item), estimate_bytes(item))
+        metrics.sample_memory()
+    if progress is not None:
+        progress(checkpoint["rows"])
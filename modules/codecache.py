@@ -0,0 +1,145 @@
+# modules/codecache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CODE_CACHE_PATH = os.getenv("ATOA_CODE_CACHE_PATH", os.path.join(".atoa_cache", "codegen.sqlite"))
+CODE_CACHE_MAX_ENTRIES = int(os.getenv("ATOA_CODE_CACHE_MAX_ENTRIES", "500"))
+CODE_CACHE_MAX_BYTES = int(os.getenv("ATOA_CODE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# connection fields never go into the key; they are templated out of the stored code
+SECRET_FIELDS = ["host", "port", "user", "username", "password", "database", "uri", "file_path"]
+
+
+def _normalize_text(text):
+    return " ".join(str(text or "").split())
+
+
+def cache_key(model, source_type, source_creds, target_type, target_creds, transformations,
+              src_preview, tgt_preview, src_schema, tgt_schema, budget=None):
+    """
+    Content hash of everything that shapes the generated script, minus the credentials.
+    """
+    payload = {
+        "model": model,
+        "source_type": source_type,
+        "source_object": source_creds.get("table") or source_creds.get("collection"),
+        "target_type": target_type,
+        "target_object": target_creds.get("table") or target_creds.get("collection"),
+        "transformations": _normalize_text(transformations),
+        "src_preview": repr(src_preview),
+        "tgt_preview": repr(tgt_preview),
+        "src_schema": src_schema,
+        "tgt_schema": tgt_schema,
+        # a different token budget compacts the prompt differently
+        "budget": budget,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def placeholder(role, field):
+    """Stand-in for a credential field in prompts and cached code; role is SOURCE or TARGET."""
+    return f"__ATOA_{role}_{field.upper()}__"
+
+
+def _secret_values(source_creds, target_creds):
+    values = []
+    for role, creds in (("SOURCE", source_creds), ("TARGET", target_creds)):
+        for field in SECRET_FIELDS:
+            value = creds.get(field)
+            if value is None or str(value) == "":
+                continue
+            values.append((placeholder(role, field), str(value)))
+    # longest first so a password containing the username is replaced whole
+    return sorted(values, key=lambda item: len(item[1]), reverse=True)
+
+
+def _literal_body(value):
+    """value escaped for the inside of a Python string literal, quoted with ' or \"."""
+    return json.dumps(value)[1:-1].replace("'", "\\'")
+
+
+def fill_credentials(code, source_creds, target_creds):
+    # placeholders sit inside string literals, so quotes and backslashes in a password can't break the script
+    for placeholder, value in _secret_values(source_creds, target_creds):
+        code = code.replace(placeholder, _literal_body(value))
+    return code
+
+
+class CodeCache:
+    """
+    On-disk SQLite cache of generated ETL scripts, evicted least-recently-used
+    once it holds more than max_entries scripts or max_bytes of code.
+    """
+
+    def __init__(self, path=CODE_CACHE_PATH, max_entries=CODE_CACHE_MAX_ENTRIES, max_bytes=CODE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS generated_code ("
+                " key TEXT PRIMARY KEY, code TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, last_used REAL NOT NULL, hit_count INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key):
+        with self._lock, self._connect() as connection:
+            row = connection.execute("SELECT code FROM generated_code WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute(
+                "UPDATE generated_code SET last_used = ?, hit_count = hit_count + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, code):
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO generated_code (key, code, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, code, len(code.encode()), now, now),
+            )
+            self._evict(connection)
+
+    def _evict(self, connection):
+        count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generated_code").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in connection.execute("SELECT key, size FROM generated_code ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            connection.execute("DELETE FROM generated_code WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def clear(self):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM generated_code")
+
+    def stats(self):
+        with self._connect() as connection:
+            count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generated_code").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
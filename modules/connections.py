@@ -0,0 +1,193 @@
+# modules/connections.py
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from modules.connectors import connector_names, get_connector, username as _username
+
+# DB-API parameter markers per driver
+PLACEHOLDERS = {
+    name: get_connector(name).placeholder
+    for name in connector_names() if get_connector(name).placeholder is not None
+}
+
+
+def open_connection(db_type, creds):
+    """
+    Opens a raw driver connection for the given database type.
+    MongoDB returns a MongoClient, every other type a DB-API connection.
+    The driver is imported on first use (see modules.connectors).
+    """
+    return get_connector(db_type).connect(creds)
+
+
+# ---------------- Connection pool registry ----------------
+
+POOL_MAX_SIZE = int(os.getenv("ATOA_POOL_MAX_SIZE", "5"))
+POOL_IDLE_TIMEOUT = float(os.getenv("ATOA_POOL_IDLE_TIMEOUT", "300"))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("ATOA_POOL_ACQUIRE_TIMEOUT", "30"))
+
+# only these fields decide which server/database a connection points at
+CONNECTION_FIELDS = ["host", "port", "user", "password", "database", "uri", "file_path"]
+
+
+def normalize_creds(creds):
+    normalized = {}
+    for field in CONNECTION_FIELDS:
+        value = _username(creds) if field == "user" else creds.get(field)
+        if value is None or value == "":
+            continue
+        value = str(value).strip()
+        if field == "host":
+            value = value.lower()
+        normalized[field] = value
+    return normalized
+
+
+def credential_fingerprint(db_type, creds):
+    """
+    Stable hash of the connection-relevant credentials (table/collection excluded).
+    Safe to use as a cache or log key since no secret is kept in clear text.
+    """
+    payload = json.dumps([db_type, normalize_creds(creds)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _is_healthy(db_type, connection):
+    try:
+        if db_type == "MongoDB":
+            connection.admin.command("ping")
+        else:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of connections to one database.
+    Idle connections older than idle_timeout are closed, and every connection
+    is pinged before it is handed out again.
+    """
+
+    def __init__(self, db_type, creds, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.db_type = db_type
+        self.creds = dict(creds)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # (connection, released_at)
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        keep = []
+        for connection, released_at in self._idle:
+            if now - released_at > self.idle_timeout:
+                _close_quietly(connection)
+            else:
+                keep.append((connection, released_at))
+        self._idle = keep
+
+    def acquire(self, timeout=POOL_ACQUIRE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    connection = None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No free {self.db_type} connection after {timeout}s")
+                self._cond.wait(remaining)
+
+        # health check and connect happen outside the lock
+        try:
+            if connection is not None and not _is_healthy(self.db_type, connection):
+                _close_quietly(connection)
+                connection = None
+            if connection is None:
+                connection = open_connection(self.db_type, self.creds)
+            return connection
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection, discard=False):
+        if not discard and self.db_type != "MongoDB":
+            # never hand out a connection with an open transaction
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                _close_quietly(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            for connection, _ in self._idle:
+                _close_quietly(connection)
+            self._idle = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_type, creds):
+    key = (db_type, credential_fingerprint(db_type, creds))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_type, creds)
+        return pool
+
+
+@contextmanager
+def borrow_connection(db_type, creds):
+    """
+    Borrows a pooled connection for the duration of the with-block.
+    A connection that saw an exception is closed instead of returned.
+    """
+    pool = get_pool(db_type, creds)
+    connection = pool.acquire()
+    try:
+        yield connection
+    except BaseException:
+        pool.release(connection, discard=True)
+        raise
+    pool.release(connection)
+
+
+def close_all_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
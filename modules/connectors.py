@@ -0,0 +1,598 @@
+# modules/connectors.py
+import importlib
+import os
+import threading
+
+# seconds allowed for the TCP/TLS handshake and login
+CONNECT_TIMEOUT = float(os.getenv("ATOA_CONNECT_TIMEOUT", "10"))
+
+# rows shown by the connection check and the schema preview
+PREVIEW_ROWS = 2
+
+SQL_FIELDS = [
+    ("host", "Host", False),
+    ("port", "Port", False),
+    ("user", "User", False),
+    ("password", "Password", True),
+    ("database", "Database Name", False),
+    ("table", "Table Name", False),
+]
+
+
+def username(creds):
+    # the UI sends "user", the graph and older MSSQL code send "username"
+    return creds.get("user") or creds.get("username")
+
+
+def fetch_in_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        # description is only filled in after the first fetch on server-side cursors
+        columns = [desc[0] for desc in cursor.description]
+        yield columns, rows
+
+
+def mongo_filter(key=None, lower=None, upper=None, after=None, ordered=False):
+    bounds = {}
+    if key is not None and lower is not None:
+        bounds["$gte"] = lower
+    if key is not None and upper is not None:
+        bounds["$lt"] = upper
+    if key is not None and after is not None:
+        bounds["$gt"] = after
+    return {key: bounds} if bounds else {}
+
+
+class Connector:
+    """
+    Everything the app needs to know about one database type.
+    The driver module is imported the first time a connection is opened, so
+    the app only pays for the drivers of the databases it actually talks to.
+    """
+
+    name = None
+    # importable module name of the driver
+    driver = None
+    # pip package that provides it, for the error message
+    package = None
+    # DB-API parameter marker, None for non-SQL databases
+    placeholder = None
+    # credential inputs as (key, label, secret)
+    fields = SQL_FIELDS
+    # how modules.loader writes batches: "executemany", "copy" (COPY FROM STDIN) or "insert_many" (documents)
+    bulk_load = "executemany"
+
+    def __init__(self):
+        self._module = None
+        self._lock = threading.Lock()
+
+    def module(self):
+        with self._lock:
+            if self._module is None:
+                try:
+                    self._module = importlib.import_module(self.driver)
+                except ImportError as e:
+                    raise ImportError(f"{self.name} support needs the '{self.package}' package: {e}") from e
+            return self._module
+
+    def loaded(self):
+        return self._module is not None
+
+    def connect(self, creds):
+        raise NotImplementedError
+
+    def set_query_timeout(self, connection, timeout):
+        """
+        Bounds the preview queries on a borrowed connection.
+        Returns a callable that restores the connection's previous setting.
+        """
+        return lambda: None
+
+    def sample(self, connection, creds, limit=PREVIEW_ROWS):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT * FROM {creds['table']} LIMIT {int(limit)};")
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def schema(self, connection, creds, timeout):
+        """
+        Returns (preview, schema): a few rows and the column descriptions.
+        """
+        raise NotImplementedError
+
+    def stats(self, connection, creds):
+        """
+        Cheap size estimate from the catalog, without scanning the table.
+        Returns (rows, bytes); either is None when the catalog doesn't know.
+        """
+        return None, None
+
+    def list_tables(self, connection, creds):
+        """
+        Names of the user tables (collections) in creds["database"].
+        """
+        raise NotImplementedError
+
+    def foreign_keys(self, connection, creds):
+        """
+        (table, referenced table) pairs for every foreign key between the user tables.
+        """
+        return []
+
+    def select(self, table, key=None, lower=None, upper=None, after=None, ordered=False):
+        """
+        Builds the SELECT for a (possibly key-bounded) scan and its parameters.
+        """
+        conditions, params = [], []
+        if key is not None and lower is not None:
+            conditions.append(f"{key} >= {self.placeholder}")
+            params.append(lower)
+        if key is not None and upper is not None:
+            conditions.append(f"{key} < {self.placeholder}")
+            params.append(upper)
+        if key is not None and after is not None:
+            conditions.append(f"{key} > {self.placeholder}")
+            params.append(after)
+        query = f"SELECT * FROM {table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if key is not None and ordered:
+            query += f" ORDER BY {key}"
+        return query, params
+
+    def streaming_cursor(self, connection, batch_size):
+        cursor = connection.cursor()
+        cursor.arraysize = batch_size
+        return cursor
+
+    def stream(self, connection, creds, batch_size, bounds):
+        """
+        Yields the table's rows as (columns, rows) batches on a borrowed connection;
+        bounds are the key range of modules.extractor.stream_batches.
+        """
+        cursor = self.streaming_cursor(connection, batch_size)
+        cursor.execute(*self.select(creds["table"], **bounds))
+        yield from fetch_in_batches(cursor, batch_size)
+        cursor.close()
+
+    def bulk_cursor(self, connection):
+        """
+        Cursor modules.loader writes its batches through.
+        """
+        return connection.cursor()
+
+    def extract(self, creds, batch_size, **bounds):
+        from modules.extractor import stream_batches
+
+        return stream_batches(self.name, creds, batch_size, **bounds)
+
+    def load(self, creds, batches):
+        from modules.loader import load_batches
+
+        return load_batches(self.name, creds, batches)
+
+
+class PostgresConnector(Connector):
+    name = "PostgreSQL"
+    driver = "psycopg2"
+    package = "psycopg2-binary"
+    placeholder = "%s"
+    bulk_load = "copy"
+
+    def connect(self, creds):
+        return self.module().connect(
+            host=creds["host"],
+            port=creds["port"],
+            user=username(creds),
+            password=creds["password"],
+            dbname=creds["database"],
+            connect_timeout=int(CONNECT_TIMEOUT)
+        )
+
+    def streaming_cursor(self, connection, batch_size):
+        # a named cursor keeps the result set on the server
+        cursor = connection.cursor(name="atoa_extract")
+        cursor.itersize = batch_size
+        return cursor
+
+    def set_query_timeout(self, connection, timeout):
+        cursor = connection.cursor()
+        # SET LOCAL ends with the transaction, which the pool rolls back on release
+        cursor.execute(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+        cursor.close()
+        return lambda: None
+
+    def schema(self, connection, creds, timeout):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT * FROM {creds['table']} LIMIT {PREVIEW_ROWS};")
+        preview = cursor.fetchall()
+        description = cursor.description
+        cursor.execute(
+            "SELECT a.attname FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = %s::regclass AND i.indisprimary",
+            (creds["table"],),
+        )
+        primary_key = {row[0] for row in cursor.fetchall()}
+        # internal_size is -1 for every variable-length type, varchar(n) included
+        cursor.execute(
+            "SELECT c.column_name, c.character_maximum_length FROM information_schema.columns c "
+            "JOIN pg_class t ON t.relname = c.table_name "
+            "JOIN pg_namespace n ON n.oid = t.relnamespace AND n.nspname = c.table_schema "
+            "WHERE t.oid = %s::regclass",
+            (creds["table"],),
+        )
+        lengths = dict(cursor.fetchall())
+        schema = [
+            {"name": desc.name, "type": desc.type_code,
+             "size": lengths.get(desc.name) or (desc.internal_size if (desc.internal_size or 0) > 0 else None),
+             "precision": desc.precision, "scale": desc.scale, "primary_key": desc.name in primary_key}
+            for desc in description
+        ]
+        cursor.close()
+        return preview, schema
+
+    def stats(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT reltuples::bigint, pg_table_size(oid) FROM pg_class WHERE oid = %s::regclass",
+            (creds["table"],),
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        if row is None:
+            return None, None
+        # reltuples is -1 until the table was first vacuumed or analyzed
+        return (row[0] if row[0] >= 0 else None), row[1]
+
+    def list_tables(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = current_schema() AND table_type = 'BASE TABLE' ORDER BY table_name"
+        )
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return names
+
+    def foreign_keys(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT conrelid::regclass::text, confrelid::regclass::text FROM pg_constraint "
+            "WHERE contype = 'f' AND connamespace = current_schema()::regnamespace"
+        )
+        edges = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+        return edges
+
+
+class MySQLConnector(Connector):
+    name = "MySQL"
+    driver = "pymysql"
+    package = "pymysql"
+    placeholder = "%s"
+
+    def connect(self, creds):
+        return self.module().connect(
+            host=creds["host"],
+            port=int(creds["port"]),
+            user=username(creds),
+            password=creds["password"],
+            database=creds["database"],
+            connect_timeout=CONNECT_TIMEOUT
+        )
+
+    def streaming_cursor(self, connection, batch_size):
+        # SSCursor reads rows off the socket instead of buffering the whole result
+        return connection.cursor(self.module().cursors.SSCursor)
+
+    # (variable, units per second, type): MySQL's counts milliseconds, MariaDB's seconds
+    SESSION_TIMEOUTS = (("MAX_EXECUTION_TIME", 1000, int), ("max_statement_time", 1, float))
+
+    def set_query_timeout(self, connection, timeout):
+        cursor = connection.cursor()
+        try:
+            for variable, scale, kind in self.SESSION_TIMEOUTS:
+                try:
+                    cursor.execute(f"SELECT @@SESSION.{variable}")
+                except self.module().MySQLError:
+                    # "Unknown system variable": the other server flavour
+                    continue
+                previous = kind(cursor.fetchone()[0])
+                cursor.execute(f"SET SESSION {variable} = {kind(timeout * scale)}")
+                return lambda: self._set_session(connection, variable, previous)
+            # neither server knows a statement timeout; the preview runs unbounded
+            return lambda: None
+        finally:
+            cursor.close()
+
+    def _set_session(self, connection, variable, value):
+        cursor = connection.cursor()
+        cursor.execute(f"SET SESSION {variable} = {value}")
+        cursor.close()
+
+    def schema(self, connection, creds, timeout):
+        cursor = connection.cursor()
+        cursor.execute(f"DESCRIBE {creds['table']};")
+        schema = [
+            {"name": row[0], "type": row[1], "nullable": row[2] != "NO", "primary_key": row[3] == "PRI"}
+            for row in cursor.fetchall()
+        ]
+        cursor.execute(f"SELECT * FROM {creds['table']} LIMIT {PREVIEW_ROWS};")
+        preview = cursor.fetchall()
+        cursor.close()
+        return preview, schema
+
+    def stats(self, connection, creds):
+        cursor = connection.cursor()
+        # InnoDB's TABLE_ROWS is an estimate, which is all a plan needs
+        cursor.execute(
+            "SELECT TABLE_ROWS, DATA_LENGTH FROM information_schema.tables "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (creds["table"],),
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        return (row[0], row[1]) if row else (None, None)
+
+    def list_tables(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT TABLE_NAME FROM information_schema.tables "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' ORDER BY TABLE_NAME"
+        )
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return names
+
+    def foreign_keys(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT DISTINCT TABLE_NAME, REFERENCED_TABLE_NAME FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL"
+        )
+        edges = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+        return edges
+
+
+class MSSQLConnector(Connector):
+    name = "MSSQL"
+    driver = "pyodbc"
+    package = "pyodbc"
+    placeholder = "?"
+
+    def connect(self, creds):
+        return self.module().connect(
+            f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={creds["host"]},{creds["port"]};DATABASE={creds["database"]};UID={username(creds)};PWD={creds["password"]}',
+            timeout=int(CONNECT_TIMEOUT)
+        )
+
+    def bulk_cursor(self, connection):
+        cursor = connection.cursor()
+        # sends the whole parameter array in one round-trip
+        cursor.fast_executemany = True
+        return cursor
+
+    def set_query_timeout(self, connection, timeout):
+        previous = connection.timeout
+        connection.timeout = int(timeout)
+
+        def restore():
+            connection.timeout = previous
+        return restore
+
+    def sample(self, connection, creds, limit=PREVIEW_ROWS):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT TOP {int(limit)} * FROM {creds['table']};")
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def schema(self, connection, creds, timeout):
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT TOP {PREVIEW_ROWS} * FROM {creds['table']}")
+        preview = cursor.fetchall()
+        description = cursor.description
+        cursor.execute(
+            "SELECT c.name FROM sys.indexes i "
+            "JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id "
+            "JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id "
+            "WHERE i.object_id = OBJECT_ID(?) AND i.is_primary_key = 1",
+            (creds["table"],),
+        )
+        primary_key = {row[0] for row in cursor.fetchall()}
+        schema = [
+            {"name": column[0], "type": str(column[1]), "size": column[3],
+             "precision": column[4], "scale": column[5], "nullable": bool(column[6]),
+             "primary_key": column[0] in primary_key}
+            for column in description
+        ]
+        cursor.close()
+        return preview, schema
+
+    def stats(self, connection, creds):
+        cursor = connection.cursor()
+        # heap (0) or clustered index (1) partitions hold the rows; pages are 8 KB
+        cursor.execute(
+            "SELECT SUM(row_count), SUM(used_page_count) * 8192 FROM sys.dm_db_partition_stats "
+            "WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)",
+            (creds["table"],),
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        return (row[0], row[1]) if row else (None, None)
+
+    def list_tables(self, connection, creds):
+        cursor = connection.cursor()
+        # the login's default schema, whose tables the rest of the app addresses unqualified
+        cursor.execute("SELECT name FROM sys.tables WHERE is_ms_shipped = 0 AND schema_id = SCHEMA_ID() ORDER BY name")
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return names
+
+    def foreign_keys(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT OBJECT_NAME(parent_object_id), OBJECT_NAME(referenced_object_id) FROM sys.foreign_keys "
+            "WHERE schema_id = SCHEMA_ID()"
+        )
+        edges = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+        return edges
+
+
+class SQLiteConnector(Connector):
+    name = "SQLite"
+    driver = "sqlite3"
+    package = "sqlite3"
+    placeholder = "?"
+    fields = [
+        ("file_path", "SQLite File Path", False),
+        ("table", "Table Name", False),
+    ]
+
+    def connect(self, creds):
+        # pooled connections may be handed to a different Streamlit thread
+        return self.module().connect(creds["file_path"], check_same_thread=False)
+
+    def schema(self, connection, creds, timeout):
+        cursor = connection.cursor()
+        cursor.execute(f"PRAGMA table_info({creds['table']});")
+        schema = [
+            {"name": row[1], "type": row[2], "nullable": row[3] == 0, "primary_key": row[5] > 0}
+            for row in cursor.fetchall()
+        ]
+        cursor.execute(f"SELECT * FROM {creds['table']} LIMIT {PREVIEW_ROWS};")
+        preview = cursor.fetchall()
+        cursor.close()
+        return preview, schema
+
+    def stats(self, connection, creds):
+        cursor = connection.cursor()
+        rows = size = None
+        # sqlite_stat1 exists once ANALYZE ran; each of its rows starts with the table's row count
+        try:
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (creds["table"],))
+            row = cursor.fetchone()
+            if row:
+                rows = int(row[0].split()[0])
+        except Exception:
+            pass
+        # dbstat gives per-table pages when compiled in, otherwise the whole file is an upper bound
+        try:
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (creds["table"],))
+            size = cursor.fetchone()[0]
+        except Exception:
+            page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+            page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+            size = page_count * page_size
+        cursor.close()
+        return rows, size
+
+    def list_tables(self, connection, creds):
+        cursor = connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return names
+
+    def foreign_keys(self, connection, creds):
+        cursor = connection.cursor()
+        edges = []
+        for table in self.list_tables(connection, creds):
+            # the third column of foreign_key_list is the referenced table
+            cursor.execute(f"PRAGMA foreign_key_list({table})")
+            edges.extend((table, row[2]) for row in cursor.fetchall())
+        cursor.close()
+        return list(dict.fromkeys(edges))
+
+
+class MongoConnector(Connector):
+    name = "MongoDB"
+    driver = "pymongo"
+    package = "pymongo"
+    fields = [
+        ("uri", "Mongo URI (e.g., mongodb+srv://...)", False),
+        ("database", "Database Name", False),
+        ("collection", "Collection Name", False),
+    ]
+    bulk_load = "insert_many"
+
+    def connect(self, creds):
+        return self.module().MongoClient(
+            creds["uri"],
+            connectTimeoutMS=int(CONNECT_TIMEOUT * 1000),
+            serverSelectionTimeoutMS=int(CONNECT_TIMEOUT * 1000)
+        )
+
+    def sample(self, connection, creds, limit=PREVIEW_ROWS):
+        return list(connection[creds["database"]][creds["collection"]].find().limit(limit))
+
+    def stream(self, connection, creds, batch_size, bounds):
+        # documents come as (None, documents) batches
+        collection = connection[creds["database"]][creds["collection"]]
+        batch = []
+        cursor = collection.find(mongo_filter(**bounds), batch_size=batch_size)
+        if bounds["key"] is not None and bounds["ordered"]:
+            cursor = cursor.sort(bounds["key"], 1)
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield None, batch
+                batch = []
+        if batch:
+            yield None, batch
+
+    def schema(self, connection, creds, timeout):
+        from modules.mongo_schema import MONGO_SAMPLE_SIZE, infer_schema, sample_documents
+
+        collection = connection[creds["database"]][creds["collection"]]
+        preview = list(collection.find().limit(PREVIEW_ROWS).max_time_ms(int(timeout * 1000)))
+        # one document hides missing fields and mixed types, so infer from a sample
+        schema = infer_schema(sample_documents(collection, MONGO_SAMPLE_SIZE, timeout)) if preview else []
+        return preview, schema
+
+    def stats(self, connection, creds):
+        database = connection[creds["database"]]
+        rows = database[creds["collection"]].estimated_document_count()
+        try:
+            size = database.command("collStats", creds["collection"]).get("size")
+        except Exception:
+            size = None
+        return rows, size
+
+    def list_tables(self, connection, creds):
+        names = connection[creds["database"]].list_collection_names()
+        return sorted(name for name in names if not name.startswith("system."))
+
+
+# ---------------- Registry ----------------
+
+_connectors = {}
+
+
+def register_connector(connector):
+    """
+    Adds (or replaces) the connector for connector.name.
+    """
+    _connectors[connector.name] = connector
+    return connector
+
+
+def get_connector(db_type):
+    try:
+        return _connectors[db_type]
+    except KeyError:
+        raise ValueError(f"Unsupported database type: {db_type}") from None
+
+
+def connector_names():
+    return list(_connectors)
+
+
+for _connector in (PostgresConnector(), MySQLConnector(), MSSQLConnector(), MongoConnector(), SQLiteConnector()):
+    register_connector(_connector)
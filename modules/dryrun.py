@@ -0,0 +1,614 @@
+# modules/dryrun.py
+import collections
+import csv
+import datetime
+import decimal
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import socket
+import sqlite3
+import tempfile
+import time
+
+from modules.codecache import fill_credentials
+from modules.connections import borrow_connection
+from modules.connectors import get_connector
+from modules.executor import run_etl_job_subprocess
+from modules.typemap import create_table_sql
+from modules.validator import validate_and_fetch_schema
+
+# source rows copied into the replicas
+DRY_RUN_ROWS = int(os.getenv("ATOA_DRY_RUN_ROWS", "100"))
+DRY_RUN_TIMEOUT = float(os.getenv("ATOA_DRY_RUN_TIMEOUT", "60"))
+# rows per replica table read back after the script ran
+DRY_RUN_DUMP_ROWS = 10_000
+# added/removed rows shown in the report
+DRY_RUN_DIFF_ROWS = 20
+
+# stands in for every host in the script's credentials; .invalid never resolves
+DRY_RUN_HOST = "atoa-dryrun.invalid"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs the script in a fresh interpreter with its drivers pointed at the replicas
+HARNESS = """
+import sys
+sys.path.insert(0, {root!r})
+from modules.dryrun import install_replicas, dump_replicas
+install_replicas({spec!r})
+dump_replicas({before!r})
+try:
+    exec(compile({code!r}, "etl_script.py", "exec"), {{"__name__": "__main__"}})
+finally:
+    dump_replicas({result!r})
+"""
+
+
+def code_fingerprint(code):
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def _scalar(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _database_id(db_type, creds):
+    return creds.get("file_path") if db_type == "SQLite" else creds.get("database")
+
+
+def stand_in_creds(db_type, creds, name):
+    """
+    creds with every connection field replaced by a value naming the replica `name`,
+    for filling in the script's credential placeholders: the dry run never hands the
+    script anything that reaches the real database.
+    """
+    values = {"host": DRY_RUN_HOST, "user": "atoa_dryrun", "username": "atoa_dryrun", "password": "atoa_dryrun",
+              "database": name, "file_path": f"{name}.db", "uri": f"mongodb://{name}.{DRY_RUN_HOST}:27017/"}
+    return {**creds, **{field: value for field, value in values.items() if field in creds}}
+
+
+def capture_sample(db_type, creds, rows=DRY_RUN_ROWS):
+    """
+    The table/collection's schema and its first `rows` rows, read with a LIMIT query.
+    Returns (schema, rows); schema is None when the table doesn't exist.
+    """
+    status, preview, schema = validate_and_fetch_schema(db_type, creds)
+    if status.startswith("Error"):
+        return None, []
+    with borrow_connection(db_type, creds) as connection:
+        sample = get_connector(db_type).sample(connection, creds, rows)
+    return schema, list(sample)
+
+
+def build_spec(source_type, source_creds, target_type, target_creds, rows=DRY_RUN_ROWS):
+    """
+    Replica description for install_replicas: one SQLite database per source/target
+    database (shared when both are the same), or one mongomock collection, named after
+    the stand-in credentials the script gets (spec["creds"], see stand_in_creds).
+    Raises if the source can't be sampled; a missing target table is left for the script to create.
+    """
+    sql, mongo, names, stand_ins = {}, [], {}, {}
+    for role, db_type, creds in (("source", source_type, source_creds), ("target", target_type, target_creds)):
+        real_id = (db_type, creds.get("uri"), _database_id(db_type, creds))
+        stand_in = stand_in_creds(db_type, creds, names.setdefault(real_id, f"atoa_dryrun_{len(names)}"))
+        stand_ins[role] = stand_in
+        schema, sample = capture_sample(db_type, creds, rows)
+        if role == "source" and schema is None:
+            raise RuntimeError(f"Could not read a sample from the source {db_type}")
+        if db_type == "MongoDB":
+            from bson import json_util
+
+            mongo.append({"role": role, "uri": stand_in["uri"], "database": stand_in["database"],
+                          "collection": creds["collection"], "documents": json_util.dumps(sample)})
+            continue
+        database = _database_id(db_type, stand_in)
+        replica = sql.setdefault((db_type, database), {"db_type": db_type, "database": database, "tables": []})
+        table = {"role": role, "table": creds["table"], "ddl": None, "columns": [], "rows": []}
+        if schema:
+            table["ddl"] = create_table_sql(db_type, schema, "SQLite", creds["table"])
+            table["columns"] = [column["name"] for column in schema]
+            table["rows"] = [[_scalar(v) for v in row] for row in sample]
+        if not any(t["table"] == table["table"] for t in replica["tables"]):
+            replica["tables"].append(table)
+    return {"sql": list(sql.values()), "mongo": mongo, "creds": stand_ins}
+
+
+def dry_run(code, source_type, source_creds, target_type, target_creds, rows=DRY_RUN_ROWS, timeout=DRY_RUN_TIMEOUT):
+    """
+    Runs an ETL script against in-memory replicas holding a sample of the source
+    (and of the target, when it exists) instead of the real databases.
+    code is the script with its __ATOA_..__ credential placeholders still in it; they are
+    filled with stand-ins that only the replicas answer to, and any other attempt to
+    reach a database or the network fails the run.
+    Returns a report with the exit status, output, row counts and the rows the
+    script added to or removed from the target; report["ok"] says whether a full
+    run looks safe.
+    """
+    started = time.perf_counter()
+    report = {"ok": False, "code": code_fingerprint(code), "status": None, "stdout": "", "stderr": "",
+              "sample_rows": 0, "target_rows_before": 0, "target_rows_after": 0, "added": [], "removed": [],
+              "added_count": 0, "removed_count": 0, "tables": {}, "warnings": [], "error": None}
+    try:
+        spec = build_spec(source_type, source_creds, target_type, target_creds, rows)
+    except Exception as e:
+        report["error"] = f"Sampling failed: {e}"
+        return report
+    report["sample_rows"] = sum(len(t["rows"]) for r in spec["sql"] for t in r["tables"] if t["role"] == "source") + sum(
+        len(json.loads(m["documents"])) for m in spec["mongo"] if m["role"] == "source")
+
+    script = fill_credentials(code, spec["creds"]["source"], spec["creds"]["target"])
+
+    workdir = tempfile.mkdtemp(prefix="atoa_dryrun_")
+    paths = {name: os.path.join(workdir, f"{name}.json") for name in ("spec", "before", "result")}
+    with open(paths["spec"], "w") as f:
+        json.dump(spec, f)
+    try:
+        harness = HARNESS.format(root=ROOT, spec=paths["spec"], before=paths["before"], code=script,
+                                 result=paths["result"])
+        out, err, status = run_etl_job_subprocess(harness, timeout)
+        report.update(stdout=out, stderr=err, status=status)
+        before, result = _read_json(paths["before"]), _read_json(paths["result"])
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(workdir)
+
+    report["tables"] = {name: len(table["rows"]) for name, table in result.items()}
+    target = _result_name(target_type, spec["creds"]["target"])
+    _diff(report, before.get(target, {"rows": []})["rows"], result.get(target, {"rows": []})["rows"])
+    report["seconds"] = round(time.perf_counter() - started, 2)
+
+    if status != 0:
+        lines = err.strip().splitlines()
+        report["error"] = lines[-1] if lines else f"Script exited with status {status}"
+        if {source_type, target_type} - {"SQLite"}:
+            report["warnings"].append("The replicas are SQLite/mongomock, so an error in database-specific SQL "
+                                      "may not happen on the real databases.")
+    elif report["added_count"] == 0 and report["removed_count"] == 0:
+        report["warnings"].append("The script finished but didn't change the target.")
+    elif report["added_count"] > report["sample_rows"] > 0:
+        report["warnings"].append(f"{report['added_count']} rows were added from a {report['sample_rows']}-row sample; "
+                                  "check for duplicate loads.")
+    report["ok"] = status == 0 and report["added_count"] + report["removed_count"] > 0
+    return report
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _result_name(db_type, creds):
+    if db_type == "MongoDB":
+        return f"MongoDB {creds['database']}.{creds['collection']}"
+    return f"{db_type} {_database_id(db_type, creds)}.{creds['table']}"
+
+
+def _diff(report, before, after):
+    remaining = collections.Counter(before)
+    added = []
+    for row in after:
+        if remaining[row] > 0:
+            remaining[row] -= 1
+        else:
+            added.append(row)
+    removed = list(remaining.elements())
+    report.update(
+        target_rows_before=len(before), target_rows_after=len(after),
+        added_count=len(added), removed_count=len(removed),
+        added=[json.loads(row) for row in added[:DRY_RUN_DIFF_ROWS]],
+        removed=[json.loads(row) for row in removed[:DRY_RUN_DIFF_ROWS]],
+    )
+
+
+# ---------------- Replica side (runs inside the dry-run process) ----------------
+
+_real_sqlite_connect = sqlite3.connect
+_replicas = {}
+_keepers = []
+_mongo_clients = {}
+
+# pyformat parameters (psycopg2, pymysql) in qmark/named form for sqlite3
+_PYFORMAT = re.compile(r"%\((\w+)\)s|%s|%%")
+# the dialect differences generated scripts hit most, rewritten to what SQLite accepts
+DIALECT_REWRITES = [
+    (re.compile(r"\bAUTO_INCREMENT\b(\s*=\s*\d+)?", re.I), ""),
+    (re.compile(r"\bIDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)", re.I), ""),
+    (re.compile(r"\)\s*ENGINE\s*=\s*\w+[^;]*", re.I), ")"),
+    (re.compile(r"\(\s*MAX\s*\)", re.I), ""),
+    (re.compile(r"::\w+(\[\])?"), ""),
+]
+
+
+# COPY <table> [(columns)] FROM STDIN / COPY {<table> | (<query>)} TO STDOUT [[WITH] options]
+_COPY = re.compile(r"\s*COPY\s+(?:\((?P<query>.+)\)|(?P<table>[\w.\"]+)\s*(?:\((?P<columns>[^)]*)\))?)"
+                   r"\s+(?P<direction>FROM|TO)\s+(?:STDIN|STDOUT)\b(?P<options>.*?);?\s*$", re.I | re.S)
+# backslash escapes of COPY's text format
+_COPY_ESCAPES = re.compile(r"\\(.)")
+_ESCAPED = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", "v": "\v"}
+
+
+def _unescape(match):
+    return _ESCAPED.get(match.group(1), match.group(1))
+
+
+def _copy_escape(value):
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_option(options, name):
+    match = re.search(rf"\b{name}\s+(?:AS\s+)?(E?)'((?:[^']|'')*)'", options, re.I)
+    if match is None:
+        return None
+    value = match.group(2).replace("''", "'")
+    return _COPY_ESCAPES.sub(_unescape, value) if match.group(1) else value
+
+
+def _sqlite_query(query, pyformat):
+    for pattern, replacement in DIALECT_REWRITES:
+        query = pattern.sub(replacement, query)
+    if pyformat:
+        query = _PYFORMAT.sub(
+            lambda m: f":{m.group(1)}" if m.group(1) else "?" if m.group(0) == "%s" else "%", query)
+    return query
+
+
+class ReplicaCursor:
+    """
+    DB-API cursor over a SQLite replica that accepts the calling driver's SQL.
+    """
+
+    def __init__(self, cursor, pyformat):
+        self._cursor = cursor
+        self._pyformat = pyformat
+
+    def execute(self, query, params=None):
+        query = _sqlite_query(query, self._pyformat and params is not None)
+        self._cursor.execute(query, params if params is not None else ())
+        return self
+
+    def executemany(self, query, params):
+        self._cursor.executemany(_sqlite_query(query, self._pyformat), params)
+        return self
+
+    def copy_expert(self, sql, file, size=8192):
+        match = _COPY.match(sql)
+        if match is None:
+            raise NotImplementedError(f"Dry run: unsupported COPY statement: {sql}")
+        options = match.group("options")
+        csv_format = re.search(r"\bCSV\b", options, re.I) is not None
+        delimiter = _copy_option(options, "DELIMITER") or ("," if csv_format else "\t")
+        null = _copy_option(options, "NULL")
+        null = null if null is not None else ("" if csv_format else "\\N")
+        header = re.search(r"\bHEADER\b(?!\s+(FALSE|OFF|0)\b)", options, re.I) is not None
+        columns = [c.strip() for c in match.group("columns").split(",")] if match.group("columns") else None
+        if match.group("direction").upper() == "FROM":
+            if match.group("query"):
+                raise NotImplementedError("Dry run: COPY FROM needs a table")
+            self._copy_in(file, match.group("table"), columns, csv_format, delimiter, null, header)
+        else:
+            query = match.group("query") or f"SELECT {', '.join(columns) if columns else '*'} FROM {match.group('table')}"
+            self._copy_out(file, query, csv_format, delimiter, null, header)
+
+    def copy_from(self, file, table, sep="\t", null="\\N", size=8192, columns=None):
+        self._copy_in(file, table, list(columns) if columns else None, False, sep, null, False)
+
+    def copy_to(self, file, table, sep="\t", null="\\N", columns=None):
+        self._copy_out(file, f"SELECT {', '.join(columns) if columns else '*'} FROM {table}", False, sep, null, False)
+
+    def _copy_in(self, file, table, columns, csv_format, delimiter, null, header):
+        # COPY ... FROM STDIN as an executemany of the parsed rows
+        data = file.read()
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode()
+        if csv_format:
+            rows = list(csv.reader(io.StringIO(data), delimiter=delimiter))
+        else:
+            lines = [line for line in data.split("\n") if line and line != "\\."]
+            rows = [[_COPY_ESCAPES.sub(_unescape, v) if v != null else v for v in line.split(delimiter)]
+                    for line in lines]
+        if header:
+            rows = rows[1:]
+        rows = [[None if v == null else v for v in row] for row in rows if row]
+        if not rows:
+            self._cursor.execute("SELECT 1 WHERE 0")
+            return
+        names = f" ({', '.join(columns)})" if columns else ""
+        self._cursor.executemany(f"INSERT INTO {table}{names} VALUES ({', '.join(['?'] * len(rows[0]))})", rows)
+
+    def _copy_out(self, file, query, csv_format, delimiter, null, header):
+        self._cursor.execute(_sqlite_query(query, False))
+        out = io.StringIO()
+        if csv_format:
+            writer = csv.writer(out, delimiter=delimiter, lineterminator="\n")
+            if header:
+                writer.writerow([desc[0] for desc in self._cursor.description])
+            writer.writerows([null if v is None else v for v in row] for row in self._cursor.fetchall())
+        else:
+            for row in self._cursor.fetchall():
+                out.write(delimiter.join(null if v is None else _copy_escape(str(v)) for v in row) + "\n")
+        try:
+            file.write(out.getvalue())
+        except TypeError:
+            file.write(out.getvalue().encode())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class ReplicaConnection:
+    def __init__(self, uri, pyformat):
+        self._connection = _real_sqlite_connect(uri, uri=True, check_same_thread=False)
+        self._pyformat = pyformat
+        self.autocommit = False
+
+    def cursor(self, *args, **kwargs):
+        # driver-specific cursor classes (DictCursor, named cursors) get a plain cursor
+        return ReplicaCursor(self._connection.cursor(), self._pyformat)
+
+    def execute(self, query, params=None):
+        return self.cursor().execute(query, params)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self._connection.commit()
+        else:
+            self._connection.rollback()
+
+
+def _replica_uri(db_type, database):
+    if (db_type, database) in _replicas:
+        return _replicas[(db_type, database)]
+    candidates = [uri for (kind, _), uri in _replicas.items() if kind == db_type]
+    if len(candidates) == 1:
+        return candidates[0]
+    raise RuntimeError(f"Dry run: no {db_type} replica for database {database!r}")
+
+
+def _dsn_value(dsn, *names):
+    for name in names:
+        match = re.search(rf"\b{name}\s*=\s*([^;\s]+)", dsn or "", re.I)
+        if match:
+            return match.group(1)
+    return None
+
+
+def _connect_postgres(dsn=None, **kwargs):
+    database = kwargs.get("dbname") or kwargs.get("database") or _dsn_value(dsn, "dbname")
+    if database is None and dsn and "://" in dsn:
+        database = dsn.rsplit("/", 1)[-1].split("?")[0]
+    return ReplicaConnection(_replica_uri("PostgreSQL", database), pyformat=True)
+
+
+def _connect_mysql(*args, **kwargs):
+    database = kwargs.get("database") or kwargs.get("db") or (args[3] if len(args) > 3 else None)
+    return ReplicaConnection(_replica_uri("MySQL", database), pyformat=True)
+
+
+def _connect_pg8000(*args, **kwargs):
+    return ReplicaConnection(_replica_uri("PostgreSQL", kwargs.get("database")), pyformat=True)
+
+
+def _connect_mssql(connection_string="", **kwargs):
+    database = _dsn_value(connection_string, "DATABASE", "Initial Catalog")
+    return ReplicaConnection(_replica_uri("MSSQL", database), pyformat=False)
+
+
+def _connect_pymssql(*args, **kwargs):
+    database = kwargs.get("database") or (args[3] if len(args) > 3 else None)
+    return ReplicaConnection(_replica_uri("MSSQL", database), pyformat=True)
+
+
+def _connect_sqlite(database, *args, **kwargs):
+    name = os.fsdecode(database)
+    for (db_type, path), uri in _replicas.items():
+        if db_type == "SQLite" and (name == path or os.path.basename(name) == path):
+            return ReplicaConnection(uri, pyformat=False)
+    if name == ":memory:" or (kwargs.get("uri") and "mode=memory" in name):
+        # scratch databases are harmless
+        return _real_sqlite_connect(database, *args, **kwargs)
+    raise RuntimeError(f"Dry run: {name!r} is not a replica; only the stand-in SQLite paths can be opened")
+
+
+def _no_network(*args, **kwargs):
+    raise ConnectionRefusedError("Dry run: network connections are blocked; the script may only use the replicas")
+
+
+# connect functions pointed at the replicas; a script using any other way to connect fails
+DRIVER_PATCHES = [
+    ("psycopg2", ("connect",), _connect_postgres),
+    ("psycopg", ("connect",), _connect_postgres),
+    ("pg8000", ("connect",), _connect_pg8000),
+    ("pg8000.dbapi", ("connect",), _connect_pg8000),
+    ("pymysql", ("connect", "Connect"), _connect_mysql),
+    ("MySQLdb", ("connect", "Connect"), _connect_mysql),
+    ("mysql.connector", ("connect",), _connect_mysql),
+    ("pyodbc", ("connect",), _connect_mssql),
+    ("pymssql", ("connect",), _connect_pymssql),
+]
+
+
+def _mongo_client(host=None, *args, **kwargs):
+    import mongomock
+
+    if host in _mongo_clients:
+        return _mongo_clients[host]
+    if len(_mongo_clients) == 1:
+        return next(iter(_mongo_clients.values()))
+    return _mongo_clients.setdefault(host, mongomock.MongoClient())
+
+
+def _patch_drivers():
+    # pure-Python drivers and HTTP clients can't get past this; the C drivers are patched below
+    socket.socket.connect = socket.socket.connect_ex = _no_network
+    socket.create_connection = _no_network
+    sqlite3.connect = _connect_sqlite
+    for module, names, replacement in DRIVER_PATCHES:
+        try:
+            driver = importlib.import_module(module)
+        except ImportError:
+            continue
+        for name in names:
+            setattr(driver, name, replacement)
+    try:
+        import psycopg
+
+        psycopg.Connection.connect = classmethod(lambda cls, *args, **kwargs: _connect_postgres(*args, **kwargs))
+    except ImportError:
+        pass
+    try:
+        import psycopg2.extras
+
+        execute_values, execute_batch = psycopg2.extras.execute_values, psycopg2.extras.execute_batch
+
+        def replica_execute_values(cursor, query, argslist, *args, **kwargs):
+            if not isinstance(cursor, ReplicaCursor):
+                return execute_values(cursor, query, argslist, *args, **kwargs)
+            argslist = list(argslist)
+            if argslist:
+                row = ", ".join(["%s"] * len(argslist[0]))
+                cursor.executemany(query.replace("%s", f"({row})", 1), argslist)
+
+        def replica_execute_batch(cursor, query, argslist, *args, **kwargs):
+            if not isinstance(cursor, ReplicaCursor):
+                return execute_batch(cursor, query, argslist, *args, **kwargs)
+            cursor.executemany(query, list(argslist))
+
+        psycopg2.extras.execute_values = replica_execute_values
+        psycopg2.extras.execute_batch = replica_execute_batch
+    except ImportError:
+        pass
+    try:
+        import pymongo
+
+        pymongo.MongoClient = _mongo_client
+    except ImportError:
+        pass
+    try:
+        import sqlalchemy
+        from sqlalchemy.engine import make_url
+
+        create_engine = sqlalchemy.create_engine
+        dialects = {"postgresql": "PostgreSQL", "mysql": "MySQL", "mssql": "MSSQL", "sqlite": "SQLite"}
+
+        def replica_create_engine(url, *args, **kwargs):
+            parsed = make_url(url)
+            db_type = dialects.get(parsed.get_backend_name())
+            if db_type is None:
+                raise RuntimeError(f"Dry run: no replica for SQLAlchemy dialect {parsed.get_backend_name()!r}")
+            uri = _replica_uri(db_type, parsed.database)
+            return create_engine("sqlite://", creator=lambda: _real_sqlite_connect(uri, uri=True, check_same_thread=False))
+
+        sqlalchemy.create_engine = replica_create_engine
+    except ImportError:
+        pass
+
+
+def install_replicas(spec_path):
+    """
+    Builds the replicas described by build_spec in this process and points the
+    database drivers at them. In-memory SQLite databases live as long as one
+    connection to them stays open, so a keeper connection is held for each.
+    """
+    with open(spec_path) as f:
+        spec = json.load(f)
+    for index, replica in enumerate(spec["sql"]):
+        uri = f"file:atoa_dryrun_{index}?mode=memory&cache=shared"
+        keeper = _real_sqlite_connect(uri, uri=True, check_same_thread=False)
+        for table in replica["tables"]:
+            if not table["ddl"]:
+                continue
+            keeper.execute(table["ddl"])
+            if table["rows"]:
+                placeholders = ", ".join(["?"] * len(table["columns"]))
+                keeper.executemany(
+                    f"INSERT INTO {table['table']} ({', '.join(table['columns'])}) VALUES ({placeholders})",
+                    table["rows"],
+                )
+        keeper.commit()
+        _keepers.append(keeper)
+        _replicas[(replica["db_type"], replica["database"])] = uri
+    if spec["mongo"]:
+        try:
+            import mongomock
+        except ImportError:
+            raise ImportError("Dry runs involving MongoDB need the 'mongomock' package") from None
+        from bson import json_util
+
+        for entry in spec["mongo"]:
+            client = _mongo_clients.setdefault(entry["uri"], mongomock.MongoClient())
+            documents = json_util.loads(entry["documents"])
+            if documents:
+                client[entry["database"]][entry["collection"]].insert_many(documents)
+    _patch_drivers()
+
+
+def dump_replicas(result_path):
+    """
+    Writes every replica table/collection's rows to result_path as JSON.
+    """
+    result = {}
+    for (db_type, database), uri in _replicas.items():
+        connection = _real_sqlite_connect(uri, uri=True)
+        tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        for table in tables:
+            cursor = connection.execute(f'SELECT * FROM "{table}" LIMIT {DRY_RUN_DUMP_ROWS}')
+            result[f"{db_type} {database}.{table}"] = {
+                "columns": [desc[0] for desc in cursor.description],
+                "rows": [json.dumps([_scalar(v) for v in row]) for row in cursor.fetchall()],
+            }
+        connection.close()
+    if _mongo_clients:
+        from bson import json_util
+
+        for client in {id(c): c for c in _mongo_clients.values()}.values():
+            for database in client.list_database_names():
+                for name in client[database].list_collection_names():
+                    documents = client[database][name].find().limit(DRY_RUN_DUMP_ROWS)
+                    result[f"MongoDB {database}.{name}"] = {
+                        "columns": None,
+                        "rows": [json_util.dumps(doc, sort_keys=True) for doc in documents],
+                    }
+    with open(result_path, "w") as f:
+        json.dump(result, f)
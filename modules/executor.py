@@ -1,61 +1,335 @@
+import atexit
+import io
+import multiprocessing
+import os
+import queue
+import runpy
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
 
-def run_etl_script(code: str) -> tuple[str, str]:
-    import subprocess
-    import tempfile
+from modules.metrics import rss_mb
 
+# imported once in the forkserver, so every worker starts with the drivers loaded
+PRELOAD_MODULES = ["numpy", "pandas", "pyarrow", "sqlalchemy", "psycopg2", "pymysql", "pyodbc", "pymongo", "sqlite3"]
+WORKER_POOL_SIZE = int(os.getenv("ATOA_WORKER_POOL_SIZE", "2"))
+WORKER_MAX_JOBS = int(os.getenv("ATOA_WORKER_MAX_JOBS", "20"))
+WORKER_MAX_RSS_MB = int(os.getenv("ATOA_WORKER_MAX_RSS_MB", "2048"))
+# how often workers forward output and the parent checks for cancel/timeout
+OUTPUT_INTERVAL = 0.2
+POLL_INTERVAL = 0.1
+
+
+def _filter_stderr(stderr):
+    # Filter out known numpy warning
+    return "\n".join(
+        line for line in stderr.splitlines()
+        if "numpy/_core/getlimits.py" not in line
+    )
+
+
+def _write_temp_script(code):
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".py", prefix="atoa_etl_", delete=False) as f:
+        f.write(code)
+        return f.name
+
+
+def _remove_quietly(path):
     try:
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
-            f.write(code)
-            temp_path = f.name
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _StreamWriter(io.TextIOBase):
+    """
+    stdout/stderr replacement in a worker: keeps everything and forwards finished
+    lines to the parent every OUTPUT_INTERVAL seconds.
+    """
+
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.chunks = []
+        self.pending = []
+        self.last_sent = 0.0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.pending.append(text)
+        if "\n" in text and time.monotonic() - self.last_sent >= OUTPUT_INTERVAL:
+            self.flush()
+        return len(text)
 
-        result = subprocess.run(["python", temp_path], capture_output=True, text=True)
+    def flush(self):
+        if self.pending:
+            self.conn.send(("output", self.name, "".join(self.pending)))
+            self.pending = []
+            self.last_sent = time.monotonic()
 
-        # Filter out known numpy warning
-        filtered_stderr = "\n".join(
-            line for line in result.stderr.splitlines()
-            if "numpy/_core/getlimits.py" not in line
+    def getvalue(self):
+        return "".join(self.chunks)
+
+
+def _worker_main(conn, max_jobs, max_rss_mb):
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    jobs = 0
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            return
+        if path is None:
+            return
+        out, err = _StreamWriter(conn, "stdout"), _StreamWriter(conn, "stderr")
+        status = 0
+        sys.argv = [path]
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                runpy.run_path(path, run_name="__main__")
+            except SystemExit as e:
+                if e.code not in (None, 0):
+                    status = e.code if isinstance(e.code, int) else 1
+                    print(f"Script exited with status {e.code}", file=sys.stderr)
+            except BaseException as e:
+                status = 1
+                # start the traceback at the script, not at the worker/runpy frames
+                tb = e.__traceback__
+                while tb is not None and tb.tb_frame.f_code.co_filename != path:
+                    tb = tb.tb_next
+                traceback.print_exception(type(e), e, tb or e.__traceback__)
+        out.flush()
+        err.flush()
+        jobs += 1
+        # scripts share the interpreter, so recycle before leaks or globals pile up
+        recycle = jobs >= max_jobs or (rss_mb() or 0) > max_rss_mb
+        conn.send(("done", out.getvalue(), err.getvalue(), status, recycle))
+        if recycle:
+            return
+
+
+class WorkerPool:
+    """
+    Pre-warmed Python workers that run ETL scripts sent over a pipe.
+    Workers fork from a forkserver that already imported the database drivers (or are
+    spawned where there is no forkserver), and are replaced after max_jobs scripts or once their RSS passes max_rss_mb.
+    """
+
+    def __init__(self, size=WORKER_POOL_SIZE, max_jobs=WORKER_MAX_JOBS, max_rss_mb=WORKER_MAX_RSS_MB):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload(PRELOAD_MODULES)
+        else:
+            # no forkserver on Windows; spawned workers import the drivers themselves before their first script
+            self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.max_jobs, self.max_rss_mb)
         )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _replace(self, worker):
+        process, conn = worker
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+        return self._spawn()
+
+    def run(self, code, timeout=None):
+        out, err, status = self.execute(code, timeout)
+        return out, err
+
+    def execute(self, code, timeout=None, on_output=None, cancel=None):
+        """
+        Runs code in an idle worker and returns (stdout, stderr, exit_status).
+        on_output(stream_name, text) receives output while the script runs;
+        setting the cancel event (or passing timeout) kills the worker.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        worker = None
+        # all workers may be busy; keep honouring cancel/timeout while waiting for one
+        while worker is None:
+            if cancel is not None and cancel.is_set():
+                return "", "❌ Script cancelled", -1
+            if deadline is not None and time.monotonic() >= deadline:
+                return "", f"❌ Script timed out after {timeout}s", -1
+            try:
+                worker = self._idle.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        path = _write_temp_script(code)
+        out, err = [], []
+        try:
+            process, conn = worker
+            conn.send(path)
+            while True:
+                if cancel is not None and cancel.is_set():
+                    worker = self._replace(worker)
+                    return "".join(out).strip(), "❌ Script cancelled", -1
+                if deadline is not None and time.monotonic() >= deadline:
+                    worker = self._replace(worker)
+                    return "".join(out).strip(), f"❌ Script timed out after {timeout}s", -1
+                if not conn.poll(POLL_INTERVAL):
+                    continue
+                message = conn.recv()
+                if message[0] == "output":
+                    _, name, text = message
+                    (out if name == "stdout" else err).append(text)
+                    if on_output:
+                        on_output(name, text)
+                    continue
+                _, stdout, stderr, status, recycle = message
+                if recycle:
+                    process.join()
+                    worker = self._replace(worker)
+                return stdout.strip(), _filter_stderr(stderr).strip(), status
+        except (EOFError, OSError):
+            worker = self._replace(worker)
+            return "".join(out).strip(), "❌ Worker process died while running the script", -1
+        finally:
+            self._idle.put(worker)
+            _remove_quietly(path)
+
+    def close(self):
+        while True:
+            try:
+                process, conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
 
-        return result.stdout.strip(), filtered_stderr.strip()
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = WorkerPool()
+            # workers aren't daemonic (scripts may start their own processes), so stop them on exit
+            atexit.register(_worker_pool.close)
+        return _worker_pool
+
+
+def warm_worker_pool():
+    """
+    Starts the worker pool in the background. The forkserver imports every driver
+    before the first worker exists, which would otherwise hold up whoever asks first.
+    """
+    if _worker_pool is None:
+        threading.Thread(target=get_worker_pool, name="atoa-warm-workers", daemon=True).start()
+
+
+def run_etl_script(code: str, timeout=None) -> tuple[str, str]:
+    out, err, status = run_etl_job(code, timeout)
+    return out, err
+
+
+def run_etl_job(code: str, timeout=None, on_output=None, cancel=None) -> tuple[str, str, int]:
+    """
+    Runs a script locally and returns (stdout, stderr, exit_status); a non-zero status
+    means it failed. on_output and cancel are passed through to WorkerPool.execute.
+    """
+    # ATOA_EXECUTOR=subprocess runs every script in a fresh interpreter instead
+    if os.getenv("ATOA_EXECUTOR") == "subprocess":
+        return run_etl_job_subprocess(code, timeout, on_output, cancel)
+    try:
+        return get_worker_pool().execute(code, timeout, on_output, cancel)
     except Exception as e:
-        return "", f"❌ Error running script: {e}"
+        return "", f"❌ Error running script: {e}", -1
 
-import paramiko
 
-def run_etl_script_remote_password(code: str, ssh_user: str, ssh_host: str, ssh_password: str) -> tuple[str, str]:
-    print("==========================enetred ssh block")
+def run_etl_script_subprocess(code: str, timeout=None) -> tuple[str, str]:
+    out, err, status = run_etl_job_subprocess(code, timeout)
+    return out, err
+
+
+def run_etl_job_subprocess(code: str, timeout=None, on_output=None, cancel=None) -> tuple[str, str, int]:
+    path = None
     try:
-        # Save the code temporarily
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
-            f.write(code)
-            local_path = f.name
-            remote_path = f"/tmp/{f.name.split('/')[-1]}"
-
-        # Setup SSH connection
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(hostname=ssh_host, username=ssh_user, password=ssh_password)
-
-        # Use SFTP to upload the file
-        sftp = ssh.open_sftp()
-        sftp.put(local_path, remote_path)
-        sftp.close()
-
-        # Run the script
-        stdin, stdout, stderr = ssh.exec_command(f"python3 {remote_path}")
-
-        out = stdout.read().decode()
-        err = stderr.read().decode()
-
-        # Filter warnings
-        filtered_err = "\n".join(
-            line for line in err.splitlines()
-            if "numpy/_core/getlimits.py" not in line
-        )
+        path = _write_temp_script(code)
+        process = subprocess.Popen([sys.executable, path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        out, err = [], []
+
+        def pump(stream, name, chunks):
+            for line in stream:
+                chunks.append(line)
+                if on_output:
+                    on_output(name, line)
+
+        readers = [
+            threading.Thread(target=pump, args=(process.stdout, "stdout", out), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, "stderr", err), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        message = None
+        while process.poll() is None:
+            if cancel is not None and cancel.is_set():
+                message = "❌ Script cancelled"
+            elif deadline is not None and time.monotonic() >= deadline:
+                message = f"❌ Script timed out after {timeout}s"
+            if message:
+                process.kill()
+                break
+            time.sleep(POLL_INTERVAL)
+        process.wait()
+        for reader in readers:
+            reader.join()
+        if message:
+            return "".join(out).strip(), message, -1
+        return "".join(out).strip(), _filter_stderr("".join(err)).strip(), process.returncode
+    except Exception as e:
+        return "", f"❌ Error running script: {e}", -1
+    finally:
+        if path:
+            _remove_quietly(path)
+
+def run_etl_script_remote_password(code: str, ssh_user: str, ssh_host: str, ssh_password: str, on_output=None) -> tuple[str, str]:
+    out, err, status = run_remote_job(code, ssh_user, ssh_host, ssh_password, on_output)
+    return out, err
+
+
+def run_remote_job(code: str, ssh_user: str, ssh_host: str, ssh_password: str, on_output=None, cancel=None,
+                   timeout=None) -> tuple[str, str, int]:
+    # the SSH transport and SFTP channel are pooled per host (modules.ssh.ssh_pool)
+    try:
+        # paramiko is only imported once a script actually runs over SSH
+        from modules.ssh import run_remote_script
 
-        ssh.close()
-        return out.strip(), filtered_err.strip()
+        out, err, status = run_remote_script(code, ssh_host, ssh_user, ssh_password, on_output=on_output,
+                                             cancel=cancel, timeout=timeout)
+        err = _filter_stderr(err)
+        if status != 0:
+            err = f"{err}\nRemote script exited with status {status}".strip()
+        return out.strip(), err.strip(), status
     except Exception as e:
-        return "", f"❌ SSH Error: {e}"
+        return "", f"❌ SSH Error: {e}", -1
@@ -0,0 +1,34 @@
+# modules/extractor.py
+from modules.batches import to_record_batch
+from modules.connections import borrow_connection
+from modules.connectors import get_connector
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+def stream_batches(db_type, creds, batch_size=DEFAULT_BATCH_SIZE, key=None, lower=None, upper=None, after=None,
+                   ordered=False):
+    """
+    Streams the source table/collection as fixed-size batches.
+    Yields (columns, rows) tuples: SQL sources give a list of column names and
+    a list of row tuples, MongoDB gives columns=None and a list of documents.
+    Only one batch is held in memory at a time, whatever the table size.
+
+    With key set, only rows with lower <= key < upper and key > after are read
+    (any bound may be None); ordered=True also returns them sorted by key.
+    The query and cursor come from the database's connector (modules.connectors).
+    """
+    bounds = {"key": key, "lower": lower, "upper": upper, "after": after, "ordered": ordered}
+    connector = get_connector(db_type)
+    with borrow_connection(db_type, creds) as connection:
+        yield from connector.stream(connection, creds, batch_size, bounds)
+
+
+def stream_record_batches(db_type, creds, schema, batch_size=DEFAULT_BATCH_SIZE, key=None, lower=None, upper=None, after=None):
+    """
+    Same as stream_batches, but yields pyarrow RecordBatches that all share `schema`
+    (see modules.batches.arrow_schema).
+    """
+    for columns, rows in stream_batches(db_type, creds, batch_size, key, lower, upper, after):
+        yield to_record_batch(columns, rows, schema)
+
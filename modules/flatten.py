@@ -0,0 +1,339 @@
+# modules/flatten.py
+import json
+import os
+import re
+import time
+
+from modules.connections import borrow_connection
+from modules.extractor import DEFAULT_BATCH_SIZE, stream_batches
+from modules.loader import write_batch
+from modules.typemap import canonical_type, column_type
+
+# joins the keys of a nested path into one column name: address.geo.lat -> address_geo_lat
+FLATTEN_SEPARATOR = os.getenv("ATOA_FLATTEN_SEPARATOR", "_")
+# subdocuments nested deeper than this stay one JSON column
+FLATTEN_MAX_DEPTH = int(os.getenv("ATOA_FLATTEN_MAX_DEPTH", "4"))
+# top-level fields the sampled schema didn't know about, as one JSON object
+EXTRA_COLUMN = "_extra"
+# column of a child table that holds the elements of an array of scalars
+VALUE_COLUMN = "value"
+
+
+def column_name(path):
+    """
+    SQL-safe column name for a dotted document path.
+    """
+    name = re.sub(r"\W", "_", path.replace(".", FLATTEN_SEPARATOR))
+    return f"_{name}" if name[:1].isdigit() else name
+
+
+def _unique(name, taken):
+    candidate, n = name, 2
+    while candidate.lower() in taken:
+        candidate, n = f"{name}_{n}", n + 1
+    taken.add(candidate.lower())
+    return candidate
+
+
+def _getter(keys):
+    # one closure per path, built once per plan instead of walking the path per document
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda doc: doc.get(key)
+    head, rest = keys[0], _getter(keys[1:])
+
+    def get(doc):
+        value = doc.get(head)
+        return rest(value) if isinstance(value, dict) else None
+    return get
+
+
+def _to_json(value):
+    return None if value is None else json.dumps(value, default=str)
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+def _to_decimal(value):
+    # bson.Decimal128 isn't a number the drivers understand
+    return value.to_decimal() if hasattr(value, "to_decimal") else value
+
+
+def _converter(kind):
+    if kind == "json":
+        return _to_json
+    if kind in ("objectid", "uuid"):
+        return _to_str
+    if kind == "decimal":
+        return _to_decimal
+    return None
+
+
+def _column(name, keys, kind, size=None, precision=None, scale=None):
+    return {"name": name, "keys": keys, "kind": kind, "size": size, "precision": precision, "scale": scale,
+            "get": _getter(keys), "convert": _converter(kind)}
+
+
+def _field_kind(field):
+    kind, size, precision, scale = canonical_type("MongoDB", field)
+    if kind == "string" and not field.get("max_length"):
+        return "text", None, None, None
+    return kind, size, precision, scale
+
+
+def _table(name, array, keys, parent, parent_keys):
+    return {"name": name, "array": array, "keys": keys, "parent": parent, "parent_keys": parent_keys,
+            "columns": [], "children": [], "scalar": False, "extra": False}
+
+
+def _add_fields(plan, fields, prefix, depth, taken):
+    for field in fields:
+        keys = prefix + (field["name"],)
+        path = ".".join(keys)
+        items = field.get("items")
+        if field["type"] == "dict" and field.get("fields") and depth < FLATTEN_MAX_DEPTH:
+            _add_fields(plan, field["fields"], keys, depth + 1, taken)
+        elif field["type"] == "list" and items and items.get("type") not in (None, "NoneType"):
+            plan["children"].append(_child_plan(plan, keys, items, depth))
+        else:
+            plan["columns"].append(_column(_unique(column_name(path), taken), keys, *_field_kind(field)))
+
+
+def _child_plan(parent, keys, items, depth):
+    name = f"{parent['name']}_{column_name('.'.join(keys))}"
+    ordinal = f"{column_name(keys[-1])}_idx"
+    if parent["parent"] is None:
+        # the document's _id, named after the root table in its children
+        inherited = [{**parent["keys"][0], "name": f"{parent['name']}_id"}]
+    else:
+        inherited = list(parent["keys"])
+    taken = {key["name"].lower() for key in inherited}
+    ordinal = _unique(ordinal, taken)
+    child = _table(name, _getter(keys), inherited + [{"name": ordinal, "kind": "int32"}], parent["name"],
+                   [key["name"] for key in parent["keys"]])
+    if items["type"] == "dict" and items.get("fields"):
+        # embedded documents: their fields are read relative to the element
+        _add_fields(child, items["fields"], (), depth + 1, taken)
+    else:
+        child["scalar"] = True
+        kind = _field_kind({"type": items["type"]})
+        child["columns"].append({"name": _unique(VALUE_COLUMN, taken), "keys": (), "kind": kind[0], "size": kind[1],
+                                 "precision": kind[2], "scale": kind[3], "get": None, "convert": _converter(kind[0])})
+    return child
+
+
+def compile_plan(schema, table):
+    """
+    Extraction plan for documents described by schema (modules.mongo_schema.infer_schema):
+    subdocuments become columns named after their path (address.city -> address_city),
+    arrays become child tables keyed by the parent's key plus the element's position,
+    with a foreign key back to the parent. Array elements that are documents are
+    flattened the same way; arrays of scalars get one "value" column.
+    Every path gets its getter here, once, so flattening a batch is one pass per table.
+    Top-level fields the schema doesn't list are kept as JSON in an "_extra" column.
+    """
+    id_field = next((field for field in schema if field["name"] == "_id"), {"name": "_id", "type": "objectid"})
+    kind, size, precision, scale = _field_kind(id_field)
+    root = _table(table, None, [{"name": "_id", "kind": kind, "size": size, "precision": precision, "scale": scale}],
+                  None, None)
+    taken = {"_id", EXTRA_COLUMN}
+    _add_fields(root, [field for field in schema if field["name"] != "_id"], (), 1, taken)
+    root["id"] = _getter(("_id",))
+    root["id_convert"] = _converter(kind)
+    root["known"] = frozenset(field["name"] for field in schema)
+    root["extra"] = True
+    return root
+
+
+def tables(plan):
+    """
+    The table plans, parents before their children.
+    """
+    ordered = [plan]
+    for child in plan["children"]:
+        ordered.extend(tables(child))
+    return ordered
+
+
+def table_columns(plan):
+    names = [key["name"] for key in plan["keys"]] + [column["name"] for column in plan["columns"]]
+    return names + [EXTRA_COLUMN] if plan["extra"] else names
+
+
+def _flatten_children(plans, item, key, out):
+    for child in plans:
+        elements = child["array"](item)
+        if not isinstance(elements, list):
+            continue
+        rows = out[child["name"]][1]
+        columns = child["columns"]
+        for position, element in enumerate(elements):
+            row_key = key + (position,)
+            if child["scalar"]:
+                convert = columns[0]["convert"]
+                rows.append(row_key + (convert(element) if convert else element,))
+                continue
+            if not isinstance(element, dict):
+                # the sample only saw documents here; a stray scalar still gets its row, all NULL
+                element = {}
+            rows.append(row_key + tuple(
+                column["convert"](column["get"](element)) if column["convert"] else column["get"](element)
+                for column in columns
+            ))
+            if child["children"]:
+                _flatten_children(child["children"], element, row_key, out)
+
+
+def flatten_batch(plan, documents):
+    """
+    Flattens one batch of documents with a plan from compile_plan.
+    Returns {table: (columns, rows)} for every table of the plan, parents first.
+    """
+    out = {table["name"]: (table_columns(table), []) for table in tables(plan)}
+    rows = out[plan["name"]][1]
+    columns = plan["columns"]
+    getters = [(column["get"], column["convert"]) for column in columns]
+    get_id, convert_id, known = plan["id"], plan["id_convert"], plan["known"]
+    for doc in documents:
+        _id = get_id(doc)
+        key = (convert_id(_id) if convert_id else _id,)
+        row = key + tuple(convert(get(doc)) if convert else get(doc) for get, convert in getters)
+        unknown = doc.keys() - known
+        row += (_to_json({name: doc[name] for name in unknown}) if unknown else None,)
+        rows.append(row)
+        if plan["children"]:
+            _flatten_children(plan["children"], doc, key, out)
+    return out
+
+
+def flatten_batches(plan, batches):
+    """
+    Flattens (None, documents) batches from modules.extractor.stream_batches one at a
+    time, so memory stays at one batch however large the collection is.
+    """
+    for _, documents in batches:
+        yield flatten_batch(plan, documents)
+
+
+def create_tables_sql(plan, target_type):
+    """
+    CREATE TABLE statements for every table of the plan, parents first.
+    Flattened columns are all nullable: a later document may lack a field every sampled one had.
+    """
+    statements = []
+    for table in tables(plan):
+        definitions = [f"{key['name']} {column_type(target_type, key['kind'], key.get('size'), key.get('precision'), key.get('scale'))} NOT NULL"
+                       for key in table["keys"]]
+        definitions += [f"{column['name']} {column_type(target_type, column['kind'], column['size'], column['precision'], column['scale'])}"
+                        for column in table["columns"]]
+        if table["extra"]:
+            definitions.append(f"{EXTRA_COLUMN} {column_type(target_type, 'json')}")
+        keys = [key["name"] for key in table["keys"]]
+        definitions.append(f"PRIMARY KEY ({', '.join(keys)})")
+        if table["parent"] is not None:
+            definitions.append(f"FOREIGN KEY ({', '.join(keys[:-1])}) "
+                               f"REFERENCES {table['parent']} ({', '.join(table['parent_keys'])})")
+        statements.append(f"CREATE TABLE {table['name']} (\n    " + ",\n    ".join(definitions) + "\n)")
+    return statements
+
+
+def _table_exists(connection, name):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT * FROM {name} WHERE 1 = 0")
+        cursor.fetchall()
+        return True
+    except Exception:
+        connection.rollback()
+        return False
+    finally:
+        cursor.close()
+
+
+def create_tables(target_type, creds, plan):
+    """
+    Creates the tables of the plan that don't exist in the target yet.
+    Returns the DDL that was run.
+    """
+    executed = []
+    with borrow_connection(target_type, creds) as connection:
+        for table, ddl in zip(tables(plan), create_tables_sql(plan, target_type)):
+            if _table_exists(connection, table["name"]):
+                continue
+            cursor = connection.cursor()
+            cursor.execute(ddl)
+            cursor.close()
+            executed.append(ddl)
+        connection.commit()
+    return executed
+
+
+def load_flattened(target_type, creds, plan, batches, progress=None, metrics=None):
+    """
+    Flattens document batches and writes every table of each batch on one connection,
+    parents before children so foreign keys hold. Everything is committed once at the end,
+    like modules.loader.load_batches. progress, if given, is called with the running
+    document count. Returns {table: rows loaded}.
+    """
+    counts = {table["name"]: 0 for table in tables(plan)}
+    documents = 0
+    with borrow_connection(target_type, creds) as connection:
+        cursor = connection.cursor()
+        if target_type == "MSSQL":
+            cursor.fast_executemany = True
+        for _, batch in batches:
+            started = time.perf_counter()
+            flattened = flatten_batch(plan, batch)
+            if metrics is not None:
+                metrics.record_batch("flatten", time.perf_counter() - started, len(batch))
+            started = time.perf_counter()
+            for name, item in flattened.items():
+                counts[name] += write_batch(target_type, cursor, name, item)
+            if metrics is not None:
+                metrics.record_batch("load", time.perf_counter() - started, sum(len(rows) for _, rows in flattened.values()))
+                metrics.sample_memory()
+            documents += len(batch)
+            if progress is not None:
+                progress(documents)
+        started = time.perf_counter()
+        connection.commit()
+        cursor.close()
+        if metrics is not None:
+            metrics.add_time("load", time.perf_counter() - started)
+    return counts
+
+
+def transfer_flattened(source_creds, target_type, target_creds, schema=None, batch_size=DEFAULT_BATCH_SIZE,
+                       progress=None, metrics=None):
+    """
+    Streams a MongoDB collection into target_creds["table"] and one child table per
+    array, creating the tables that are missing. schema defaults to one inferred
+    from a sample of the collection. Returns {table: rows loaded}.
+    """
+    if target_type == "MongoDB":
+        raise ValueError("Flattening only applies to SQL targets")
+    if schema is None:
+        from modules.mongo_schema import infer_schema, sample_documents
+
+        with borrow_connection("MongoDB", source_creds) as client:
+            schema = infer_schema(sample_documents(client[source_creds["database"]][source_creds["collection"]]))
+    plan = compile_plan(schema, target_creds["table"])
+    create_tables(target_type, target_creds, plan)
+    batches = stream_batches("MongoDB", source_creds, batch_size)
+    if metrics is not None:
+        batches = _timed_extract(batches, metrics)
+    return load_flattened(target_type, target_creds, plan, batches, progress, metrics)
+
+
+def _timed_extract(batches, metrics):
+    iterator = iter(batches)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        metrics.record_batch("extract", time.perf_counter() - started, len(item[1]))
+        yield item
@@ -1,10 +1,50 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
 import os
+import json
+import threading
 from dotenv import load_dotenv
+from modules.transform import validate_plan
+from modules.codecache import CodeCache, cache_key
+from modules.prompt import PROMPT_TOKEN_BUDGET, compact, credential_placeholders, preview_summary, schema_summary
+from modules.flatten import compile_plan, create_tables_sql
+from modules.typemap import create_table_sql
 
 load_dotenv()
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0)
+LLM_MODEL = "gemini-2.0-flash"
+code_cache = CodeCache()
+
+# MongoDB -> SQL scripts otherwise tend to pd.json_normalize the whole collection in memory
+FLATTEN_HINT = (
+    "Read the collection with a cursor in batches and flatten each batch on its own: "
+    "nested fields become columns joined with '_' (address.city -> address_city) and arrays go to child tables "
+    "keyed by the parent _id and the element position. Never load the whole collection into memory.\n"
+)
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    # langchain and the Gemini client are slow to import, so wait until a prompt is sent
+    global _llm
+    with _llm_lock:
+        if _llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            _llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0)
+        return _llm
+
+
+def ask_llm(prompt):
+    from langchain_core.messages import HumanMessage
+
+    return get_llm().invoke([HumanMessage(content=prompt)]).content
+
+
+def stream_llm(prompt):
+    from langchain_core.messages import HumanMessage
+
+    for chunk in get_llm().stream([HumanMessage(content=prompt)]):
+        yield chunk.content
 
 def strip_code_block(text):
     if text.startswith("```python"):
@@ -14,16 +54,40 @@ def strip_code_block(text):
     return text
 
 
-def generate_etl_code(source_type, source_creds, target_type, target_creds, transformations, src_preview, tgt_preview,src_schema,tgt_schema):
-    if tgt_preview == []:
-        pp="u need to create a new table for the above requiremnts appropriately with the rows and columns and then insert as per required constraints asked"
-    else:
-        pp=f"{tgt_preview} and schema : {tgt_schema} use this to match the format of the source table and formats to the destination table and insert data as per per required constraints asked"
-    prompt = f'''
+def build_etl_prompt(source_type, source_creds, target_type, target_creds, transformations, src_preview, tgt_preview,
+                     src_schema, tgt_schema, budget=PROMPT_TOKEN_BUDGET):
+    """
+    The code-generation prompt, compacted to fit budget tokens (see modules.prompt).
+    Credentials appear only as placeholders. Returns (prompt, stats).
+    """
+    source = credential_placeholders("SOURCE", source_type, source_creds)
+    target = credential_placeholders("TARGET", target_type, target_creds)
+    flatten = source_type == "MongoDB" and target_type != "MongoDB"
+    ddl = None
+    if tgt_preview == [] and flatten and src_schema:
+        ddl = ";\n".join(create_tables_sql(compile_plan(src_schema, target_creds.get("table")), target_type))
+    elif tgt_preview == []:
+        ddl = create_table_sql(source_type, src_schema, target_type, target_creds.get("table"))
+
+    def render(level):
+        src_columns = schema_summary(source_type, src_schema, level["columns"])
+        src_rows = preview_summary(src_preview, src_schema, level["rows"], level["typed"])
+        if ddl:
+            # column types come from modules.typemap, not from the model's guess
+            pp=f"the table doesn't exist yet, create it with exactly these statements before loading (adjust column names only if the transformations rename or add columns):\n{ddl}\nthen insert as per required constraints asked"
+        elif tgt_preview == []:
+            pp="u need to create a new table for the above requiremnts appropriately with the rows and columns and then insert as per required constraints asked"
+        else:
+            tgt_columns = schema_summary(target_type, tgt_schema, level["columns"])
+            if source_type == target_type and tgt_columns == src_columns:
+                tgt_columns = "same columns as the source"
+            tgt_rows = preview_summary(tgt_preview, tgt_schema, level["rows"], level["typed"])
+            pp=f"columns:\n{tgt_columns}\n" + (f"sample rows:\n{tgt_rows}\n" if tgt_rows else "") + "use this to match the format of the source table and formats to the destination table and insert data as per per required constraints asked"
+        return f'''
 You are a Python data engineer. Write a full ETL script only without explaination to:
 
 1. Connect to source DB ({source_type}) using:
-   {source_creds}
+   {json.dumps(source)}
 
 2. Extract data.
 
@@ -31,13 +95,80 @@ You are a Python data engineer. Write a full ETL script only without explainatio
    - {transformations}
 
 4. Load into target DB ({target_type}) using:
-   {target_creds}
+   {json.dumps(target)}
 
-Use appropriate libraries (psycopg2, pymysql, pymongo, pyodbc, sqlite3, pandas) and approriate parameters for each type , there might be many unwanted credentials given to u, 
-u need to use only the ones u need and understand the use case. Include imports and connection handling. use the below data as sample for the table
-sourcedb: {src_preview} and schema :{src_schema}
-and 
-destination {pp}
+Values like __ATOA_SOURCE_PASSWORD__ are placeholders that are replaced with the real values before the script runs:
+copy them into the code exactly, as string literals (wrap ports in int()).
+Use appropriate libraries (psycopg2, pymysql, pymongo, pyodbc, sqlite3, pandas) and approriate parameters for each type. Include imports and connection handling.
+Load in batches and after each batch print a line "ATOA_PROGRESS <total rows loaded so far>"; let errors raise so the script exits with a non-zero status.
+''' + (FLATTEN_HINT if flatten else "") + f'''source columns:
+{src_columns}
+''' + (f"source sample rows:\n{src_rows}\n" if src_rows else "") + f"destination {pp}\n"
+
+    return compact(render, budget)
+
+
+def stream_etl_code(source_type, source_creds, target_type, target_creds, transformations, src_preview, tgt_preview,
+                    src_schema, tgt_schema, use_cache=True, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Yields the script generated so far while the LLM streams it; the last value is the full script.
+    The script keeps the credential placeholders: modules.codecache.fill_credentials
+    puts the real values in right before it runs.
+    """
+    # identical inputs give an identical script (temperature=0), so skip the LLM round-trip
+    key = cache_key(LLM_MODEL, source_type, source_creds, target_type, target_creds, transformations,
+                    src_preview, tgt_preview, src_schema, tgt_schema, budget)
+    if use_cache and os.getenv("ATOA_CODE_CACHE_DISABLED") != "1":
+        cached = code_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    prompt, _ = build_etl_prompt(source_type, source_creds, target_type, target_creds, transformations,
+                                 src_preview, tgt_preview, src_schema, tgt_schema, budget)
+    text = ""
+    for chunk in stream_llm(prompt):
+        text += chunk
+        yield strip_code_block(text)
+    code = strip_code_block(text)
+    code_cache.put(key, code)
+    yield code
+
+
+def generate_etl_code(source_type, source_creds, target_type, target_creds, transformations, src_preview, tgt_preview,src_schema,tgt_schema, use_cache=True):
+    code = ""
+    for code in stream_etl_code(source_type, source_creds, target_type, target_creds, transformations,
+                                src_preview, tgt_preview, src_schema, tgt_schema, use_cache):
+        pass
+    return code
+
+
+def generate_transform_plan(transformations, src_schema, source_type=None):
+    """
+    Asks the LLM to express the transformation text as a declarative plan
+    for modules.transform instead of free-form code.
+    """
+    prompt = f'''
+Convert the requested data transformations into a JSON list of steps. Output only the JSON.
+
+Allowed steps:
+- {{"op": "rename", "columns": {{"old_name": "new_name"}}}}
+- {{"op": "cast", "columns": {{"column": "int|float|str|bool|datetime"}}}}
+- {{"op": "date_format", "column": "column", "format": "strftime format", "input_format": "optional strptime format"}}
+- {{"op": "filter", "expr": "pandas query expression that keeps rows, e.g. salary > 1000"}}
+- {{"op": "drop_nulls", "columns": ["optional", "subset"]}}
+- {{"op": "derive", "column": "new_column", "expr": "pandas eval expression, e.g. price * qty"}}
+- {{"op": "lookup", "column": "column", "mapping": {{"from": "to"}}, "target": "optional output column", "default": "optional"}}
+
+Steps run in order, so later steps must use renamed column names.
+Source columns:
+{schema_summary(source_type, src_schema) if source_type else src_schema}
+Transformations: {transformations}
 '''
-    response = llm.invoke([HumanMessage(content=prompt)])
-    return strip_code_block(response.content)
+    text = ask_llm(prompt).strip()
+    if text.startswith("```"):
+        # drop the ```json fence line
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    if text.endswith("```"):
+        text = text[:-3]
+    return validate_plan(json.loads(text))
@@ -0,0 +1,50 @@
+# modules/incremental.py
+from modules.extractor import DEFAULT_BATCH_SIZE
+from modules.state import StateStore, pipeline_id
+from modules.transfer import transfer_table
+
+
+def key_values(key, columns, rows):
+    if columns is None:
+        return [doc[key] for doc in rows if doc.get(key) is not None]
+    if key not in columns:
+        raise ValueError(f"Watermark column '{key}' is not in the source columns {columns}")
+    index = columns.index(key)
+    return [row[index] for row in rows if row[index] is not None]
+
+
+def run_incremental(source_type, source_creds, target_type, target_creds, key, transform=None,
+                    batch_size=DEFAULT_BATCH_SIZE, store=None, progress=None, upsert_key=None,
+                    add_hash_column=False):
+    """
+    Copies only the rows whose `key` is above the stored high watermark, then
+    advances the watermark. key must only ever grow (updated_at, auto-increment id,
+    Mongo _id). The watermark is saved after the load commits, so a failed run is
+    simply retried from the previous watermark on the next call.
+    A watermark like updated_at also picks up rows that changed since the last run;
+    pass upsert_key (see modules.upsert) to update those in place instead of appending
+    them again, and add_hash_column=True to let it add its row hash column to the target.
+    Returns (rows_loaded, new_watermark).
+    """
+    store = store or StateStore()
+    pipeline = pipeline_id(source_type, source_creds, target_type, target_creds, key)
+    watermark = store.get_watermark(pipeline)
+    high = {"value": watermark}
+
+    def track(columns, rows):
+        # the watermark is taken from the source rows, before any transform renames the key
+        values = key_values(key, columns, rows)
+        if values:
+            batch_max = max(values)
+            if high["value"] is None or batch_max > high["value"]:
+                high["value"] = batch_max
+        if transform is not None:
+            return transform(columns, rows)
+        return columns, rows
+
+    rows = transfer_table(source_type, source_creds, target_type, target_creds, track,
+                          batch_size, key=key, progress=progress, after=watermark, upsert_key=upsert_key,
+                          add_hash_column=add_hash_column)
+    if high["value"] is not None and high["value"] != watermark:
+        store.set_watermark(pipeline, key, high["value"])
+    return rows, high["value"]
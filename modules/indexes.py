@@ -0,0 +1,231 @@
+# modules/indexes.py
+from contextlib import contextmanager
+
+from modules.connections import PLACEHOLDERS, borrow_connection
+from modules.state import StateStore, table_id
+
+
+def drop_secondary_indexes(db_type, creds, store=None):
+    """
+    Removes (or, on MSSQL, disables) the target's secondary indexes and foreign keys
+    so a bulk load doesn't maintain them row by row.
+    Primary keys and unique indexes stay, so duplicates are still rejected.
+    What rebuild_indexes needs to put them back is written to the StateStore before
+    anything is dropped, and whatever an earlier, interrupted run left there is
+    rebuilt first. Returns the saved statements.
+    """
+    store = store or StateStore()
+    target = table_id(db_type, creds)
+    restore_dropped_indexes(db_type, creds, store)
+    if db_type == "MongoDB":
+        return _drop_mongo(creds, store, target)
+    table = creds["table"]
+    placeholder = PLACEHOLDERS[db_type]
+    with borrow_connection(db_type, creds) as connection:
+        cursor = connection.cursor()
+        drops, saved = _plan_sql(db_type, cursor, table, placeholder)
+        if saved:
+            store.set_dropped_indexes(target, saved)
+        dropped = []
+        try:
+            for statement, restore in drops:
+                cursor.execute(statement)
+                dropped.append(restore)
+        except Exception:
+            connection.rollback()
+            if db_type == "MySQL":
+                # MySQL commits each DDL statement, so what was already dropped is put back by hand
+                for statement in saved:
+                    if statement in dropped:
+                        cursor.execute(statement)
+            cursor.close()
+            store.reset_dropped_indexes(target)
+            raise
+        connection.commit()
+        cursor.close()
+    return saved
+
+
+def _plan_sql(db_type, cursor, table, placeholder):
+    """
+    Returns (drops, saved): (drop statement, restore statement) pairs in the order they
+    run, and the restore statements in the order rebuild_indexes replays them.
+    """
+    drops, saved = [], []
+    if db_type == "PostgreSQL":
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid JOIN pg_class t ON t.oid = x.indrelid "
+            "WHERE t.relname = %s AND pg_table_is_visible(t.oid) AND NOT x.indisunique AND NOT x.indisprimary "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)",
+            (table,),
+        )
+        for name, definition in cursor.fetchall():
+            drops.append((f'DROP INDEX "{name}"', definition))
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            (table,),
+        )
+        for name, definition in cursor.fetchall():
+            drops.append((f'ALTER TABLE {table} DROP CONSTRAINT "{name}"',
+                          f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}'))
+        saved = [restore for _, restore in drops]
+
+    elif db_type == "MySQL":
+        # an index backing a foreign key can't be dropped, so the foreign keys go first;
+        # they are restored after the indexes, which must be back before the keys are re-added
+        cursor.execute(
+            "SELECT k.CONSTRAINT_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_SCHEMA, k.REFERENCED_TABLE_NAME, "
+            "k.REFERENCED_COLUMN_NAME, r.UPDATE_RULE, r.DELETE_RULE "
+            "FROM information_schema.KEY_COLUMN_USAGE k JOIN information_schema.REFERENTIAL_CONSTRAINTS r "
+            "ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME "
+            "AND r.TABLE_NAME = k.TABLE_NAME "
+            "WHERE k.TABLE_SCHEMA = DATABASE() AND k.TABLE_NAME = %s AND k.REFERENCED_TABLE_NAME IS NOT NULL "
+            "ORDER BY k.CONSTRAINT_NAME, k.ORDINAL_POSITION",
+            (table,),
+        )
+        foreign_keys = {}
+        for name, column, ref_schema, ref_table, ref_column, on_update, on_delete in cursor.fetchall():
+            key = foreign_keys.setdefault(name, {"columns": [], "ref_columns": [],
+                                                 "ref_table": f"`{ref_schema}`.`{ref_table}`",
+                                                 "rules": f"ON UPDATE {on_update} ON DELETE {on_delete}"})
+            key["columns"].append(f"`{column}`")
+            key["ref_columns"].append(f"`{ref_column}`")
+        key_drops = [
+            (f"ALTER TABLE {table} DROP FOREIGN KEY `{name}`",
+             f"ALTER TABLE {table} ADD CONSTRAINT `{name}` FOREIGN KEY ({', '.join(key['columns'])}) "
+             f"REFERENCES {key['ref_table']} ({', '.join(key['ref_columns'])}) {key['rules']}")
+            for name, key in foreign_keys.items()
+        ]
+        cursor.execute(f"SHOW INDEX FROM {table}")
+        names = [desc[0] for desc in cursor.description]
+        indexes = {}
+        for row in cursor.fetchall():
+            index = dict(zip(names, row))
+            if index["Key_name"] == "PRIMARY" or not index["Non_unique"]:
+                continue
+            part = f"`{index['Column_name']}`"
+            if index["Sub_part"]:
+                part += f"({index['Sub_part']})"
+            entry = indexes.setdefault(index["Key_name"], {"type": index["Index_type"], "parts": {}})
+            entry["parts"][index["Seq_in_index"]] = part
+        index_drops = []
+        for name, index in indexes.items():
+            kind = f"{index['type']} INDEX" if index["type"] in ("FULLTEXT", "SPATIAL") else "INDEX"
+            parts = ", ".join(index["parts"][seq] for seq in sorted(index["parts"]))
+            index_drops.append((f"ALTER TABLE {table} DROP INDEX `{name}`", f"ALTER TABLE {table} ADD {kind} `{name}` ({parts})"))
+        drops = key_drops + index_drops
+        saved = [restore for _, restore in index_drops + key_drops]
+
+    elif db_type == "MSSQL":
+        # MSSQL can disable an index in place and rebuild it from its stored definition
+        cursor.execute(
+            "SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID(?) AND type_desc = 'NONCLUSTERED' "
+            "AND is_primary_key = 0 AND is_unique = 0 AND is_disabled = 0",
+            (table,),
+        )
+        for (name,) in cursor.fetchall():
+            drops.append((f"ALTER INDEX [{name}] ON {table} DISABLE", f"ALTER INDEX [{name}] ON {table} REBUILD"))
+        drops.append((f"ALTER TABLE {table} NOCHECK CONSTRAINT ALL", f"ALTER TABLE {table} WITH CHECK CHECK CONSTRAINT ALL"))
+        saved = [restore for _, restore in drops]
+
+    elif db_type == "SQLite":
+        # automatic indexes (PRIMARY KEY / UNIQUE) have no sql and can't be dropped
+        cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = {placeholder} "
+            "AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'",
+            (table,),
+        )
+        for name, definition in cursor.fetchall():
+            drops.append((f'DROP INDEX "{name}"', definition))
+        saved = [restore for _, restore in drops]
+    return drops, saved
+
+
+def rebuild_indexes(db_type, creds, saved, store=None):
+    """
+    Recreates what drop_secondary_indexes removed, in one pass after the load,
+    and forgets the saved statements once they ran.
+    """
+    if saved:
+        if db_type == "MongoDB":
+            with borrow_connection("MongoDB", creds) as client:
+                collection = client[creds["database"]][creds["collection"]]
+                for keys, options in saved:
+                    collection.create_index([tuple(key) for key in keys], **options)
+        else:
+            with borrow_connection(db_type, creds) as connection:
+                cursor = connection.cursor()
+                for statement in saved:
+                    cursor.execute(statement)
+                connection.commit()
+                cursor.close()
+    (store or StateStore()).reset_dropped_indexes(table_id(db_type, creds))
+
+
+def restore_dropped_indexes(db_type, creds, store=None):
+    """
+    Rebuilds what an interrupted run dropped and never put back (see drop_secondary_indexes).
+    Each statement runs on its own: the ones a crashed rebuild already ran fail as
+    duplicates and are skipped. Returns the number of statements that ran.
+    """
+    store = store or StateStore()
+    target = table_id(db_type, creds)
+    saved = store.get_dropped_indexes(target)
+    if not saved:
+        return 0
+    restored = 0
+    if db_type == "MongoDB":
+        with borrow_connection("MongoDB", creds) as client:
+            collection = client[creds["database"]][creds["collection"]]
+            for keys, options in saved:
+                try:
+                    collection.create_index([tuple(key) for key in keys], **options)
+                    restored += 1
+                except Exception:
+                    pass
+    else:
+        with borrow_connection(db_type, creds) as connection:
+            cursor = connection.cursor()
+            for statement in saved:
+                try:
+                    cursor.execute(statement)
+                    connection.commit()
+                    restored += 1
+                except Exception:
+                    connection.rollback()
+            cursor.close()
+    store.reset_dropped_indexes(target)
+    return restored
+
+
+def _drop_mongo(creds, store, target):
+    saved = []
+    with borrow_connection("MongoDB", creds) as client:
+        collection = client[creds["database"]][creds["collection"]]
+        for name, info in collection.index_information().items():
+            if name == "_id_" or info.get("unique"):
+                continue
+            options = {k: v for k, v in info.items() if k not in ("key", "v", "ns")}
+            saved.append(([list(key) for key in info["key"]], {"name": name, **options}))
+        if saved:
+            store.set_dropped_indexes(target, saved)
+        for _, options in saved:
+            collection.drop_index(options["name"])
+    return saved
+
+
+@contextmanager
+def deferred_indexes(db_type, creds, store=None):
+    """
+    Drops secondary indexes for the duration of the block and rebuilds them afterwards,
+    also when the load fails, so the table is never left without them. If the process
+    dies first, the next drop_secondary_indexes on the table rebuilds them.
+    """
+    store = store or StateStore()
+    saved = drop_secondary_indexes(db_type, creds, store)
+    try:
+        yield saved
+    finally:
+        rebuild_indexes(db_type, creds, saved, store)
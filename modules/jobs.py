@@ -0,0 +1,285 @@
+# modules/jobs.py
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.connections import credential_fingerprint
+from modules.executor import run_etl_job, run_remote_job
+from modules.metrics import RunMetrics
+
+JOB_WORKERS = int(os.getenv("ATOA_JOB_WORKERS", "4"))
+# jobs touching the same database run at most this many at a time
+JOB_DB_CONCURRENCY = int(os.getenv("ATOA_JOB_DB_CONCURRENCY", "2"))
+# default limit for generated scripts; built-in transfers and migrations run as long as they need
+JOB_TIMEOUT = float(os.getenv("ATOA_JOB_TIMEOUT", "3600"))
+JOB_LOG_LINES = 2000
+# finished jobs kept for the UI
+JOB_HISTORY = 50
+
+# scripts report row progress by printing "ATOA_PROGRESS <rows>"
+PROGRESS_PATTERN = re.compile(r"ATOA_PROGRESS\s+(\d+)")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    One background run: its status, live log, row progress and cancel flag.
+    """
+
+    def __init__(self, name, resources, timeout):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.resources = resources
+        self.timeout = timeout
+        self.status = "queued"
+        self.rows = 0
+        self.result = None
+        self.report = None
+        # live state a job exposes to the UI beyond its log, e.g. a migration's per-table progress
+        self.detail = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.timed_out = False
+        self._logs = deque(maxlen=JOB_LOG_LINES)
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def output(self, stream, text):
+        """on_output callback for the executors: appends to the log and picks up progress."""
+        with self._lock:
+            text = self._partial + text
+            lines = text.split("\n")
+            self._partial = lines.pop()
+            for line in lines:
+                match = PROGRESS_PATTERN.search(line)
+                if match:
+                    self.rows = int(match.group(1))
+                    continue
+                self._logs.append(f"[{stream}] {line}" if stream == "stderr" else line)
+
+    def log(self, line):
+        self.output("stdout", f"{line}\n")
+
+    def progress(self, rows):
+        """progress callback for the built-in transfers; raises once the job is cancelled."""
+        self.rows = rows
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled("timed out" if self.timed_out else "cancelled")
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def remaining(self):
+        if self.timeout is None:
+            return None
+        started = self.started_at or time.time()
+        return max(0.0, self.timeout - (time.time() - started))
+
+    def logs(self):
+        with self._lock:
+            lines = list(self._logs)
+            if self._partial:
+                lines.append(self._partial)
+        return lines
+
+    def snapshot(self):
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "rows": self.rows,
+            "elapsed": round(end - self.started_at, 1) if self.started_at else 0.0,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool. A job's resources, a list of (db_type, creds),
+    are limited to per_db_limit concurrent jobs per database; jobs wait queued until
+    a slot frees up.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, per_db_limit=JOB_DB_CONCURRENCY):
+        self.per_db_limit = per_db_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="atoa-job")
+        self._jobs = {}
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, fn, resources=(), timeout=None):
+        """
+        Queues fn(job) and returns the Job right away. fn reports progress through
+        job.output / job.progress, should stop when job.cancel_event is set, and
+        signals failure by raising. timeout, in seconds, cancels the job once it has
+        run that long; None lets it run to the end.
+        """
+        job = Job(name, list(resources), timeout)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _limit(self, db_type, creds):
+        key = (db_type, credential_fingerprint(db_type, creds))
+        with self._lock:
+            return self._limits.setdefault(key, threading.BoundedSemaphore(self.per_db_limit))
+
+    def _run(self, job, fn):
+        # acquire in a fixed order so two jobs on the same pair of databases can't deadlock
+        limits = sorted({id(limit): limit for limit in (self._limit(*r) for r in job.resources)}.items())
+        acquired = []
+        try:
+            for _, limit in limits:
+                while not limit.acquire(timeout=0.5):
+                    if job.cancel_event.is_set():
+                        raise JobCancelled("cancelled")
+                acquired.append(limit)
+            # a slot can free up between two polls after the job was cancelled
+            job.check_cancelled()
+            job.started_at = time.time()
+            job.status = "running"
+            timer = None
+            if job.timeout:
+                timer = threading.Timer(job.timeout, self._expire, (job,))
+                timer.daemon = True
+                timer.start()
+            try:
+                job.result = fn(job)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+            job.check_cancelled()
+            job.status = "succeeded"
+        except JobCancelled as e:
+            job.status = "timed out" if job.timed_out else "cancelled"
+            job.error = str(e)
+        except Exception as e:
+            job.status = "timed out" if job.timed_out else "failed"
+            job.error = str(e)
+        finally:
+            for limit in acquired:
+                limit.release()
+            job.finished_at = time.time()
+
+    def _expire(self, job):
+        job.timed_out = True
+        job.cancel()
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=False)
+
+
+def script_job(code, ssh=None, **context):
+    """
+    Job function running a generated script locally, or over SSH when ssh is
+    {"host", "user", "password"}. Output streams into the job log; a non-zero exit
+    status fails the job. The run's metrics report is stored on job.report.
+    """
+    def run(job):
+        metrics = RunMetrics(job_id=job.id, mode="ssh" if ssh else "local", **context)
+        with metrics.stage("execute"):
+            if ssh:
+                out, err, status = run_remote_job(code, ssh["user"], ssh["host"], ssh["password"],
+                                                  job.output, job.cancel_event, job.remaining())
+            else:
+                out, err, status = run_etl_job(code, job.remaining(), job.output, job.cancel_event)
+        job.report = metrics.finish(error=(err or f"exit status {status}") if status != 0 else None)
+        metrics.write()
+        job.check_cancelled()
+        if status != 0:
+            lines = err.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"Script exited with status {status}")
+        return {"stdout": out, "stderr": err}
+    return run
+
+
+def partitioned_script_job(code, partitions, hosts, **context):
+    """
+    Job function fanning a script out over several SSH hosts, one run per (lower, upper)
+    partition (see modules.ssh.run_partitioned_remote). Log lines are prefixed with their
+    partition and the job's rows are the sum of every run's progress. Any failed run
+    fails the job once all of them finished.
+    """
+    def run(job):
+        # paramiko is only imported once a script actually runs over SSH
+        from modules.ssh import run_partitioned_remote
+
+        metrics = RunMetrics(job_id=job.id, mode="ssh-partitioned", parallelism=len(partitions), **context)
+        partial, rows, lock = {}, {}, threading.Lock()
+
+        def on_output(index, stream, text):
+            # runs interleave, so lines are completed per partition before they reach the job log
+            with lock:
+                lines = (partial.get((index, stream), "") + text).split("\n")
+                partial[(index, stream)] = lines.pop()
+                for line in lines:
+                    match = PROGRESS_PATTERN.search(line)
+                    if match:
+                        rows[index] = int(match.group(1))
+                        job.rows = sum(rows.values())
+                    else:
+                        job.output(stream, f"[{index}] {line}\n")
+
+        with metrics.stage("execute"):
+            results = run_partitioned_remote(code, partitions, hosts, on_output, job.cancel_event, job.remaining())
+        failed = [(index, host, err) for index, (host, _, err, status) in enumerate(results) if status != 0]
+        error = None
+        if failed:
+            index, host, err = failed[0]
+            lines = err.strip().splitlines()
+            error = (f"{len(failed)} of {len(results)} partition(s) failed; partition {index} on {host}: "
+                     f"{lines[-1] if lines else 'non-zero exit status'}")
+        job.report = metrics.finish(error=error)
+        metrics.write()
+        job.check_cancelled()
+        if error:
+            raise RuntimeError(error)
+        return [{"host": host, "status": status} for host, _, _, status in results]
+    return run
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+        return _job_manager
@@ -0,0 +1,143 @@
+# modules/loader.py
+import csv
+import io
+import json
+
+import pyarrow as pa
+
+from modules.batches import from_record_batch, to_csv_buffer
+from modules.connections import PLACEHOLDERS, borrow_connection
+from modules.connectors import get_connector
+
+
+def load_batches(db_type, creds, batches):
+    """
+    Loads (columns, rows) batches, as produced by modules.extractor.stream_batches,
+    or pyarrow RecordBatches (stream_record_batches) into the target using the
+    fastest bulk path the driver offers.
+    Everything is written in a single transaction; returns the number of rows loaded.
+    The bulk path and its cursor come from the database's connector (modules.connectors).
+    """
+    connector = get_connector(db_type)
+    if connector.bulk_load == "insert_many":
+        return _load_mongo(creds, batches)
+    total = 0
+    with borrow_connection(db_type, creds) as connection:
+        cursor = connector.bulk_cursor(connection)
+        for item in batches:
+            total += write_batch(db_type, cursor, creds["table"], item)
+        connection.commit()
+        cursor.close()
+    return total
+
+
+def _to_scalar(value):
+    if value is None or isinstance(value, (str, int, float, bool, bytes)):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _copy_value(value):
+    # COPY's CSV format reads bytea in its hex form and json columns from JSON text
+    if value is None:
+        return "\\N"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def unpack(item):
+    if isinstance(item, pa.RecordBatch):
+        return from_record_batch(item)
+    return item
+
+
+def as_rows(columns, rows):
+    """
+    Normalises a batch to (columns, list of tuples) for SQL targets.
+    Document batches (columns=None) take every key any document has, in first-seen
+    order; documents missing a key get NULL there.
+    """
+    if columns is not None:
+        return columns, rows
+    columns = list(dict.fromkeys(key for doc in rows for key in doc))
+    return columns, [tuple(_to_scalar(doc.get(col)) for col in columns) for doc in rows]
+
+
+def as_documents(columns, rows):
+    if columns is None:
+        return rows
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def insert_statement(db_type, table, columns):
+    placeholder = PLACEHOLDERS[db_type]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join([placeholder] * len(columns))})"
+    )
+
+
+def write_batch(db_type, cursor, table, item):
+    """
+    Writes one batch to a SQL target on an open cursor without committing.
+    Returns the number of rows written.
+    """
+    return BATCH_WRITERS[get_connector(db_type).bulk_load](db_type, cursor, table, item)
+
+
+def _write_executemany(db_type, cursor, table, item):
+    columns, rows = unpack(item)
+    if not rows:
+        return 0
+    columns, rows = as_rows(columns, rows)
+    # pymysql rewrites this into multi-row INSERT ... VALUES (...), (...)
+    cursor.executemany(insert_statement(db_type, table, columns), rows)
+    return len(rows)
+
+
+def _write_copy(db_type, cursor, table, item):
+    if isinstance(item, pa.RecordBatch):
+        # Arrow writes the CSV in C, no per-row Python objects
+        if item.num_rows:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(item.schema.names)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+                to_csv_buffer(item),
+            )
+        return item.num_rows
+    columns, rows = item
+    if not rows:
+        return 0
+    columns, rows = as_rows(columns, rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(value) for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer,
+    )
+    return len(rows)
+
+
+# connector.bulk_load -> writer for SQL targets
+BATCH_WRITERS = {"executemany": _write_executemany, "copy": _write_copy}
+
+
+def _load_mongo(creds, batches):
+    total = 0
+    with borrow_connection("MongoDB", creds) as client:
+        collection = client[creds["database"]][creds["collection"]]
+        for item in batches:
+            documents = item.to_pylist() if isinstance(item, pa.RecordBatch) else as_documents(*item)
+            if not documents:
+                continue
+            # unordered inserts let the server apply the batch in parallel
+            collection.insert_many(documents, ordered=False)
+            total += len(documents)
+    return total
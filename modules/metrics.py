@@ -0,0 +1,160 @@
+# modules/metrics.py
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+RUN_REPORT_DIR = os.getenv("ATOA_RUN_REPORT_DIR", os.path.join(".atoa_cache", "runs"))
+# estimating bytes looks at this many rows per batch and extrapolates
+BYTES_SAMPLE_ROWS = 100
+
+
+def rss_mb():
+    # current resident set size; /proc is Linux-only, so fall back to the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows has neither; memory just goes unreported
+        return None
+    # ru_maxrss is in kilobytes, except on macOS where it's bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _peak(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def estimate_bytes(item):
+    """
+    Approximate in-memory payload of a batch: exact for RecordBatches, sampled for rows.
+    """
+    if isinstance(item, pa.RecordBatch):
+        return item.nbytes
+    columns, rows = item
+    if not rows:
+        return 0
+    sample = rows[:BYTES_SAMPLE_ROWS]
+    if columns is None:
+        size = sum(sys.getsizeof(v) for doc in sample for v in doc.values())
+    else:
+        size = sum(sys.getsizeof(v) for row in sample for v in row)
+    return int(size * len(rows) / len(sample))
+
+
+def batch_rows(item):
+    if isinstance(item, pa.RecordBatch):
+        return item.num_rows
+    return len(item[1])
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RunMetrics:
+    """
+    Collects per-stage durations, row/byte counts, batch latencies and peak memory
+    for one run, and renders them as a JSON-serialisable report.
+    """
+
+    def __init__(self, run_id=None, **context):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.context = context
+        self.started_at = time.time()
+        self.finished_at = None
+        self.stages = {}
+        self.peak_rss_mb = rss_mb()
+        self.error = None
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {"seconds": 0.0, "rows": 0, "bytes": 0, "latencies": []})
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stage(name)["seconds"] += time.perf_counter() - started
+            self.sample_memory()
+
+    def record_batch(self, name, seconds, rows=0, nbytes=0):
+        stage = self._stage(name)
+        stage["seconds"] += seconds
+        stage["rows"] += rows
+        stage["bytes"] += nbytes
+        stage["latencies"].append(seconds)
+
+    def add_time(self, name, seconds):
+        self._stage(name)["seconds"] += seconds
+
+    def sample_memory(self):
+        self.peak_rss_mb = _peak(self.peak_rss_mb, rss_mb())
+
+    def merge(self, report):
+        """Folds in a report from another process (e.g. a parallel partition)."""
+        for name, stage in report["stages"].items():
+            mine = self._stage(name)
+            mine["seconds"] += stage["seconds"]
+            mine["rows"] += stage["rows"]
+            mine["bytes"] += stage["bytes"]
+            mine["latencies"].extend(stage.get("latencies_raw", []))
+        self.peak_rss_mb = _peak(self.peak_rss_mb, report["peak_rss_mb"])
+
+    def finish(self, error=None):
+        self.finished_at = time.time()
+        self.error = error
+        self.sample_memory()
+        return self.report()
+
+    def report(self, include_raw=False):
+        stages = {}
+        for name, stage in self.stages.items():
+            latencies = stage["latencies"]
+            stages[name] = {
+                "seconds": round(stage["seconds"], 4),
+                "rows": stage["rows"],
+                "bytes": stage["bytes"],
+                "batches": len(latencies),
+                "batch_latency_ms": {
+                    "p50": round(_percentile(latencies, 0.5) * 1000, 2),
+                    "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+                    "max": round(max(latencies, default=0.0) * 1000, 2),
+                },
+            }
+            if include_raw:
+                stages[name]["latencies_raw"] = latencies
+        finished = self.finished_at or time.time()
+        loaded = self.stages.get("load", {}).get("rows", 0)
+        duration = finished - self.started_at
+        return {
+            "run_id": self.run_id,
+            "context": self.context,
+            "started_at": self.started_at,
+            "duration_seconds": round(duration, 4),
+            "rows": loaded,
+            "rows_per_sec": round(loaded / duration, 1) if duration > 0 and loaded else 0.0,
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            "stages": stages,
+            "error": self.error,
+        }
+
+    def write(self, directory=RUN_REPORT_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        return path
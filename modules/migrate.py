@@ -0,0 +1,260 @@
+# modules/migrate.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from modules.checkpoint import CHECKPOINT_TABLE
+from modules.connections import POOL_MAX_SIZE, borrow_connection, credential_fingerprint
+from modules.connectors import get_connector
+from modules.extractor import DEFAULT_BATCH_SIZE
+from modules.metrics import RunMetrics
+from modules.transfer import transfer_table
+from modules.typemap import create_table
+from modules.validator import invalidate_schema_cache, validate_and_fetch_schema
+
+# tables transferred at the same time; each one holds a source and a target connection
+MIGRATE_CONCURRENCY = int(os.getenv("ATOA_MIGRATE_CONCURRENCY", "4"))
+
+
+class MigrationStopped(Exception):
+    pass
+
+
+def table_creds(db_type, creds, name):
+    """
+    creds pointed at one table (collection) of the database.
+    """
+    return {**creds, "collection" if db_type == "MongoDB" else "table": name}
+
+
+def dependency_levels(tables, edges):
+    """
+    Groups tables so every table comes after the tables its foreign keys reference.
+    edges are (table, referenced table) pairs; self-references are ignored.
+    A cycle is broken by releasing its tables together once every table it references
+    is loaded; the tables that hang off it still come after it.
+    Returns (levels, cyclic), cyclic being the tables released that way.
+    """
+    parents = {table: set() for table in tables}
+    for child, parent in edges:
+        if child in parents and parent in parents and child != parent:
+            parents[child].add(parent)
+    levels, cyclic, placed = [], set(), set()
+    while len(placed) < len(parents):
+        left = {table: deps - placed for table, deps in parents.items() if table not in placed}
+        ready = sorted(table for table, deps in left.items() if not deps)
+        if not ready:
+            # every table left waits on a cycle; release the cycles that wait on nothing else
+            ancestors = {table: _ancestors(left, table) for table in left}
+            ready = sorted(table for table, above in ancestors.items()
+                           if table in above and all(table in ancestors[parent] for parent in above))
+            cyclic.update(ready)
+        levels.append(ready)
+        placed.update(ready)
+    return levels, cyclic
+
+
+def _ancestors(parents, table):
+    seen, stack = set(), [table]
+    while stack:
+        for parent in parents[stack.pop()]:
+            if parent not in seen:
+                seen.add(parent)
+                stack.append(parent)
+    return seen
+
+
+class Migration:
+    """
+    A whole-database transfer: the tables, the order foreign keys impose on them and,
+    once running, each table's status, rows and timings plus the merged stage metrics.
+    Safe to read from the UI thread while the workers update it.
+    """
+
+    def __init__(self, source_type, target_type, levels, parents, cyclic, expected):
+        self.source_type = source_type
+        self.target_type = target_type
+        self.levels = levels
+        self.cyclic = cyclic
+        self.concurrency = None
+        self.metrics = RunMetrics(source_type=source_type, target_type=target_type, mode="migration")
+        self.tables = {}
+        for level, names in enumerate(levels):
+            for name in names:
+                self.tables[name] = {
+                    "table": name, "level": level, "status": "pending", "rows": 0,
+                    "expected_rows": expected.get(name), "seconds": None, "error": None,
+                    # only parents on an earlier level are waited for; the rest are cycle edges
+                    "parents": sorted(parent for parent in parents.get(name, ()) if self._level(parent) < level),
+                }
+        self._lock = threading.Lock()
+
+    def _level(self, name):
+        for level, names in enumerate(self.levels):
+            if name in names:
+                return level
+        return len(self.levels)
+
+    def update(self, name, **fields):
+        with self._lock:
+            self.tables[name].update(fields)
+
+    def merge(self, report):
+        with self._lock:
+            self.metrics.merge(report)
+
+    def rows(self):
+        with self._lock:
+            return sum(table["rows"] for table in self.tables.values())
+
+    def snapshot(self):
+        with self._lock:
+            tables = [dict(table) for table in self.tables.values()]
+        counts = {}
+        for table in tables:
+            counts[table["status"]] = counts.get(table["status"], 0) + 1
+        expected = [table["expected_rows"] for table in tables]
+        return {
+            "tables": tables,
+            "counts": counts,
+            "rows": sum(table["rows"] for table in tables),
+            "expected_rows": sum(expected) if expected and None not in expected else None,
+            "levels": len(self.levels),
+            "cyclic": sorted(self.cyclic),
+            "concurrency": self.concurrency,
+        }
+
+
+def plan_migration(source_type, source_creds, target_type, include=None):
+    """
+    Lists the source database's tables (collections), reads their foreign keys and
+    catalog row counts, and orders them parents first. include, a list of names,
+    limits the migration to those tables. Returns a Migration that hasn't run yet.
+    """
+    connector = get_connector(source_type)
+    expected = {}
+    with borrow_connection(source_type, source_creds) as connection:
+        tables = [name for name in connector.list_tables(connection, source_creds) if name != CHECKPOINT_TABLE]
+        if include:
+            tables = [name for name in tables if name in set(include)]
+        edges = connector.foreign_keys(connection, source_creds)
+        for name in tables:
+            try:
+                expected[name] = connector.stats(connection, table_creds(source_type, source_creds, name))[0]
+            except Exception:
+                # the catalog views may need privileges the ETL user doesn't have; on PostgreSQL
+                # the failed query also aborts the transaction the next table's stats run in
+                if source_type != "MongoDB":
+                    connection.rollback()
+                expected[name] = None
+    levels, cyclic = dependency_levels(tables, edges)
+    parents = {}
+    for child, parent in edges:
+        if child != parent:
+            parents.setdefault(child, set()).add(parent)
+    return Migration(source_type, target_type, levels, parents, cyclic, expected)
+
+
+def migration_concurrency(migration, source_creds, target_creds, concurrency=MIGRATE_CONCURRENCY):
+    """
+    concurrency, bounded so the tables in flight never wait on the connection pools.
+    """
+    if migration.target_type == "SQLite":
+        # SQLite takes a single writer; more tables at once would only wait on the file lock
+        return 1
+    same_database = (migration.source_type == migration.target_type and
+                     credential_fingerprint(migration.source_type, source_creds) ==
+                     credential_fingerprint(migration.target_type, target_creds))
+    # a table borrows one source and one target connection, both from the same pool here
+    limit = POOL_MAX_SIZE // 2 if same_database else POOL_MAX_SIZE
+    return max(1, min(concurrency, limit, len(migration.tables) or 1))
+
+
+def _migrate_table(migration, name, source_creds, target_creds, batch_size, stop):
+    source = table_creds(migration.source_type, source_creds, name)
+    target = table_creds(migration.target_type, target_creds, name)
+    started = time.perf_counter()
+    migration.update(name, status="running")
+
+    def progress(done):
+        migration.update(name, rows=done)
+        if stop.is_set():
+            raise MigrationStopped("migration stopped")
+
+    try:
+        status, _, schema = validate_and_fetch_schema(migration.source_type, source, refresh=True)
+        if status.startswith("Error"):
+            raise RuntimeError(status)
+        _, target_preview, target_schema = validate_and_fetch_schema(migration.target_type, target, refresh=True)
+        if target_preview == [] and not target_schema:
+            create_table(migration.target_type, target, migration.source_type, schema)
+            invalidate_schema_cache(migration.target_type, target)
+        metrics = RunMetrics(table=name)
+        rows = transfer_table(migration.source_type, source, migration.target_type, target,
+                              batch_size=batch_size, progress=progress, metrics=metrics)
+    except Exception as e:
+        migration.update(name, status="failed", error=str(e), seconds=round(time.perf_counter() - started, 2))
+        raise
+    migration.merge(metrics.report(include_raw=True))
+    migration.update(name, status="done", rows=rows, seconds=round(time.perf_counter() - started, 2))
+    return rows
+
+
+def run_migration(migration, source_creds, target_creds, concurrency=MIGRATE_CONCURRENCY,
+                  batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Transfers every table of a plan_migration result, up to concurrency tables at a time.
+    A table starts once the tables it references are loaded, so the target's foreign
+    keys hold throughout; among the ready tables the largest goes first. Missing target
+    tables are created from the source schema (see modules.typemap.create_table).
+    When a table fails, the tables that reference it are skipped and the rest carry on.
+    progress, if given, is called with the total rows loaded and may raise to stop the
+    migration: running tables stop after their current batch.
+    Returns the migration's merged metrics report.
+    """
+    concurrency = migration_concurrency(migration, source_creds, target_creds, concurrency)
+    migration.concurrency = concurrency
+    migration.metrics.context["parallelism"] = concurrency
+    waiting = {name: set(table["parents"]) for name, table in migration.tables.items()}
+    running = {}
+    stop = threading.Event()
+    error = None
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="atoa-migrate") as pool:
+            try:
+                while waiting or running:
+                    ready = [name for name, deps in waiting.items() if not deps]
+                    ready.sort(key=lambda name: -(migration.tables[name]["expected_rows"] or 0))
+                    for name in ready:
+                        del waiting[name]
+                        running[pool.submit(_migrate_table, migration, name, source_creds, target_creds,
+                                            batch_size, stop)] = name
+                    if not running:
+                        break
+                    done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        if future.exception() is None:
+                            for deps in waiting.values():
+                                deps.discard(name)
+                    if progress is not None:
+                        progress(migration.rows())
+            except BaseException:
+                # leaving the pool waits for the running tables, which stop after their current batch
+                stop.set()
+                raise
+        for name, deps in waiting.items():
+            migration.update(name, status="skipped", error=f"waits on failed table(s): {', '.join(sorted(deps))}")
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+        for name in waiting:
+            migration.update(name, status="skipped", error="migration stopped")
+        raise
+    finally:
+        failed = [name for name, table in migration.tables.items() if table["status"] == "failed"]
+        if error is None and failed:
+            error = f"{len(failed)} table(s) failed: {', '.join(failed[:10])}"
+        report = migration.metrics.finish(error=error)
+        migration.metrics.write()
+    return report
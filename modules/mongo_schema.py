@@ -0,0 +1,120 @@
+# modules/mongo_schema.py
+import os
+import random
+import time
+
+# documents looked at per inference; $sample picks them at random without a collection scan
+MONGO_SAMPLE_SIZE = int(os.getenv("ATOA_MONGO_SAMPLE_SIZE", "1000"))
+# upper bound on documents read when $sample isn't available and we reservoir-sample a scan
+MONGO_SCAN_LIMIT = int(os.getenv("ATOA_MONGO_SCAN_LIMIT", "100000"))
+
+NUMERIC_TYPES = {"int", "Int64", "float", "Decimal128"}
+
+
+def sample_documents(collection, size=MONGO_SAMPLE_SIZE, timeout=30):
+    """
+    Up to size random documents, within timeout seconds.
+    Uses $sample and falls back to reservoir sampling over a bounded scan
+    (views and some older servers reject $sample).
+    """
+    from pymongo.errors import OperationFailure
+
+    max_time_ms = int(timeout * 1000)
+    try:
+        return list(collection.aggregate([{"$sample": {"size": size}}], maxTimeMS=max_time_ms))
+    except OperationFailure:
+        pass
+
+    deadline = time.monotonic() + timeout
+    rng = random.Random()
+    reservoir = []
+    cursor = collection.find().limit(MONGO_SCAN_LIMIT).max_time_ms(max_time_ms)
+    for seen, doc in enumerate(cursor):
+        if seen < size:
+            reservoir.append(doc)
+        else:
+            slot = rng.randint(0, seen)
+            if slot < size:
+                reservoir[slot] = doc
+        if time.monotonic() > deadline:
+            break
+    cursor.close()
+    return reservoir
+
+
+def _observe(stats, doc):
+    for key, value in doc.items():
+        field = stats.setdefault(key, {"count": 0, "types": {}, "fields": {}, "items": {}})
+        field["count"] += 1
+        kind = type(value).__name__
+        field["types"][kind] = field["types"].get(kind, 0) + 1
+        if isinstance(value, str):
+            field["max_length"] = max(field.get("max_length", 0), len(value))
+        elif isinstance(value, dict):
+            _observe(field["fields"], value)
+        elif isinstance(value, list):
+            for item in value:
+                kind = type(item).__name__
+                field["items"].setdefault("types", {})
+                field["items"]["types"][kind] = field["items"]["types"].get(kind, 0) + 1
+                if isinstance(item, dict):
+                    field["items"]["count"] = field["items"].get("count", 0) + 1
+                    _observe(field["items"].setdefault("fields", {}), item)
+
+
+def merged_type(types):
+    """
+    One type name for a union: ints and floats widen to the widest numeric type,
+    anything else mixed becomes "mixed". Nulls don't count.
+    """
+    kinds = {kind for kind in types if kind != "NoneType"}
+    if not kinds:
+        return "NoneType"
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds <= NUMERIC_TYPES:
+        for kind in ("Decimal128", "float", "Int64", "int"):
+            if kind in kinds:
+                return kind
+    return "mixed"
+
+
+def _describe(stats, total, prefix=""):
+    schema = []
+    for key, field in stats.items():
+        path = f"{prefix}{key}"
+        entry = {
+            "name": key,
+            "path": path,
+            "type": merged_type(field["types"]),
+            "types": dict(field["types"]),
+            "frequency": round(field["count"] / total, 4) if total else 0.0,
+            "nullable": field["count"] < total or "NoneType" in field["types"],
+        }
+        if "max_length" in field:
+            entry["max_length"] = field["max_length"]
+        if field["fields"]:
+            entry["fields"] = _describe(field["fields"], field["types"].get("dict", 0), f"{path}.")
+        if field["items"]:
+            items = field["items"]
+            entry["items"] = {"type": merged_type(items["types"]), "types": dict(items["types"])}
+            if items.get("fields"):
+                entry["items"]["fields"] = _describe(items["fields"], items["count"], f"{path}.")
+        schema.append(entry)
+    return schema
+
+
+def infer_schema(documents):
+    """
+    Field list for a set of documents: each field has its name, dotted path, merged type,
+    the type counts behind it, the fraction of documents that contain it, whether it
+    can be missing or null and, for strings, the longest value seen. Subdocuments list
+    their own "fields"; arrays describe their "items" (and the fields of embedded documents).
+    """
+    stats = {}
+    for doc in documents:
+        _observe(stats, doc)
+    schema = _describe(stats, len(documents))
+    # _id first, then the most common fields
+    schema.sort(key=lambda field: (field["name"] != "_id", -field["frequency"]))
+    return schema
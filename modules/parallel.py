@@ -0,0 +1,179 @@
+# modules/parallel.py
+import decimal
+import math
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from modules.connections import borrow_connection
+from modules.extractor import DEFAULT_BATCH_SIZE
+from modules.indexes import deferred_indexes
+from modules.metrics import RunMetrics
+from modules.transfer import transfer_table
+
+# sources without an obvious integer key need one passed in explicitly
+DEFAULT_PARTITION_KEYS = {
+    "SQLite": "rowid",
+    "MongoDB": "_id",
+}
+
+# Mongo _id split points are picked from this many sampled ids per partition
+MONGO_SAMPLES_PER_PARTITION = 20
+
+
+def partition_key(db_type, key=None):
+    key = key or DEFAULT_PARTITION_KEYS.get(db_type)
+    if key is None:
+        raise ValueError(f"Parallel transfer from {db_type} needs an integer key column (key=...)")
+    return key
+
+
+def plan_partitions(db_type, creds, parallelism, key=None):
+    """
+    Splits the source into at most `parallelism` [lower, upper) key ranges.
+    The first range has no lower bound and the last no upper bound, so no row is missed.
+    """
+    key = partition_key(db_type, key)
+    if parallelism <= 1:
+        return [(None, None)]
+    if db_type == "MongoDB":
+        return _plan_mongo(creds, parallelism, key)
+
+    with borrow_connection(db_type, creds) as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {creds['table']}")
+        low, high = cursor.fetchone()
+        cursor.close()
+    if low is None:
+        return [(None, None)]
+
+    low, high = _integer_bound(key, low), _integer_bound(key, high)
+    step = max(1, math.ceil((high - low + 1) / parallelism))
+    bounds = list(range(low + step, high + 1, step))
+    return _ranges(bounds)
+
+
+def _integer_bound(key, value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    # NUMERIC(p, 0) keys come back as Decimal
+    if isinstance(value, decimal.Decimal) and value % 1 == 0:
+        return int(value)
+    raise ValueError(f"Partition key '{key}' must be an integer column; "
+                     f"its values are {type(value).__name__} (e.g. {value!r})")
+
+
+def _plan_mongo(creds, parallelism, key):
+    with borrow_connection("MongoDB", creds) as client:
+        collection = client[creds["database"]][creds["collection"]]
+        sample = collection.aggregate([
+            {"$sample": {"size": parallelism * MONGO_SAMPLES_PER_PARTITION}},
+            {"$project": {key: 1}},
+        ])
+        ids = sorted(doc[key] for doc in sample if key in doc)
+    if not ids:
+        return [(None, None)]
+    step = len(ids) / parallelism
+    bounds = sorted({ids[int(i * step)] for i in range(1, parallelism)})
+    return _ranges(bounds)
+
+
+def _ranges(bounds):
+    edges = [None] + list(bounds) + [None]
+    return [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+
+
+def _run_partition(index, source_type, source_creds, target_type, target_creds, transform,
+                   batch_size, key, lower, upper, events, measure):
+    # runs in a worker process: it gets its own connection pools and connections
+    def progress(done):
+        events.put((index, done))
+
+    metrics = RunMetrics(partition=index) if measure else None
+    rows = transfer_table(source_type, source_creds, target_type, target_creds, transform,
+                          batch_size, key, lower, upper, progress, metrics=metrics)
+    return index, rows, metrics.report(include_raw=True) if measure else None
+
+
+def run_parallel_transfer(source_type, source_creds, target_type, target_creds, parallelism=None,
+                          key=None, transform=None, batch_size=DEFAULT_BATCH_SIZE, progress=None, metrics=None,
+                          defer_indexes=False):
+    """
+    Transfers a table by key range across a process pool, one partition per task.
+    transform must be picklable (a module-level function).
+    progress, if given, is called as progress(partition_index, rows_done) from the calling process.
+    metrics, a modules.metrics.RunMetrics, receives the merged stage metrics of all partitions.
+    defer_indexes=True drops the target's secondary indexes once, before any partition
+    starts, and rebuilds them after the last one finishes.
+    Returns the per-partition row counts.
+    """
+    parallelism = parallelism or os.cpu_count() or 1
+    if target_type == "SQLite":
+        # SQLite takes a single writer; extra partitions would only wait on the file lock
+        parallelism = 1
+    key = partition_key(source_type, key)
+    partitions = plan_partitions(source_type, source_creds, parallelism, key)
+
+    if defer_indexes:
+        with deferred_indexes(target_type, target_creds):
+            return _run_partitions(partitions, parallelism, source_type, source_creds, target_type, target_creds,
+                                   key, transform, batch_size, progress, metrics)
+    return _run_partitions(partitions, parallelism, source_type, source_creds, target_type, target_creds,
+                           key, transform, batch_size, progress, metrics)
+
+
+def _run_partitions(partitions, parallelism, source_type, source_creds, target_type, target_creds,
+                    key, transform, batch_size, progress, metrics):
+    # spawn so workers don't inherit the parent's pooled sockets
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    events = manager.Queue()
+    counts = [0] * len(partitions)
+    pool = ProcessPoolExecutor(max_workers=min(parallelism, len(partitions)), mp_context=context)
+    try:
+        pending = {
+            pool.submit(_run_partition, index, source_type, source_creds, target_type, target_creds,
+                        transform, batch_size, key, lower, upper, events, metrics is not None)
+            for index, (lower, upper) in enumerate(partitions)
+        }
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            _drain(events, counts, progress)
+            for future in done:
+                index, rows, report = future.result()
+                counts[index] = rows
+                if report is not None:
+                    metrics.merge(report)
+        _drain(events, counts, progress)
+    except BaseException:
+        # a cancel (progress raising) or a failed partition stops the others mid-chunk;
+        # waiting for them would let the transfer finish behind the caller's back
+        _terminate(pool)
+        raise
+    else:
+        pool.shutdown()
+    finally:
+        manager.shutdown()
+    return counts
+
+
+def _terminate(pool):
+    # shutdown() forgets the worker processes, so take them first
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _drain(events, counts, progress):
+    while True:
+        try:
+            index, done = events.get_nowait()
+        except queue.Empty:
+            return
+        counts[index] = max(counts[index], done)
+        if progress is not None:
+            progress(index, done)
@@ -0,0 +1,205 @@
+# modules/planner.py
+import glob
+import json
+import math
+import os
+import statistics
+
+from modules.connections import borrow_connection
+from modules.connectors import get_connector
+from modules.metrics import RUN_REPORT_DIR, estimate_bytes
+from modules.parallel import DEFAULT_PARTITION_KEYS
+from modules.typemap import canonical_type
+
+# memory the built-in transfer may use, driver buffers and all
+PLAN_MEMORY_MB = float(os.getenv("ATOA_PLAN_MEMORY_MB", "512"))
+PLAN_MAX_PARALLELISM = int(os.getenv("ATOA_PLAN_MAX_PARALLELISM", "8"))
+# below this many rows a process pool costs more than it saves
+PLAN_PARALLEL_MIN_ROWS = int(os.getenv("ATOA_PLAN_PARALLEL_MIN_ROWS", "500000"))
+PLAN_ROWS_PER_PARTITION = 250_000
+# dropping and rebuilding indexes only pays off for big loads
+PLAN_DEFER_INDEX_MIN_ROWS = int(os.getenv("ATOA_PLAN_DEFER_INDEX_MIN_ROWS", "1000000"))
+PLAN_MIN_BATCH = 1_000
+PLAN_MAX_BATCH = 100_000
+# rows read to size a batch
+PLAN_SAMPLE_ROWS = 200
+# past runs looked at for the throughput of a source -> target pair
+PLAN_HISTORY_RUNS = 20
+# runs shorter than this are mostly connection setup and say little about throughput
+PLAN_HISTORY_MIN_ROWS = 1_000
+
+# a batch is held by the extractor, the transform and the loader's buffer at the same time
+BATCHES_IN_FLIGHT = 3
+# interpreter, pandas and pyarrow before the first batch arrives, per process
+BASE_MEMORY_MB = 150
+# each extra partition adds this fraction of a worker's throughput
+PARALLEL_EFFICIENCY = 0.75
+CONNECT_SECONDS = 1.0
+
+# rows/s of one worker when no past run is on record; conservative single-node numbers
+DEFAULT_EXTRACT_ROWS_PER_SEC = {
+    "PostgreSQL": 100_000,
+    "MySQL": 60_000,
+    "MSSQL": 50_000,
+    "MongoDB": 40_000,
+    "SQLite": 200_000,
+}
+DEFAULT_LOAD_ROWS_PER_SEC = {
+    "PostgreSQL": 60_000,
+    "MySQL": 20_000,
+    "MSSQL": 15_000,
+    "MongoDB": 25_000,
+    "SQLite": 80_000,
+}
+
+
+def table_stats(db_type, creds, sample_rows=PLAN_SAMPLE_ROWS):
+    """
+    Row count and size from the catalog (pg_class, information_schema.tables,
+    sys.dm_db_partition_stats, estimated_document_count, SQLite pages) plus the
+    in-memory size of an average row, measured on a small sample.
+    Never scans the table.
+    """
+    connector = get_connector(db_type)
+    with borrow_connection(db_type, creds) as connection:
+        try:
+            rows, size = connector.stats(connection, creds)
+        except Exception:
+            # the catalog views may need privileges the ETL user doesn't have;
+            # PostgreSQL also aborts the transaction, which the sample below still needs
+            if db_type != "MongoDB":
+                connection.rollback()
+            rows, size = None, None
+        sample = connector.sample(connection, creds, sample_rows)
+    # estimate_bytes reads columns=None as a batch of documents
+    columns = None if db_type == "MongoDB" else []
+    row_bytes = estimate_bytes((columns, sample)) / len(sample) if sample else None
+    return {
+        "rows": int(rows) if rows is not None else None,
+        "bytes": int(size) if size is not None else None,
+        "row_bytes": round(row_bytes) if row_bytes else None,
+        "sampled_rows": len(sample),
+    }
+
+
+def observed_throughput(source_type, target_type, directory=RUN_REPORT_DIR):
+    """
+    Median rows/s per worker of recent successful built-in runs between these
+    two database types (see modules.metrics.RunMetrics.write), or None.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime, reverse=True)
+    rates = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        context = report.get("context", {})
+        if (context.get("source_type") != source_type or context.get("target_type") != target_type
+                or report.get("error") or report.get("rows", 0) < PLAN_HISTORY_MIN_ROWS):
+            continue
+        rates.append(report["rows_per_sec"] / _speedup(context.get("parallelism") or 1))
+        if len(rates) >= PLAN_HISTORY_RUNS:
+            break
+    return (statistics.median(rates), len(rates)) if rates else (None, 0)
+
+
+def _speedup(parallelism):
+    return 1 + (parallelism - 1) * PARALLEL_EFFICIENCY
+
+
+def _default_throughput(source_type, target_type):
+    # extract and load alternate in one thread, so their times add up
+    extract = DEFAULT_EXTRACT_ROWS_PER_SEC.get(source_type, 20_000)
+    load = DEFAULT_LOAD_ROWS_PER_SEC.get(target_type, 10_000)
+    return 1 / (1 / extract + 1 / load)
+
+
+def integer_primary_key(db_type, schema):
+    for column in schema or []:
+        if column.get("primary_key") and canonical_type(db_type, column)[0].startswith("int"):
+            return column["name"]
+    return None
+
+
+def plan_transfer(source_type, source_creds, target_type, target_creds, schema=None, key=None,
+                  checkpoint_key=None, memory_mb=PLAN_MEMORY_MB, stats=None):
+    """
+    Predicts the runtime and peak memory of a built-in transfer from catalog
+    statistics and past runs, and picks batch size, parallelism and load strategy.
+    schema (from validate_and_fetch_schema) lets the plan find an integer primary key
+    to partition on; checkpoint_key means the user wants a resumable run.
+    Returns a dict, with the reasoning for each choice under "notes".
+    """
+    stats = stats or table_stats(source_type, source_creds)
+    notes = []
+    rows, row_bytes = stats["rows"], stats["row_bytes"] or 1
+    if rows is None and stats["bytes"] is not None:
+        rows = stats["bytes"] // row_bytes
+        notes.append("The catalog has no row count, so rows are estimated from the table size.")
+    elif rows is None:
+        notes.append("The catalog has no row count or size; the plan assumes a small table.")
+
+    partition_on = key or DEFAULT_PARTITION_KEYS.get(source_type) or integer_primary_key(source_type, schema)
+    parallelism = 1
+    if checkpoint_key:
+        strategy = "checkpointed"
+        notes.append(f"Resumable run on '{checkpoint_key}': chunks commit one at a time, so it runs in one worker.")
+    elif target_type == "SQLite":
+        strategy = "stream"
+        notes.append("SQLite takes a single writer, so the load runs in one worker.")
+    elif not rows or rows < PLAN_PARALLEL_MIN_ROWS:
+        strategy = "stream"
+        notes.append(f"Fewer than {PLAN_PARALLEL_MIN_ROWS:,} rows: one worker is fastest.")
+    elif partition_on is None:
+        strategy = "stream"
+        notes.append("No integer key to split the source on; give one to run in parallel.")
+    else:
+        parallelism = max(1, min(os.cpu_count() or 1, PLAN_MAX_PARALLELISM, math.ceil(rows / PLAN_ROWS_PER_PARTITION)))
+        strategy = "parallel" if parallelism > 1 else "stream"
+        if parallelism > 1:
+            notes.append(f"{parallelism} partitions on '{partition_on}', about {rows // parallelism:,} rows each.")
+        else:
+            notes.append("Only one CPU is available, so the load runs in one worker.")
+
+    budget = memory_mb * 1024 * 1024 - BASE_MEMORY_MB * 1024 * 1024 * _processes(parallelism)
+    batch_size = int(max(0, budget) / (parallelism * BATCHES_IN_FLIGHT * row_bytes))
+    batch_size = max(PLAN_MIN_BATCH, min(PLAN_MAX_BATCH, batch_size // 1000 * 1000))
+    if rows is not None and 0 < rows < batch_size:
+        batch_size = max(PLAN_MIN_BATCH, rows)
+    notes.append(f"Batches of {batch_size:,} rows (~{batch_size * row_bytes / (1024 * 1024):.1f} MB each "
+                 f"at {row_bytes:,} bytes/row) fit the {memory_mb:.0f} MB budget.")
+
+    defer_indexes = bool(rows and rows >= PLAN_DEFER_INDEX_MIN_ROWS)
+    if defer_indexes:
+        notes.append("Secondary indexes are dropped for the load and rebuilt once at the end.")
+
+    rate, runs = observed_throughput(source_type, target_type)
+    if rate is None:
+        rate = _default_throughput(source_type, target_type)
+        notes.append("No past runs for this pair yet; throughput is a default estimate.")
+    seconds = 2 * CONNECT_SECONDS + (rows or 0) / (rate * _speedup(parallelism))
+    memory = BASE_MEMORY_MB * _processes(parallelism) + parallelism * BATCHES_IN_FLIGHT * batch_size * row_bytes / (1024 * 1024)
+
+    return {
+        "source_rows": rows,
+        "source_bytes": stats["bytes"],
+        "row_bytes": stats["row_bytes"],
+        "rows_from_catalog": stats["rows"] is not None,
+        "rows_per_sec": round(rate * _speedup(parallelism)),
+        "history_runs": runs,
+        "batch_size": batch_size,
+        "parallelism": parallelism,
+        "partition_key": partition_on if parallelism > 1 else None,
+        "strategy": strategy,
+        "defer_indexes": defer_indexes,
+        "predicted_seconds": round(seconds, 1),
+        "predicted_memory_mb": round(memory),
+        "notes": notes,
+    }
+
+
+def _processes(parallelism):
+    # parallel runs add one spawned worker per partition to the app's own process
+    return 1 + parallelism if parallelism > 1 else 1
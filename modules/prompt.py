@@ -0,0 +1,139 @@
+# modules/prompt.py
+import datetime
+import decimal
+import json
+import os
+
+from modules.codecache import SECRET_FIELDS, placeholder
+from modules.connectors import get_connector
+from modules.typemap import canonical_type
+
+# upper bound for the code-generation prompt, in (estimated) tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("ATOA_PROMPT_TOKEN_BUDGET", "3000"))
+# English text and code average about four characters per token
+CHARS_PER_TOKEN = 4
+# preview strings longer than this are cut
+PREVIEW_VALUE_CHARS = 40
+# columns listed once the prompt has to shed everything else
+PROMPT_MIN_COLUMNS = 40
+
+# tried in order until the prompt fits the budget
+COMPACTION_LEVELS = [
+    {"rows": 2, "typed": False, "columns": None},
+    {"rows": 1, "typed": False, "columns": None},
+    {"rows": 1, "typed": True, "columns": None},
+    {"rows": 0, "typed": True, "columns": None},
+    {"rows": 0, "typed": True, "columns": PROMPT_MIN_COLUMNS},
+]
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def credential_placeholders(role, db_type, creds):
+    """
+    The connection fields db_type needs, with every secret replaced by the
+    placeholder modules.codecache.fill_credentials swaps back in before a run.
+    """
+    rendered = {}
+    for key, _, _ in get_connector(db_type).fields:
+        # the graph sends "username" where the UI sends "user"
+        field = "username" if key == "user" and not creds.get("user") and creds.get("username") else key
+        value = creds.get(field)
+        if value is None or str(value) == "":
+            continue
+        rendered[key] = placeholder(role, field) if field in SECRET_FIELDS else value
+    return rendered
+
+
+def _column_line(db_type, column):
+    kind, size, precision, scale = canonical_type(db_type, column)
+    if size:
+        kind += f"({size})"
+    elif precision:
+        kind += f"({precision},{scale or 0})"
+    line = f"{column['name']} {kind}"
+    if column.get("primary_key"):
+        line += " pk"
+    elif column.get("nullable") is False:
+        line += " not null"
+    return line
+
+
+def _mongo_lines(fields, lines):
+    for field in fields:
+        optional = "" if field["frequency"] >= 1 and not field["nullable"] else f" optional({field['frequency']:.0%})"
+        lines.append(f"{field['path']} {field['type']}{optional}")
+        if field.get("fields"):
+            _mongo_lines(field["fields"], lines)
+        items = field.get("items")
+        if items:
+            lines.append(f"{field['path']}[] {items['type']}")
+            if items.get("fields"):
+                _mongo_lines([{**f, "path": f["path"].replace(field["path"], field["path"] + "[]", 1)}
+                              for f in items["fields"]], lines)
+    return lines
+
+
+def schema_summary(db_type, schema, max_columns=None):
+    """
+    One short line per column ("name type [pk|not null]"); MongoDB fields are
+    flattened to dotted paths with arrays marked "[]". Repeated lines are dropped.
+    """
+    if not schema:
+        return "(none)"
+    if db_type == "MongoDB":
+        lines = _mongo_lines(schema, [])
+    else:
+        lines = [_column_line(db_type, column) for column in schema]
+    lines = list(dict.fromkeys(lines))
+    if max_columns and len(lines) > max_columns:
+        lines = lines[:max_columns] + [f"... and {len(lines) - max_columns} more"]
+    return "\n".join(lines)
+
+
+def _compact_value(value, typed):
+    if typed:
+        return f"<{type(value).__name__}>"
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    text = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+    return text if len(text) <= PREVIEW_VALUE_CHARS else text[:PREVIEW_VALUE_CHARS] + "..."
+
+
+def preview_summary(preview, schema, rows=2, typed=False):
+    """
+    The first `rows` preview rows as compact JSON, long values cut and, with
+    typed=True, every value replaced by its type name.
+    """
+    if not preview or rows <= 0:
+        return None
+    lines = []
+    for row in list(preview)[:rows]:
+        if isinstance(row, dict):
+            lines.append(json.dumps({str(k): _compact_value(v, typed) for k, v in row.items()}, default=str))
+        else:
+            lines.append(json.dumps([_compact_value(v, typed) for v in row], default=str))
+    if not isinstance(preview[0], dict) and schema:
+        lines.insert(0, json.dumps([column["name"] for column in schema]))
+    return "\n".join(lines)
+
+
+def compact(render, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Calls render(level) with each of COMPACTION_LEVELS until the prompt fits the budget.
+    Returns (prompt, stats); the most compact prompt is returned even when it doesn't fit.
+    """
+    for index, level in enumerate(COMPACTION_LEVELS):
+        prompt = render(level)
+        tokens = estimate_tokens(prompt)
+        if tokens <= budget:
+            break
+    return prompt, {"tokens": tokens, "budget": budget, "level": index, "fits": tokens <= budget}
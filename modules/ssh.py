@@ -0,0 +1,266 @@
+# modules/ssh.py
+import codecs
+import hashlib
+import io
+import os
+import shlex
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+
+SSH_IDLE_TIMEOUT = float(os.getenv("ATOA_SSH_IDLE_TIMEOUT", "600"))
+SSH_CONNECT_TIMEOUT = float(os.getenv("ATOA_SSH_CONNECT_TIMEOUT", "15"))
+REMOTE_PYTHON = os.getenv("ATOA_REMOTE_PYTHON", "python3")
+READ_CHUNK = 32768
+# commands run at once over one transport; OpenSSH's MaxSessions (default 10) counts the
+# SFTP channel too, and refuses channels beyond it with "open failed"
+SSH_MAX_CHANNELS = int(os.getenv("ATOA_SSH_MAX_CHANNELS", "8"))
+
+
+class SSHSession:
+    """
+    One authenticated transport to a host plus a reusable SFTP channel.
+    Commands open cheap channels on the existing transport instead of new connections.
+    """
+
+    def __init__(self, host, user, password, port=22, max_channels=None):
+        self.host = host
+        self.client = paramiko.SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(hostname=host, port=port, username=user, password=password,
+                            timeout=SSH_CONNECT_TIMEOUT, banner_timeout=SSH_CONNECT_TIMEOUT)
+        self.transport = self.client.get_transport()
+        # keep NAT/firewalls from dropping the idle connection between runs
+        self.transport.set_keepalive(30)
+        self._sftp = None
+        self._sftp_lock = threading.Lock()
+        # commands in flight; several jobs can share the session, so it's only touched under the lock
+        self._running_lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.running = 0
+        # further commands wait for a free channel instead of being refused by the server
+        self._channels = threading.BoundedSemaphore(max(1, max_channels or SSH_MAX_CHANNELS))
+
+    def is_active(self):
+        return self.transport is not None and self.transport.is_active()
+
+    def touch(self):
+        with self._running_lock:
+            self.last_used = time.monotonic()
+
+    def idle_for(self, now):
+        """Seconds since the last command finished, 0 while one is running."""
+        with self._running_lock:
+            return 0 if self.running else now - self.last_used
+
+    def upload(self, data, remote_path):
+        with self._sftp_lock:
+            if self._sftp is None:
+                self._sftp = self.client.open_sftp()
+            self._sftp.putfo(io.BytesIO(data), remote_path)
+
+    def remove(self, remote_path):
+        with self._sftp_lock:
+            if self._sftp is None:
+                self._sftp = self.client.open_sftp()
+            try:
+                self._sftp.remove(remote_path)
+            except IOError:
+                pass
+
+    def stream(self, command, on_output=None, cancel=None, timeout=None):
+        """
+        Runs command and reads stdout/stderr as they arrive instead of after exit.
+        on_output(stream_name, text) is called for every chunk ("stdout" or "stderr").
+        Setting the cancel event or passing timeout kills the remote process.
+        At most max_channels commands run at once; the rest wait for a channel.
+        Returns (stdout, stderr, exit_status).
+        """
+        with self._running_lock:
+            self.running += 1
+            self.last_used = time.monotonic()
+        try:
+            while not self._channels.acquire(timeout=0.1):
+                if cancel is not None and cancel.is_set():
+                    return "", "❌ Script cancelled", -1
+            try:
+                return self._stream(command, on_output, cancel, timeout)
+            finally:
+                self._channels.release()
+        finally:
+            with self._running_lock:
+                self.running -= 1
+                self.last_used = time.monotonic()
+
+    def _stream(self, command, on_output, cancel, timeout):
+        channel = self.transport.open_session()
+        # the shell prints its pid and then becomes the command, so we know what to kill
+        channel.exec_command(f"echo $$; exec {command}")
+        out, err = [], []
+        # a multi-byte character can straddle two reads; the decoders hold on to the partial bytes
+        decode_out = codecs.getincrementaldecoder("utf-8")(errors="replace").decode
+        decode_err = codecs.getincrementaldecoder("utf-8")(errors="replace").decode
+        pid, head = None, ""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stopped = None
+            if cancel is not None and cancel.is_set():
+                stopped = "❌ Script cancelled"
+            elif deadline is not None and time.monotonic() >= deadline:
+                stopped = f"❌ Script timed out after {timeout}s"
+            if stopped:
+                # close first, so the kill's channel doesn't push the transport past the limit
+                channel.close()
+                if pid:
+                    self._kill(pid)
+                return "".join(out), stopped, -1
+            received = False
+            if channel.recv_ready():
+                chunk = decode_out(channel.recv(READ_CHUNK))
+                received = True
+                if pid is None:
+                    head += chunk
+                    if "\n" not in head:
+                        continue
+                    pid, chunk = head.split("\n", 1)
+                    pid = pid.strip()
+                if chunk:
+                    out.append(chunk)
+                    if on_output:
+                        on_output("stdout", chunk)
+            if channel.recv_stderr_ready():
+                chunk = decode_err(channel.recv_stderr(READ_CHUNK))
+                err.append(chunk)
+                received = True
+                if on_output:
+                    on_output("stderr", chunk)
+            if not received:
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                time.sleep(0.05)
+        status = channel.recv_exit_status()
+        channel.close()
+        for chunks, decode in ((out, decode_out), (err, decode_err)):
+            tail = decode(b"", final=True)
+            if tail:
+                chunks.append(tail)
+        return "".join(out), "".join(err), status
+
+    def _kill(self, pid):
+        if not pid.isdigit():
+            return
+        channel = self.transport.open_session()
+        channel.exec_command(f"kill {pid}")
+        channel.recv_exit_status()
+        channel.close()
+
+    def close(self):
+        with self._sftp_lock:
+            if self._sftp is not None:
+                self._sftp.close()
+                self._sftp = None
+        self.client.close()
+
+
+class SSHSessionPool:
+    """
+    Keeps one live SSHSession per (host, port, user, password) and drops idle ones.
+    """
+
+    def __init__(self, idle_timeout=SSH_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _key(self, host, user, password, port):
+        return (host.strip().lower(), int(port), user, hashlib.sha256(password.encode()).hexdigest())
+
+    def get(self, host, user, password, port=22):
+        key = self._key(host, user, password, port)
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.pop(key, None)
+            if session is not None and session.is_active():
+                # handed out now, so it isn't evicted before its command starts
+                session.touch()
+                self._sessions[key] = session
+                return session
+        if session is not None:
+            session.close()
+
+        # handshake outside the lock so other hosts aren't held up
+        fresh = SSHSession(host, user, password, port)
+        with self._lock:
+            existing = self._sessions.get(key)
+            if existing is not None and existing.is_active():
+                fresh.close()
+                existing.touch()
+                return existing
+            self._sessions[key] = fresh
+            return fresh
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for key, session in list(self._sessions.items()):
+            if session.idle_for(now) > self.idle_timeout:
+                session.close()
+                del self._sessions[key]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+ssh_pool = SSHSessionPool()
+
+
+def run_remote_script(code, host, user, password, port=22, env=None, on_output=None, cancel=None, timeout=None):
+    """
+    Uploads code over the pooled SFTP channel, runs it with the remote python and
+    streams its output. Returns (stdout, stderr, exit_status).
+    """
+    session = ssh_pool.get(host, user, password, port)
+    remote_path = f"/tmp/atoa_etl_{uuid.uuid4().hex}.py"
+    session.upload(code.encode(), remote_path)
+    try:
+        prefix = " ".join(f"{name}={shlex.quote(str(value))}" for name, value in (env or {}).items())
+        command = f"env {prefix} {REMOTE_PYTHON} {remote_path}" if prefix else f"{REMOTE_PYTHON} {remote_path}"
+        return session.stream(command, on_output, cancel, timeout)
+    finally:
+        session.remove(remote_path)
+
+
+def run_partitioned_remote(code, partitions, hosts, on_output=None, cancel=None, timeout=None):
+    """
+    Fans one script out over several hosts, one run per (lower, upper) partition
+    (see modules.parallel.plan_partitions), assigned to hosts round-robin.
+    Each run sees ATOA_PARTITION_INDEX / ATOA_PARTITION_LOWER / ATOA_PARTITION_UPPER.
+    hosts is a list of {"host", "user", "password", "port"} dicts.
+    on_output(index, stream_name, text) receives the streamed output of every run;
+    cancel and timeout apply to every run (see SSHSession.stream). Runs on the same
+    host share its pooled transport, ATOA_SSH_MAX_CHANNELS of them at a time.
+    Returns [(host, stdout, stderr, exit_status)] in partition order.
+    """
+    def run(index, lower, upper):
+        target = hosts[index % len(hosts)]
+        env = {
+            "ATOA_PARTITION_INDEX": index,
+            "ATOA_PARTITION_LOWER": "" if lower is None else lower,
+            "ATOA_PARTITION_UPPER": "" if upper is None else upper,
+        }
+        callback = (lambda stream, text: on_output(index, stream, text)) if on_output else None
+        try:
+            out, err, status = run_remote_script(code, target["host"], target["user"], target["password"],
+                                                 target.get("port", 22), env, callback, cancel, timeout)
+        except Exception as e:
+            out, err, status = "", f"❌ SSH Error: {e}", -1
+        return target["host"], out, err, status
+
+    with ThreadPoolExecutor(max_workers=len(partitions) or 1, thread_name_prefix="atoa-ssh") as executor:
+        futures = [executor.submit(run, index, lower, upper) for index, (lower, upper) in enumerate(partitions)]
+        return [future.result() for future in futures]
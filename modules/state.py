@@ -0,0 +1,164 @@
+# modules/state.py
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from modules.connections import credential_fingerprint
+
+STATE_PATH = os.getenv("ATOA_STATE_PATH", os.path.join(".atoa_cache", "state.sqlite"))
+
+
+def pipeline_id(source_type, source_creds, target_type, target_creds, key):
+    """
+    Stable id for a source table -> target table pipeline tracked on `key`.
+    """
+    payload = json.dumps([
+        source_type, credential_fingerprint(source_type, source_creds),
+        source_creds.get("table") or source_creds.get("collection"),
+        target_type, credential_fingerprint(target_type, target_creds),
+        target_creds.get("table") or target_creds.get("collection"),
+        key,
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def table_id(db_type, creds):
+    """
+    Stable id for one table/collection of a database.
+    """
+    payload = json.dumps([db_type, credential_fingerprint(db_type, creds), creds.get("table") or creds.get("collection")])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _is_object_id(value):
+    # an ObjectId can only exist once the MongoDB driver imported bson
+    bson = sys.modules.get("bson")
+    return bson is not None and isinstance(value, bson.ObjectId)
+
+
+def encode_value(value):
+    # keep enough type information to compare against the source column again
+    if _is_object_id(value):
+        return {"type": "objectid", "value": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"type": "date", "value": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"type": "decimal", "value": str(value)}
+    return {"type": "json", "value": value}
+
+
+def decode_value(encoded):
+    kind, value = encoded["type"], encoded["value"]
+    if kind == "objectid":
+        from bson import ObjectId
+
+        return ObjectId(value)
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "date":
+        return datetime.date.fromisoformat(value)
+    if kind == "decimal":
+        return decimal.Decimal(value)
+    return value
+
+
+class StateStore:
+    """
+    Small SQLite file holding per-pipeline run state (watermarks, checkpoints) and
+    the DDL of indexes dropped for a load until they are rebuilt.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " pipeline TEXT PRIMARY KEY, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " pipeline TEXT PRIMARY KEY, key TEXT NOT NULL, last_key TEXT NOT NULL, rows INTEGER NOT NULL,"
+                " batches INTEGER NOT NULL, batch_hash TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS dropped_indexes ("
+                " target TEXT PRIMARY KEY, statements TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_watermark(self, pipeline):
+        with self._lock, self._connect() as connection:
+            row = connection.execute("SELECT value FROM watermarks WHERE pipeline = ?", (pipeline,)).fetchone()
+        return decode_value(json.loads(row[0])) if row else None
+
+    def set_watermark(self, pipeline, key, value):
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO watermarks (pipeline, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (pipeline, key, json.dumps(encode_value(value)), time.time()),
+            )
+
+    def reset_watermark(self, pipeline):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM watermarks WHERE pipeline = ?", (pipeline,))
+
+    def get_checkpoint(self, pipeline):
+        """Last committed chunk as {"key", "last_key", "rows", "batches", "batch_hash"}, or None."""
+        with self._lock, self._connect() as connection:
+            row = connection.execute(
+                "SELECT key, last_key, rows, batches, batch_hash FROM checkpoints WHERE pipeline = ?", (pipeline,)
+            ).fetchone()
+        if row is None:
+            return None
+        key, last_key, rows, batches, batch_hash = row
+        return {"key": key, "last_key": decode_value(json.loads(last_key)), "rows": rows,
+                "batches": batches, "batch_hash": batch_hash}
+
+    def set_checkpoint(self, pipeline, key, last_key, rows, batches, batch_hash):
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (pipeline, key, last_key, rows, batches, batch_hash, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (pipeline, key, json.dumps(encode_value(last_key)), rows, batches, batch_hash, time.time()),
+            )
+
+    def reset_checkpoint(self, pipeline):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM checkpoints WHERE pipeline = ?", (pipeline,))
+
+    def get_dropped_indexes(self, target):
+        """What modules.indexes dropped on target and hasn't rebuilt yet, or None."""
+        with self._lock, self._connect() as connection:
+            row = connection.execute("SELECT statements FROM dropped_indexes WHERE target = ?", (target,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_dropped_indexes(self, target, statements):
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO dropped_indexes (target, statements, updated_at) VALUES (?, ?, ?)",
+                (target, json.dumps(statements), time.time()),
+            )
+
+    def reset_dropped_indexes(self, target):
+        with self._lock, self._connect() as connection:
+            connection.execute("DELETE FROM dropped_indexes WHERE target = ?", (target,))
@@ -0,0 +1,146 @@
+# modules/transfer.py
+import os
+import tempfile
+import time
+
+from modules.batches import read_parquet_batches, spill_to_parquet
+from modules.connections import get_pool
+from modules.extractor import DEFAULT_BATCH_SIZE, stream_batches, stream_record_batches
+from modules.indexes import drop_secondary_indexes, rebuild_indexes
+from modules.loader import load_batches
+from modules.upsert import upsert_batches
+from modules.metrics import batch_rows, estimate_bytes
+
+
+def transfer_table(source_type, source_creds, target_type, target_creds, transform=None,
+                   batch_size=DEFAULT_BATCH_SIZE, key=None, lower=None, upper=None, progress=None, after=None,
+                   schema=None, spill=False, metrics=None, defer_indexes=False, upsert_key=None,
+                   add_hash_column=False):
+    """
+    Streams one table/collection (or one key range of it) from source to target.
+    transform, if given, maps a (columns, rows) batch to a new (columns, rows) batch.
+    progress, if given, is called with the running row count after every batch.
+    Returns the number of rows loaded.
+
+    With schema (a pyarrow schema, see modules.batches.arrow_schema) the stages pass
+    Arrow RecordBatches instead and transform takes and returns a RecordBatch.
+    spill=True (Arrow only) first writes the whole extract to a temporary Parquet file,
+    releasing the source before the load starts.
+
+    metrics (a modules.metrics.RunMetrics) collects connect/extract/transform/load timings.
+    defer_indexes=True drops the target's secondary indexes for the load and rebuilds
+    them afterwards (see modules.indexes), which pays off for large loads.
+    upsert_key (a column or list of columns) updates rows that already exist instead of
+    appending, skipping the ones whose content hasn't changed (see modules.upsert).
+    add_hash_column=True lets the upsert add its row hash column to the target.
+    """
+    if metrics is not None:
+        _measure_connect(metrics, source_type, source_creds, target_type, target_creds)
+
+    def batches():
+        done = 0
+        if schema is not None:
+            source = stream_record_batches(source_type, source_creds, schema, batch_size, key, lower, upper, after)
+        else:
+            source = stream_batches(source_type, source_creds, batch_size, key, lower, upper, after)
+        if metrics is not None:
+            source = _timed(source, metrics, "extract")
+        for item in source:
+            started = time.perf_counter()
+            if schema is not None:
+                item = transform(item) if transform is not None else item
+            elif transform is not None:
+                item = transform(*item)
+            count = batch_rows(item)
+            if metrics is not None and transform is not None:
+                metrics.record_batch("transform", time.perf_counter() - started, count, estimate_bytes(item))
+            yield item
+            done += count
+            if progress is not None:
+                progress(done)
+
+    if spill and schema is None:
+        raise ValueError("spill=True needs an Arrow schema")
+    if not defer_indexes:
+        return _load_all(target_type, target_creds, batches(), batch_size, spill, metrics, upsert_key, add_hash_column)
+
+    saved = drop_secondary_indexes(target_type, target_creds)
+    try:
+        return _load_all(target_type, target_creds, batches(), batch_size, spill, metrics, upsert_key, add_hash_column)
+    finally:
+        started = time.perf_counter()
+        rebuild_indexes(target_type, target_creds, saved)
+        if metrics is not None:
+            metrics.add_time("rebuild_indexes", time.perf_counter() - started)
+
+
+def _load_all(target_type, target_creds, items, batch_size, spill, metrics, upsert_key=None, add_hash_column=False):
+    if not spill:
+        return _load(target_type, target_creds, items, metrics, upsert_key, add_hash_column)
+
+    fd, path = tempfile.mkstemp(suffix=".parquet", prefix="atoa_spill_")
+    os.close(fd)
+    try:
+        # a transform may change the schema, so take it from the first batch
+        first = next(items, None)
+        if first is None:
+            return 0
+        spill_to_parquet(_chain(first, items), path, first.schema)
+        return _load(target_type, target_creds, read_parquet_batches(path, batch_size), metrics, upsert_key,
+                     add_hash_column)
+    finally:
+        os.remove(path)
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def _measure_connect(metrics, source_type, source_creds, target_type, target_creds):
+    # one borrow per side times the handshake and leaves the connection pooled for the run
+    for db_type, creds in ((source_type, source_creds), (target_type, target_creds)):
+        with metrics.stage("connect"):
+            pool = get_pool(db_type, creds)
+            pool.release(pool.acquire())
+
+
+def _timed(items, metrics, stage):
+    iterator = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            metrics.add_time(stage, time.perf_counter() - started)
+            return
+        metrics.record_batch(stage, time.perf_counter() - started, batch_rows(item), estimate_bytes(item))
+        yield item
+
+
+def _load(target_type, target_creds, items, metrics, upsert_key=None, add_hash_column=False):
+    def load(batches):
+        if upsert_key is not None:
+            return upsert_batches(target_type, target_creds, batches, upsert_key, metrics=metrics,
+                                  add_hash_column=add_hash_column)
+        return load_batches(target_type, target_creds, batches)
+
+    if metrics is None:
+        return load(items)
+
+    finished = []
+
+    def observed():
+        for item in items:
+            handed_over = time.perf_counter()
+            yield item
+            # the loader asks for the next batch once this one is written
+            metrics.record_batch("load", time.perf_counter() - handed_over, batch_rows(item), estimate_bytes(item))
+            metrics.sample_memory()
+        finished.append(time.perf_counter())
+
+    loaded = load(observed())
+    if finished:
+        # the commit runs after the last batch was handed over
+        metrics.add_time("load", time.perf_counter() - finished[0])
+    return loaded
@@ -0,0 +1,157 @@
+# modules/transform.py
+import functools
+
+import pandas as pd
+import pyarrow as pa
+
+# A transform plan is a JSON list of steps applied in order, e.g.
+# [
+#   {"op": "rename", "columns": {"name": "username"}},
+#   {"op": "cast", "columns": {"salary": "float"}},
+#   {"op": "date_format", "column": "created_at", "format": "%Y-%m-%dT%H:%M:%S"},
+#   {"op": "filter", "expr": "salary > 1000"},
+#   {"op": "drop_nulls", "columns": ["email"]},
+#   {"op": "derive", "column": "total", "expr": "price * qty"},
+#   {"op": "lookup", "column": "country", "mapping": {"IN": "India"}, "target": "country_name"}
+# ]
+CAST_TYPES = {
+    "int": "Int64",
+    "float": "float64",
+    "str": "string",
+    "bool": "boolean",
+    "datetime": "datetime",
+}
+
+REQUIRED_FIELDS = {
+    "rename": ["columns"],
+    "cast": ["columns"],
+    "date_format": ["column", "format"],
+    "filter": ["expr"],
+    "drop_nulls": [],
+    "derive": ["column", "expr"],
+    "lookup": ["column", "mapping"],
+}
+
+
+def validate_plan(plan):
+    """
+    Checks that every step names a known operation and carries its required fields.
+    Raises ValueError describing the first bad step.
+    """
+    if not isinstance(plan, list):
+        raise ValueError("Transform plan must be a list of steps")
+    for index, step in enumerate(plan):
+        op = step.get("op") if isinstance(step, dict) else None
+        if op not in REQUIRED_FIELDS:
+            raise ValueError(f"Step {index}: unknown op {op!r}, expected one of {sorted(REQUIRED_FIELDS)}")
+        missing = [field for field in REQUIRED_FIELDS[op] if field not in step]
+        if missing:
+            raise ValueError(f"Step {index} ({op}): missing {', '.join(missing)}")
+        if op in ("rename", "cast") and not isinstance(step["columns"], dict):
+            target = "new names" if op == "rename" else "types"
+            raise ValueError(f"Step {index} ({op}): columns must map column names to {target}")
+        if op == "lookup" and not isinstance(step["mapping"], dict):
+            raise ValueError(f"Step {index} (lookup): mapping must be an object")
+        if op == "cast":
+            unknown = [t for t in step["columns"].values() if t not in CAST_TYPES]
+            if unknown:
+                raise ValueError(f"Step {index} (cast): unknown types {unknown}, expected one of {sorted(CAST_TYPES)}")
+    return plan
+
+
+def _cast(df, columns):
+    for column, kind in columns.items():
+        if kind == "datetime":
+            df[column] = pd.to_datetime(df[column], format="mixed", errors="coerce")
+        elif kind in ("int", "float"):
+            numbers = pd.to_numeric(df[column], errors="coerce")
+            if kind == "int":
+                # like unparseable values, fractions become nulls rather than being truncated
+                numbers = numbers.where(numbers % 1 == 0)
+            df[column] = numbers.astype(CAST_TYPES[kind])
+        else:
+            df[column] = df[column].astype(CAST_TYPES[kind])
+    return df
+
+
+def apply_step(df, step):
+    op = step["op"]
+    if op == "rename":
+        return df.rename(columns=step["columns"])
+    if op == "cast":
+        return _cast(df, step["columns"])
+    if op == "date_format":
+        # without an input format, parse each value on its own rather than guessing from the first
+        parsed = pd.to_datetime(df[step["column"]], format=step.get("input_format") or "mixed", errors="coerce")
+        df[step["column"]] = parsed.dt.strftime(step["format"])
+        return df
+    if op == "filter":
+        return df.query(step["expr"])
+    if op == "drop_nulls":
+        return df.dropna(subset=step.get("columns") or None)
+    if op == "derive":
+        df[step["column"]] = df.eval(step["expr"])
+        return df
+    if op == "lookup":
+        looked_up = df[step["column"]].map(step["mapping"])
+        if "default" in step:
+            looked_up = looked_up.where(looked_up.notna(), step["default"])
+        df[step.get("target", step["column"])] = looked_up
+        return df
+    raise ValueError(f"Unknown transform op: {op}")
+
+
+def _is_integer(value):
+    return value is None or (isinstance(value, int) and not isinstance(value, bool))
+
+
+def to_frame(columns, rows):
+    if columns is None:
+        df = pd.DataFrame(rows)
+        values = lambda index, column: [doc.get(column) for doc in rows]
+    else:
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        values = lambda index, column: [row[index] for row in rows]
+    # pandas stores an integer column with NULLs as float64; keep it integral as nullable Int64
+    for index, column in enumerate(df.columns):
+        if df[column].dtype == "float64" and df[column].isna().any():
+            original = values(index, column)
+            if all(_is_integer(value) for value in original):
+                df[column] = pd.array(original, dtype="Int64")
+    return df
+
+
+def from_frame(df):
+    # back to plain Python values so every driver can bind them (NaN/NaT/NA -> None);
+    # Int64 columns come back as Python ints, not floats
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.columns), list(df.itertuples(index=False, name=None))
+
+
+def apply_plan(plan, columns, rows=None):
+    """
+    Applies the plan to one (columns, rows) batch as column-wise pandas operations
+    and returns the transformed (columns, rows) batch.
+    Called with a single pyarrow RecordBatch instead, it returns a RecordBatch.
+    """
+    if isinstance(columns, pa.RecordBatch):
+        df = columns.to_pandas()
+        for step in plan:
+            df = apply_step(df, step)
+        return pa.RecordBatch.from_pandas(df, preserve_index=False)
+
+    df = to_frame(columns, rows)
+    for step in plan:
+        df = apply_step(df, step)
+    return from_frame(df)
+
+
+def make_transform(plan):
+    """
+    Turns a plan into a transform for modules.transfer.transfer_table.
+    The result is picklable, so it can be shipped to parallel transfer workers.
+    An empty plan gives None, so batches skip the pandas round-trip altogether.
+    """
+    if not validate_plan(plan):
+        return None
+    return functools.partial(apply_plan, plan)
@@ -0,0 +1,222 @@
+# modules/typemap.py
+import re
+
+from modules.connections import borrow_connection
+
+# PostgreSQL cursor.description type OIDs
+POSTGRES_KINDS = {
+    16: "bool",
+    20: "int64", 21: "int16", 23: "int32", 26: "int64",
+    700: "float32", 701: "float64", 1700: "decimal",
+    25: "text", 1042: "string", 1043: "string",
+    1082: "date", 1083: "time", 1114: "datetime", 1184: "datetimetz",
+    17: "binary", 114: "json", 3802: "json", 2950: "uuid",
+}
+
+# pyodbc reports python classes (str(type) in the MSSQL schema)
+MSSQL_PYTHON_KINDS = {
+    "bool": "bool", "int": "int", "float": "float64", "decimal.decimal": "decimal",
+    "str": "string", "bytes": "binary", "bytearray": "binary", "uuid.uuid": "uuid",
+    "datetime.datetime": "datetime", "datetime.date": "date", "datetime.time": "time",
+}
+
+MONGO_KINDS = {
+    "objectid": "objectid", "str": "string", "int": "int64", "int64": "int64", "float": "float64",
+    "decimal128": "decimal", "bool": "bool", "datetime": "datetime", "timestamp": "datetime",
+    "dict": "json", "list": "json", "mixed": "json", "bytes": "binary", "binary": "binary",
+    "uuid": "uuid",
+}
+
+# checked in order against declared type names (MySQL DESCRIBE, SQLite PRAGMA)
+NAME_PATTERNS = [
+    ("tinyint(1)", "bool"),
+    ("bit(1)", "bool"),
+    ("bool", "bool"),
+    ("interval", "text"),
+    ("bigint", "int64"),
+    ("smallint", "int16"),
+    ("tinyint", "int16"),
+    ("year", "int16"),
+    ("int", "int32"),
+    ("double", "float64"),
+    ("float", "float32"),
+    ("real", "float32"),
+    ("decimal", "decimal"),
+    ("numeric", "decimal"),
+    ("json", "json"),
+    ("uuid", "uuid"),
+    ("timestamptz", "datetimetz"),
+    ("with time zone", "datetimetz"),
+    ("datetime", "datetime"),
+    ("timestamp", "datetime"),
+    ("date", "date"),
+    ("time", "time"),
+    ("text", "text"),
+    ("clob", "text"),
+    ("char", "string"),
+    ("enum", "string"),
+    ("blob", "binary"),
+    ("binary", "binary"),
+    ("bytea", "binary"),
+]
+
+# sampled string lengths are doubled and rounded up, so a longer value later still fits
+STRING_HEADROOM = 2
+MIN_STRING_SIZE = 64
+# longer strings become TEXT / NVARCHAR(MAX)
+MAX_STRING_SIZE = {"PostgreSQL": 10485760, "MySQL": 1024, "MSSQL": 4000, "SQLite": 0}
+DECIMAL_MAX_PRECISION = {"MySQL": 65, "MSSQL": 38}
+
+SQL_TYPES = {
+    "PostgreSQL": {
+        "bool": "BOOLEAN", "int16": "SMALLINT", "int32": "INTEGER", "int64": "BIGINT",
+        "float32": "REAL", "float64": "DOUBLE PRECISION", "decimal": "NUMERIC",
+        "string": "VARCHAR", "text": "TEXT", "date": "DATE", "time": "TIME",
+        "datetime": "TIMESTAMP", "datetimetz": "TIMESTAMPTZ", "binary": "BYTEA",
+        "json": "JSONB", "uuid": "UUID", "objectid": "CHAR(24)",
+    },
+    "MySQL": {
+        "bool": "TINYINT(1)", "int16": "SMALLINT", "int32": "INT", "int64": "BIGINT",
+        "float32": "FLOAT", "float64": "DOUBLE", "decimal": "DECIMAL(65, 30)",
+        "string": "VARCHAR", "text": "LONGTEXT", "date": "DATE", "time": "TIME(6)",
+        "datetime": "DATETIME(6)", "datetimetz": "DATETIME(6)", "binary": "LONGBLOB",
+        "json": "JSON", "uuid": "CHAR(36)", "objectid": "CHAR(24)",
+    },
+    "MSSQL": {
+        "bool": "BIT", "int16": "SMALLINT", "int32": "INT", "int64": "BIGINT",
+        "float32": "REAL", "float64": "FLOAT", "decimal": "DECIMAL(38, 10)",
+        "string": "NVARCHAR", "text": "NVARCHAR(MAX)", "date": "DATE", "time": "TIME",
+        "datetime": "DATETIME2", "datetimetz": "DATETIMEOFFSET", "binary": "VARBINARY(MAX)",
+        "json": "NVARCHAR(MAX)", "uuid": "UNIQUEIDENTIFIER", "objectid": "CHAR(24)",
+    },
+    "SQLite": {
+        "bool": "INTEGER", "int16": "INTEGER", "int32": "INTEGER", "int64": "INTEGER",
+        "float32": "REAL", "float64": "REAL", "decimal": "NUMERIC",
+        "string": "TEXT", "text": "TEXT", "date": "TEXT", "time": "TEXT",
+        "datetime": "TEXT", "datetimetz": "TEXT", "binary": "BLOB",
+        "json": "TEXT", "uuid": "TEXT", "objectid": "TEXT",
+    },
+}
+
+
+def _declared_params(name):
+    match = re.search(r"\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)", name)
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+
+def _sampled_size(length):
+    size = MIN_STRING_SIZE
+    while size < length * STRING_HEADROOM:
+        size *= 2
+    return size
+
+
+def canonical_type(db_type, column):
+    """
+    Maps one column of a schema from modules.validator.validate_and_fetch_schema to
+    (kind, size, precision, scale), where kind is a database-neutral type name.
+    """
+    type_value = column.get("type")
+    if db_type == "PostgreSQL" and isinstance(type_value, int):
+        kind = POSTGRES_KINDS.get(type_value, "text")
+        size = column.get("size")
+        if kind == "string":
+            return ("string", size, None, None) if size and size > 0 else ("text", None, None, None)
+        if kind == "decimal":
+            return "decimal", None, column.get("precision"), column.get("scale")
+        return kind, None, None, None
+
+    if db_type == "MongoDB":
+        kind = MONGO_KINDS.get(str(type_value).lower(), "text")
+        if kind == "string":
+            return "string", _sampled_size(column.get("max_length", 0)), None, None
+        # Python ints don't say whether BSON stored int32 or int64
+        return kind, None, None, None
+
+    if db_type == "MSSQL" and str(type_value).startswith("<class"):
+        name = str(type_value)[len("<class '"):-2].lower()
+        kind = MSSQL_PYTHON_KINDS.get(name, "text")
+        precision = column.get("precision")
+        if kind == "int":
+            # pyodbc's precision is the digit count: 3 tinyint, 5 smallint, 10 int, 19 bigint
+            kind = "int16" if precision and precision <= 5 else "int32" if precision and precision <= 10 else "int64"
+        elif kind == "string":
+            size = column.get("size")
+            return ("string", size, None, None) if size and 0 < size <= 4000 else ("text", None, None, None)
+        elif kind == "decimal":
+            return "decimal", None, precision, column.get("scale")
+        return kind, None, None, None
+
+    name = str(type_value or "").lower()
+    for pattern, kind in NAME_PATTERNS:
+        if pattern in name:
+            break
+    else:
+        return "text", None, None, None
+    first, second = _declared_params(name)
+    if kind == "int32" and db_type == "SQLite":
+        # SQLite integers are always up to 8 bytes
+        kind = "int64"
+    if kind == "string":
+        if "enum" in name:
+            return "string", max(len(value) for value in re.findall(r"'([^']*)'", name) or ["x"]), None, None
+        return ("string", first, None, None) if first else ("text", None, None, None)
+    if kind == "decimal":
+        return "decimal", None, first, second
+    return kind, None, None, None
+
+
+def column_type(target_type, kind, size=None, precision=None, scale=None):
+    """
+    Renders a canonical type as a column type for target_type.
+    """
+    types = SQL_TYPES[target_type]
+    if kind == "string":
+        if not size or size > MAX_STRING_SIZE[target_type]:
+            return types["text"]
+        return f"{types['string']}({size})"
+    if kind == "decimal" and precision and target_type != "SQLite":
+        precision = min(precision, DECIMAL_MAX_PRECISION.get(target_type, precision))
+        name = "NUMERIC" if target_type == "PostgreSQL" else "DECIMAL"
+        return f"{name}({precision}, {min(scale or 0, precision)})"
+    return types.get(kind, types["text"])
+
+
+def create_table_sql(source_type, schema, target_type, table):
+    """
+    CREATE TABLE statement for target_type that holds the rows of a source schema.
+    MongoDB targets need no DDL, so this returns None for them.
+    Primary keys carry over (MongoDB's _id becomes one); nested MongoDB fields become JSON columns.
+    """
+    if target_type == "MongoDB" or not schema:
+        return None
+    columns, primary_key = [], []
+    for column in schema:
+        kind, size, precision, scale = canonical_type(source_type, column)
+        definition = f"{column['name']} {column_type(target_type, kind, size, precision, scale)}"
+        if column.get("primary_key") or (source_type == "MongoDB" and column["name"] == "_id"):
+            primary_key.append(column["name"])
+            definition += " NOT NULL"
+        elif column.get("nullable") is False:
+            definition += " NOT NULL"
+        columns.append(definition)
+    if primary_key:
+        columns.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+    return f"CREATE TABLE {table} (\n    " + ",\n    ".join(columns) + "\n)"
+
+
+def create_table(target_type, creds, source_type, schema):
+    """
+    Creates the target table from the source schema. Returns the DDL that was run.
+    """
+    ddl = create_table_sql(source_type, schema, target_type, creds.get("table"))
+    if ddl is None:
+        return None
+    with borrow_connection(target_type, creds) as connection:
+        cursor = connection.cursor()
+        cursor.execute(ddl)
+        connection.commit()
+        cursor.close()
+    return ddl
@@ -1,23 +1,17 @@
+import time
+
 import streamlit as st
 import pandas as pd
 
+from modules.connectors import get_connector
+
+JOB_STATUS_ICONS = {
+    "queued": "⏳", "running": "🔄", "succeeded": "✅", "failed": "❌", "cancelled": "🛑", "timed out": "⌛",
+}
+TABLE_STATUS_ICONS = {"pending": "⏳", "running": "🔄", "done": "✅", "failed": "❌", "skipped": "⏭️"}
+
 def db_credential_input(prefix, db_type):
-    creds = {}
-    if db_type in ["PostgreSQL", "MySQL", "MSSQL"]:
-        creds["host"] = st.text_input(f"{prefix} Host")
-        creds["port"] = st.text_input(f"{prefix} Port")
-        creds["user"] = st.text_input(f"{prefix} Username")
-        creds["password"] = st.text_input(f"{prefix} Password", type="password")
-        creds["database"] = st.text_input(f"{prefix} Database Name")
-        creds["table"] = st.text_input(f"{prefix} Table Name")
-    elif db_type == "MongoDB":
-        creds["uri"] = st.text_input(f"{prefix} Mongo URI")
-        creds["database"] = st.text_input(f"{prefix} Database Name")
-        creds["collection"] = st.text_input(f"{prefix} Collection Name")
-    elif db_type == "SQLite":
-        creds["file_path"] = st.text_input(f"{prefix} SQLite File Path")
-        creds["table"] = st.text_input(f"{prefix} Table Name")
-    return creds
+    return render_db_ui(prefix, db_type)
 
 def display_schema_preview(role, preview, schema, role_color="gray"):
     if preview and schema:
@@ -41,26 +35,167 @@ def code_editor_section(code):
     st.subheader("📝 Generated ETL Script")
     return st.text_area("Edit the code below (optional):", value=code, height=400)
 
-def editable_code_section(code):
+def editable_code_section(code, stream=None):
+    if stream is not None:
+        # show the script as the model writes it, then hand the finished one to the editor
+        live = st.empty()
+        for code in stream:
+            live.code(code, language="python")
+        live.empty()
     return st.text_area("Edit the ETL Python code below", value=code, height=400)
 
 
+def display_metrics(report):
+    st.subheader("📊 Run Metrics")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Rows", f"{report['rows']:,}")
+    c2.metric("Rows/s", f"{report['rows_per_sec']:,.0f}")
+    c3.metric("Duration", f"{report['duration_seconds']:.2f} s")
+    c4.metric("Peak memory", f"{report['peak_rss_mb']:.0f} MB" if report["peak_rss_mb"] is not None else "n/a")
+    if report["stages"]:
+        rows = [
+            {
+                "stage": name,
+                "seconds": stage["seconds"],
+                "rows": stage["rows"],
+                "MB": round(stage["bytes"] / (1024 * 1024), 2),
+                "batches": stage["batches"],
+                "p50 ms": stage["batch_latency_ms"]["p50"],
+                "p95 ms": stage["batch_latency_ms"]["p95"],
+                "max ms": stage["batch_latency_ms"]["max"],
+            }
+            for name, stage in report["stages"].items()
+        ]
+        # streamlit 1.22 has no hide_index; the stage names make a readable index instead
+        st.dataframe(pd.DataFrame(rows).set_index("stage"))
+    if report.get("error"):
+        st.caption(f"Error: {report['error'][:500]}")
+
+
+
+def _format_bytes(size):
+    if size is None:
+        return "unknown"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:,.0f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} TB"
+
+
+def display_plan(plan):
+    st.subheader("📐 Transfer Plan")
+    c1, c2, c3, c4 = st.columns(4)
+    rows = plan["source_rows"]
+    c1.metric("Rows (estimate)", f"{rows:,}" if rows is not None else "unknown")
+    c2.metric("Source size", _format_bytes(plan["source_bytes"]))
+    c3.metric("Predicted time", f"{plan['predicted_seconds']:,.0f} s")
+    c4.metric("Predicted memory", f"{plan['predicted_memory_mb']:,} MB")
+    strategy = plan["strategy"]
+    if plan["parallelism"] > 1:
+        strategy += f" × {plan['parallelism']} on {plan['partition_key']}"
+    st.markdown(f"**Strategy:** {strategy} · **Batch size:** {plan['batch_size']:,} · "
+                f"**Indexes:** {'deferred' if plan['defer_indexes'] else 'kept'} · "
+                f"**Throughput:** {plan['rows_per_sec']:,} rows/s "
+                f"({'from ' + str(plan['history_runs']) + ' past runs' if plan['history_runs'] else 'default'})")
+    for note in plan["notes"]:
+        st.caption(f"• {note}")
+
+
+def display_dry_run(report):
+    st.subheader("🧪 Dry Run")
+    if report["ok"]:
+        st.success(f"Passed in {report.get('seconds', 0):.1f} s on a {report['sample_rows']}-row sample")
+    else:
+        st.error(f"Failed: {report['error'] or 'the target was not changed'}")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Sample rows", report["sample_rows"])
+    c2.metric("Target before", report["target_rows_before"])
+    c3.metric("Target after", report["target_rows_after"], delta=report["target_rows_after"] - report["target_rows_before"])
+    c4.metric("Removed", report["removed_count"])
+    for warning in report["warnings"]:
+        st.warning(warning)
+    if report["added"]:
+        st.text(f"Rows added ({report['added_count']}, first {len(report['added'])}):")
+        st.dataframe(pd.DataFrame(report["added"]) if isinstance(report["added"][0], list) else pd.json_normalize(report["added"]))
+    if report["removed"]:
+        st.text(f"Rows removed ({report['removed_count']}, first {len(report['removed'])}):")
+        st.dataframe(pd.DataFrame(report["removed"]) if isinstance(report["removed"][0], list) else pd.json_normalize(report["removed"]))
+    if report["tables"]:
+        st.caption("Replica tables after the run: " + ", ".join(f"{name} ({rows})" for name, rows in report["tables"].items()))
+    with st.expander("Dry-run output"):
+        st.code((report["stdout"] + "\n" + report["stderr"]).strip() or "(no output)")
+
+
+def display_migration(migration):
+    """
+    Consolidated view of a whole-database migration: overall progress, one row per table.
+    """
+    info = migration.snapshot()
+    counts = info["counts"]
+    total = len(info["tables"])
+    finished = counts.get("done", 0) + counts.get("failed", 0) + counts.get("skipped", 0)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Tables done", f"{counts.get('done', 0)} / {total}")
+    c2.metric("Running", counts.get("running", 0))
+    c3.metric("Failed / skipped", f"{counts.get('failed', 0)} / {counts.get('skipped', 0)}")
+    c4.metric("Rows", f"{info['rows']:,}" + (f" / ~{info['expected_rows']:,}" if info["expected_rows"] else ""))
+    if info["expected_rows"]:
+        st.progress(min(1.0, info["rows"] / info["expected_rows"]))
+    else:
+        st.progress(finished / total if total else 1.0)
+    st.caption(f"{info['levels']} dependency level(s)"
+               + (f", {info['concurrency']} table(s) at a time" if info["concurrency"] else ""))
+    if info["cyclic"]:
+        st.warning("Foreign-key cycle: " + ", ".join(info["cyclic"]) + " load without waiting on each other; "
+                   "the target's constraints between them must be deferrable or disabled.")
+    rows = [
+        {
+            "": TABLE_STATUS_ICONS.get(table["status"], ""),
+            "table": table["table"],
+            "level": table["level"],
+            "status": table["status"],
+            "rows": table["rows"],
+            "expected": table["expected_rows"],
+            "seconds": table["seconds"],
+            "after": ", ".join(table["parents"]),
+            "error": (table["error"] or "")[:200],
+        }
+        for table in sorted(info["tables"], key=lambda table: (table["level"], table["table"]))
+    ]
+    st.dataframe(pd.DataFrame(rows).set_index("table"))
+
+
+def display_jobs(manager):
+    st.subheader("🗂️ Jobs")
+    jobs = manager.jobs()
+    if not jobs:
+        st.caption("No jobs yet.")
+        return
+    for job in jobs:
+        info = job.snapshot()
+        c1, c2, c3, c4 = st.columns([4, 2, 2, 1])
+        c1.markdown(f"{JOB_STATUS_ICONS.get(info['status'], '')} `{info['id']}` {info['name']}")
+        c2.write(info["status"] if not info["error"] else f"{info['status']}: {info['error'][:200]}")
+        c3.write(f"{info['rows']:,} rows · {info['elapsed']:.0f} s")
+        if info["status"] in ("queued", "running") and c4.button("Cancel", key=f"cancel_{info['id']}"):
+            manager.cancel(info["id"])
+        with st.expander(f"Log {info['id']}", expanded=info["status"] == "running"):
+            st.code("\n".join(job.logs()[-200:]) or "(no output yet)")
+            if job.detail is not None:
+                display_migration(job.detail)
+            if job.report:
+                display_metrics(job.report)
+    # no fragments in this Streamlit version, so poll by rerunning while anything is active
+    if st.checkbox("Auto-refresh while jobs run", value=True) and any(
+            job.status in ("queued", "running") for job in jobs):
+        time.sleep(1)
+        st.experimental_rerun()
+
+
 def render_db_ui(prefix, db_type):
+    # the inputs each database type needs come from its connector (modules.connectors)
     creds = {}
-
-    if db_type in ["PostgreSQL", "MySQL", "MSSQL"]:
-        creds["host"] = st.text_input(f"{prefix} Host")
-        creds["port"] = st.text_input(f"{prefix} Port")
-        creds["user"] = st.text_input(f"{prefix} User")
-        creds["password"] = st.text_input(f"{prefix} Password", type="password")
-        creds["database"] = st.text_input(f"{prefix} Database Name")
-        creds["table"] = st.text_input(f"{prefix} Table Name")
-    elif db_type == "MongoDB":
-        creds["uri"] = st.text_input(f"{prefix} Mongo URI (e.g., mongodb+srv://...)")
-        creds["database"] = st.text_input(f"{prefix} Database Name")
-        creds["collection"] = st.text_input(f"{prefix} Collection Name")
-    elif db_type == "SQLite":
-        creds["file_path"] = st.text_input(f"{prefix} SQLite File Path")
-        creds["table"] = st.text_input(f"{prefix} Table Name")
-
-    return creds
\ No newline at end of file
+    for key, label, secret in get_connector(db_type).fields:
+        creds[key] = st.text_input(f"{prefix} {label}", type="password" if secret else "default")
+    return creds
@@ -0,0 +1,289 @@
+# modules/upsert.py
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+
+from modules.connections import borrow_connection
+from modules.loader import as_documents, as_rows, unpack, write_batch
+from modules.typemap import column_type
+
+# per-row content hash kept next to the data, so a reload can skip unchanged rows
+ROW_HASH_COLUMN = os.getenv("ATOA_ROW_HASH_COLUMN", "atoa_row_hash")
+HASH_BYTES = 16
+
+
+def row_hash(values):
+    """
+    Content hash of one row. repr() is exact for floats and stable for the driver types,
+    and much cheaper than JSON.
+    """
+    return hashlib.blake2b(repr(values).encode(), digest_size=HASH_BYTES).hexdigest()
+
+
+def document_hash(doc, hash_column=ROW_HASH_COLUMN):
+    payload = json.dumps({k: v for k, v in doc.items() if k != hash_column}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=HASH_BYTES).hexdigest()
+
+
+def key_columns(key):
+    return [key] if isinstance(key, str) else list(key)
+
+
+def staging_table(db_type, table):
+    # MSSQL temp tables are named with a leading #
+    return f"#atoa_stage_{table}" if db_type == "MSSQL" else f"atoa_stage_{table}"
+
+
+def _target_columns(cursor, table):
+    cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+    names = [desc[0] for desc in cursor.description]
+    cursor.fetchall()
+    return names
+
+
+def _hash_column_ready(db_type, cursor, table, hash_column, add_hash_column):
+    """
+    Whether the target has hash_column; with add_hash_column it's added when missing.
+    """
+    if hash_column.lower() in (name.lower() for name in _target_columns(cursor, table)):
+        return True
+    if not add_hash_column:
+        return False
+    # existing rows start without a hash, so the first upsert rewrites them once
+    cursor.execute(f"ALTER TABLE {table} ADD {hash_column} {column_type(db_type, 'string', HASH_BYTES * 2)}")
+    return True
+
+
+def _identity_column(db_type, cursor, table):
+    """
+    (name, type) of an MSSQL table's IDENTITY column, or None.
+    """
+    if db_type != "MSSQL":
+        return None
+    cursor.execute(
+        "SELECT name, TYPE_NAME(system_type_id), precision, scale FROM sys.identity_columns "
+        "WHERE object_id = OBJECT_ID(?)",
+        (table,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    name, type_name, precision, scale = row
+    if type_name in ("decimal", "numeric"):
+        type_name = f"{type_name}({precision}, {scale})"
+    return name, type_name
+
+
+def _create_staging(db_type, cursor, table, stage, identity=None):
+    # session-local, so concurrent runs and other sessions never see each other's rows
+    if db_type == "PostgreSQL":
+        cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+        cursor.execute(f"CREATE TEMP TABLE {stage} (LIKE {table})")
+    elif db_type == "MySQL":
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {stage} LIKE {table}")
+    elif db_type == "MSSQL":
+        cursor.execute(f"IF OBJECT_ID('tempdb..{stage}') IS NOT NULL DROP TABLE {stage}")
+        if identity is None:
+            cursor.execute(f"SELECT TOP 0 * INTO {stage} FROM {table}")
+        else:
+            # SELECT INTO copies the IDENTITY property, which would refuse the staged key values;
+            # a cast column is a plain one
+            name, type_name = identity
+            select = ", ".join(f"CAST({column} AS {type_name}) AS {column}" if column.lower() == name.lower()
+                               else column for column in _target_columns(cursor, table))
+            cursor.execute(f"SELECT TOP 0 {select} INTO {stage} FROM {table}")
+    else:
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+        cursor.execute(f"CREATE TEMP TABLE {stage} AS SELECT * FROM {table} WHERE 0")
+
+
+def _drop_staging(db_type, cursor, stage):
+    if db_type == "MySQL":
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage}")
+    elif db_type == "MSSQL":
+        cursor.execute(f"IF OBJECT_ID('tempdb..{stage}') IS NOT NULL DROP TABLE {stage}")
+    else:
+        cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+
+
+def prune_unchanged_sql(table, stage, keys, hash_column):
+    """
+    Deletes the staged rows whose key and hash already match a target row.
+    """
+    match = " AND ".join(f"{table}.{column} = {stage}.{column}" for column in keys + [hash_column])
+    return f"DELETE FROM {stage} WHERE EXISTS (SELECT 1 FROM {table} WHERE {match})"
+
+
+def _same_value(db_type, left, right):
+    # NULL = NULL is unknown, so a plain = would count every row with a NULL as changed
+    if db_type == "PostgreSQL":
+        return f"{left} IS NOT DISTINCT FROM {right}"
+    if db_type == "MySQL":
+        return f"{left} <=> {right}"
+    if db_type == "SQLite":
+        return f"{left} IS {right}"
+    return f"({left} = {right} OR ({left} IS NULL AND {right} IS NULL))"
+
+
+def prune_equal_rows_sql(db_type, table, stage, keys, columns):
+    """
+    Deletes the staged rows whose key matches a target row with the same values in
+    every other column: the comparison used when the target has no hash column.
+    """
+    match = [f"{table}.{column} = {stage}.{column}" for column in keys]
+    match += [_same_value(db_type, f"{table}.{column}", f"{stage}.{column}")
+              for column in columns if column not in keys]
+    return f"DELETE FROM {stage} WHERE EXISTS (SELECT 1 FROM {table} WHERE {' AND '.join(match)})"
+
+
+def upsert_sql(db_type, table, stage, columns, keys, identity=None):
+    """
+    One set-based statement that inserts the staged rows and updates the ones whose key exists:
+    INSERT ... ON CONFLICT (PostgreSQL, SQLite), INSERT ... ON DUPLICATE KEY UPDATE (MySQL), MERGE (MSSQL).
+    keys need a primary key or unique index on the target (MSSQL's MERGE doesn't).
+    identity names an MSSQL IDENTITY column; when the rows carry it, the MERGE runs with
+    IDENTITY_INSERT on and never updates it.
+    """
+    names = ", ".join(columns)
+    identity = identity if identity and identity.lower() in (column.lower() for column in columns) else None
+    updates = [column for column in columns if column not in keys
+               and (identity is None or column.lower() != identity.lower())]
+    if db_type in ("PostgreSQL", "SQLite"):
+        conflict = f"ON CONFLICT ({', '.join(keys)}) DO "
+        conflict += ("UPDATE SET " + ", ".join(f"{column} = excluded.{column}" for column in updates)) if updates else "NOTHING"
+        # SQLite needs a WHERE to tell the upsert clause from a join constraint
+        where = " WHERE true" if db_type == "SQLite" else ""
+        return f"INSERT INTO {table} ({names}) SELECT {names} FROM {stage}{where} {conflict}"
+    if db_type == "MySQL":
+        # the derived table lets the update refer to the new row without VALUES(), deprecated in 8.0
+        assignments = ", ".join(f"{column} = atoa_new.{column}" for column in updates or keys[:1])
+        return (f"INSERT INTO {table} ({names}) SELECT * FROM (SELECT {names} FROM {stage}) AS atoa_new "
+                f"ON DUPLICATE KEY UPDATE {assignments}")
+    if db_type == "MSSQL":
+        on = " AND ".join(f"t.{column} = s.{column}" for column in keys)
+        matched = ("WHEN MATCHED THEN UPDATE SET " + ", ".join(f"t.{column} = s.{column}" for column in updates) + " ") if updates else ""
+        merge = (f"MERGE {table} AS t USING {stage} AS s ON {on} {matched}"
+                 f"WHEN NOT MATCHED THEN INSERT ({names}) VALUES ({', '.join(f's.{column}' for column in columns)});")
+        if identity:
+            return f"SET IDENTITY_INSERT {table} ON; {merge} SET IDENTITY_INSERT {table} OFF;"
+        return merge
+    raise ValueError(f"Unsupported database type: {db_type}")
+
+
+def upsert_batches(db_type, creds, batches, key, hash_column=ROW_HASH_COLUMN, metrics=None, add_hash_column=False):
+    """
+    Upserts (columns, rows) batches or RecordBatches on key (a column or a list of columns).
+    SQL targets get each batch bulk-loaded into a temporary staging table, then one
+    set-based upsert into the target. Each batch commits on its own, so target rows stay
+    locked for one statement at a time.
+    Staged rows that match a target row are dropped before the upsert, so unchanged rows
+    are never rewritten. When the target has hash_column, each row carries a content hash
+    and only key and hash are compared; otherwise every column is. add_hash_column=True
+    adds the column to the target (documents, on MongoDB) if it's missing; the target's
+    schema is never changed without it. Pass hash_column=None for a plain upsert.
+    metrics, if given, counts the skipped rows under an "unchanged" stage.
+    Returns the number of source rows processed.
+    """
+    keys = key_columns(key)
+    if db_type == "MongoDB":
+        return _upsert_mongo(creds, batches, keys, hash_column, metrics, add_hash_column)
+    table = creds["table"]
+    stage = staging_table(db_type, table)
+    total = 0
+    with borrow_connection(db_type, creds) as connection:
+        cursor = connection.cursor()
+        if db_type == "MSSQL":
+            cursor.fast_executemany = True
+        hashed = bool(hash_column) and _hash_column_ready(db_type, cursor, table, hash_column, add_hash_column)
+        identity = _identity_column(db_type, cursor, table)
+        _create_staging(db_type, cursor, table, stage, identity)
+        connection.commit()
+        try:
+            for item in batches:
+                columns, rows = unpack(item)
+                if not rows:
+                    continue
+                columns, rows = as_rows(columns, rows)
+                missing = [column for column in keys if column not in columns]
+                if missing:
+                    raise ValueError(f"Upsert key {missing} is not in the batch columns {columns}")
+                if hashed:
+                    columns = list(columns) + [hash_column]
+                    rows = [tuple(row) + (row_hash(tuple(row)),) for row in rows]
+                cursor.execute(f"DELETE FROM {stage}")
+                write_batch(db_type, cursor, stage, (columns, rows))
+                unchanged = 0
+                if hashed:
+                    cursor.execute(prune_unchanged_sql(table, stage, keys, hash_column))
+                    unchanged = max(cursor.rowcount, 0)
+                elif hash_column:
+                    cursor.execute(prune_equal_rows_sql(db_type, table, stage, keys, columns))
+                    unchanged = max(cursor.rowcount, 0)
+                if unchanged < len(rows):
+                    cursor.execute(upsert_sql(db_type, table, stage, columns, keys, identity and identity[0]))
+                connection.commit()
+                total += len(rows)
+                if metrics is not None:
+                    metrics.record_batch("unchanged", 0.0, unchanged)
+        finally:
+            try:
+                connection.rollback()
+                _drop_staging(db_type, cursor, stage)
+                connection.commit()
+            finally:
+                cursor.close()
+    return total
+
+
+def _upsert_mongo(creds, batches, keys, hash_column, metrics, add_hash_column=False):
+    from pymongo import UpdateOne
+
+    total = 0
+    with borrow_connection("MongoDB", creds) as client:
+        collection = client[creds["database"]][creds["collection"]]
+        for item in batches:
+            documents = item.to_pylist() if isinstance(item, pa.RecordBatch) else as_documents(*item)
+            if not documents:
+                continue
+            if any(column not in doc for doc in documents for column in keys):
+                raise ValueError(f"Upserts into MongoDB need {keys} in every document")
+            existing = {}
+            if hash_column:
+                if len(keys) == 1:
+                    query = {keys[0]: {"$in": [doc[keys[0]] for doc in documents]}}
+                else:
+                    query = {"$or": [{column: doc[column] for column in keys} for doc in documents]}
+                # without stored hashes the existing documents are hashed here, whole
+                projection = {column: 1 for column in keys + [hash_column]} if add_hash_column else None
+                for doc in collection.find(query, projection):
+                    identity = tuple(doc.get(column) for column in keys)
+                    existing[identity] = doc.get(hash_column) if add_hash_column else document_hash(_content(doc, keys), hash_column)
+            operations = []
+            for doc in documents:
+                identity = {column: doc[column] for column in keys}
+                fields = {k: v for k, v in doc.items() if k != "_id"}
+                if hash_column:
+                    digest = document_hash(doc if add_hash_column else _content(doc, keys), hash_column)
+                    if existing.get(tuple(identity.values())) == digest:
+                        continue
+                    if add_hash_column:
+                        fields[hash_column] = digest
+                update = {"$set": fields}
+                if "_id" in doc and "_id" not in keys:
+                    # _id is immutable, so it's only written when the document is new
+                    update["$setOnInsert"] = {"_id": doc["_id"]}
+                operations.append(UpdateOne(identity, update, upsert=True))
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+            total += len(documents)
+            if metrics is not None:
+                metrics.record_batch("unchanged", 0.0, len(documents) - len(operations))
+    return total
+
+
+def _content(doc, keys):
+    # a target document's _id is its own unless it is the key, so it isn't compared
+    return {k: v for k, v in doc.items() if k != "_id" or "_id" in keys}
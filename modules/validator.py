@@ -1,9 +1,20 @@
 # modules/validator.py
-import psycopg2
-import pymysql
-import pyodbc
-import sqlite3
-import pymongo
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from modules.cache import TTLCache
+from modules.connections import borrow_connection, credential_fingerprint
+from modules.connectors import CONNECT_TIMEOUT, get_connector
+
+# column metadata barely changes, so previews are served from here until they expire
+schema_cache = TTLCache(
+    maxsize=int(os.getenv("ATOA_SCHEMA_CACHE_SIZE", "128")),
+    ttl=float(os.getenv("ATOA_SCHEMA_CACHE_TTL", "600")),
+)
+
+# seconds a preview query may run before the server cancels it
+QUERY_TIMEOUT = float(os.getenv("ATOA_QUERY_TIMEOUT", "30"))
 
 
 def validate_db_connection(db_type, creds):
@@ -11,71 +22,26 @@ def validate_db_connection(db_type, creds):
     Validates connection to the source or target database based on the provided credentials.
     """
     try:
-        if db_type == "PostgreSQL":
-            connection = psycopg2.connect(
-                host=creds['host'],
-                port=creds['port'],
-                user=creds['user'],
-                password=creds['password'],
-                database=creds['database']
-            )
-            cursor = connection.cursor()
-            cursor.execute(f"SELECT * FROM {creds['table']} LIMIT 2;")
-            result = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return True, result
-
-        elif db_type == "MySQL":
-            connection = pymysql.connect(
-                host=creds['host'],
-                port=int(creds['port']),
-                user=creds['user'],
-                password=creds['password'],
-                database=creds['database']
-            )
-            cursor = connection.cursor()
-            cursor.execute(f"SELECT * FROM {creds['table']} LIMIT 2;")
-            result = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return True, result
-
-        elif db_type == "MSSQL":
-            connection = pyodbc.connect(
-                f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={creds["host"]};PORT={creds["port"]};UID={creds["username"]};PWD={creds["password"]};DATABASE={creds["database"]}'
-            )
-            cursor = connection.cursor()
-            cursor.execute(f"SELECT TOP 2 * FROM {creds['table']};")
-            result = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return True, result
-
-        elif db_type == "MongoDB":
-            client = pymongo.MongoClient(creds['uri'])
-            db = client[creds['database']]
-            collection = db[creds['collection']]
-            result = list(collection.find().limit(2))
-            client.close()
-            return True, result
-
-        elif db_type == "SQLite":
-            connection = sqlite3.connect(creds['file_path'])
-            cursor = connection.cursor()
-            cursor.execute(f"SELECT * FROM {creds['table']} LIMIT 2;")
-            result = cursor.fetchall()
-            cursor.close()
-            connection.close()
-            return True, result
-
-        else:
-            return False, "Unsupported database type"
-    
+        connector = get_connector(db_type)
+        with borrow_connection(db_type, creds) as connection:
+            return True, connector.sample(connection, creds)
+
     except Exception as e:
         return False, str(e)
 
 
+def check_connection(db_type, creds):
+    """
+    Opens a connection without touching the table, which tells a missing table apart
+    from a database that can't be reached. Returns the error message, or None.
+    """
+    try:
+        with borrow_connection(db_type, creds):
+            return None
+    except Exception as e:
+        return str(e)
+
+
 # def validate_and_fetch_schema(db_type, creds):
 #     """
 #     Validates the database connection and fetches the schema (table/collection preview).
@@ -146,80 +112,75 @@ def validate_db_connection(db_type, creds):
 
 #     except Exception as e:
 #         return f"Error: {str(e)}", [], []
-def validate_and_fetch_schema(db_type, creds):
-    try:
-        if db_type == "PostgreSQL":
-            connection = psycopg2.connect(
-                host=creds["host"],
-                port=creds["port"],
-                user=creds["user"],
-                password=creds["password"],
-                dbname=creds["database"]
-            )
-            cursor = connection.cursor()
-            cursor.execute(f"SELECT * FROM {creds['table']} LIMIT 2;")
-            preview = cursor.fetchall()
-            schema = [
-                {"name": desc.name, "type": desc.type_code} for desc in cursor.description
-            ]
-            status = "Connected to PostgreSQL successfully!"
-
-        elif db_type == "MySQL":
-            connection = pymysql.connect(
-                host=creds["host"],
-                port=int(creds["port"]),
-                user=creds["user"],
-                password=creds["password"],
-                database=creds["database"]
-            )
-            cursor = connection.cursor()
-            cursor.execute(f"DESCRIBE {creds['table']};")
-            desc_rows = cursor.fetchall()
-            schema = [
-                {"name": row[0], "type": row[1], "nullable": row[2] != "NO"} for row in desc_rows
-            ]
-            cursor.execute(f"SELECT * FROM {creds['table']} LIMIT 2;")
-            preview = cursor.fetchall()
-            status = "Connected to MySQL successfully!"
-
-        elif db_type == "MSSQL":
-            connection = pyodbc.connect(
-                f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={creds["host"]};PORT={creds["port"]};DATABASE={creds["database"]};UID={creds["username"]};PWD={creds["password"]}'
-            )
-            cursor = connection.cursor()
-            query = f"SELECT TOP 2 * FROM {creds['table']}"
-            cursor.execute(query)
-            preview = cursor.fetchall()
-            schema = [
-                {"name": column[0], "type": str(column[1])} for column in cursor.description
-            ]
-            status = "Connected to MSSQL successfully!"
-
-        elif db_type == "SQLite":
-            connection = sqlite3.connect(creds["file_path"])
-            cursor = connection.cursor()
-            cursor.execute(f"PRAGMA table_info({creds['table']});")
-            info = cursor.fetchall()
-            schema = [
-                {"name": row[1], "type": row[2], "nullable": row[3] == 0} for row in info
-            ]
-            cursor.execute(f"SELECT * FROM {creds['table']} LIMIT 2;")
-            preview = cursor.fetchall()
-            status = "Connected to SQLite successfully!"
-
-        elif db_type == "MongoDB":
-            client = pymongo.MongoClient(creds["uri"])
-            db = client[creds["database"]]
-            collection = db[creds["collection"]]
-            preview = list(collection.find().limit(2))
-            if preview:
-                schema = [{"name": key, "type": type(value).__name__} 
-                          for key, value in preview[0].items()]
-            else:
-                schema = []
-            status = "Connected to MongoDB successfully!"
-        print("====================",status, preview, schema,"=========================")
-        return status, preview, schema
+def schema_cache_key(db_type, creds):
+    return (db_type, credential_fingerprint(db_type, creds), creds.get("table") or creds.get("collection"))
+
 
+def invalidate_schema_cache(db_type=None, creds=None):
+    """
+    Forgets cached previews: everything, one database type, or one table/collection.
+    """
+    if db_type is None:
+        schema_cache.invalidate()
+    elif creds is None:
+        schema_cache.invalidate(lambda key: key[0] == db_type)
+    else:
+        target = schema_cache_key(db_type, creds)
+        schema_cache.invalidate(lambda key: key == target)
+
+
+def validate_and_fetch_schema(db_type, creds, refresh=False, timeout=QUERY_TIMEOUT):
+    """
+    Returns (status, preview, schema) for the table/collection in creds.
+    Successful lookups are cached; refresh=True bypasses and repopulates the cache.
+    """
+    key = schema_cache_key(db_type, creds)
+    if not refresh:
+        cached = schema_cache.get(key)
+        if cached is not None:
+            return cached
+    try:
+        result = _fetch_schema(db_type, creds, timeout)
     except Exception as e:
         return f"Error: {str(e)}", [], []
+    # an empty preview usually means the target table doesn't exist yet; don't pin that
+    if result[1]:
+        schema_cache.set(key, result)
+    return result
+
+
+def validate_pair(source_type, source_creds, target_type, target_creds, refresh=False, timeout=QUERY_TIMEOUT):
+    """
+    Validates source and target concurrently, so the wait is the slower of the two.
+    Returns ((status, preview, schema), (status, preview, schema)); a check that
+    hasn't answered within connect + query timeout reports an error instead of blocking.
+    """
+    deadline = CONNECT_TIMEOUT + timeout
+    # one deadline for both checks, so the wait never exceeds it however slow the first one is
+    deadline_at = time.monotonic() + deadline
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="atoa-validate")
+    try:
+        futures = [
+            executor.submit(validate_and_fetch_schema, source_type, source_creds, refresh, timeout),
+            executor.submit(validate_and_fetch_schema, target_type, target_creds, refresh, timeout),
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(0, deadline_at - time.monotonic())))
+            except FutureTimeoutError:
+                results.append((f"Error: no answer within {deadline:.0f}s", [], []))
+        return results[0], results[1]
+    finally:
+        # a hung connect must not hold up the caller
+        executor.shutdown(wait=False)
+
+
+def _fetch_schema(db_type, creds, timeout=QUERY_TIMEOUT):
+    connector = get_connector(db_type)
+    with borrow_connection(db_type, creds) as connection:
+        restore = connector.set_query_timeout(connection, timeout)
+        preview, schema = connector.schema(connection, creds, timeout)
+        restore()
+    status = f"Connected to {connector.name} successfully!"
+    return status, preview, schema
@@ -0,0 +1,47 @@
+# tests/test_batches.py
+import decimal
+
+import pyarrow as pa
+import pytest
+
+from modules.batches import arrow_schema, arrow_type, from_record_batch, to_csv_buffer, to_record_batch
+
+
+@pytest.mark.parametrize("type_value, expected", [
+    ("int(11)", pa.int64()),
+    ("BIGINT", pa.int64()),
+    ("<class 'int'>", pa.int64()),
+    ("point", pa.string()),
+    ("tinyint(1)", pa.bool_()),
+    ("decimal(10,2)", pa.decimal128(10, 2)),
+    ("NUMERIC", pa.string()),
+    ("numeric(50, 2)", pa.string()),
+    ("decimal128", pa.string()),
+    ("longblob", pa.binary()),
+])
+def test_arrow_type_from_type_names(type_value, expected):
+    assert arrow_type(type_value) == expected
+
+
+def test_arrow_type_takes_numeric_precision_from_the_description():
+    assert arrow_type(1700, 12, 4) == pa.decimal128(12, 4)
+    assert arrow_type(1700) == pa.string()
+    assert arrow_type("<class 'decimal.Decimal'>", 18, 2) == pa.decimal128(18, 2)
+
+
+def test_decimals_keep_every_digit():
+    schema = arrow_schema([{"name": "amount", "type": 1700, "precision": 30, "scale": 10}])
+    value = decimal.Decimal("12345678901234567890.0123456789")
+    batch = to_record_batch(["amount"], [(value,), (None,)], schema)
+    assert from_record_batch(batch) == (["amount"], [(value,), (None,)])
+
+
+def test_numbers_are_rounded_to_the_declared_scale():
+    schema = arrow_schema([{"name": "price", "type": "NUMERIC(10,2)"}])
+    batch = to_record_batch(["price"], [(1.5,), (3,)], schema)
+    assert batch.column(0).to_pylist() == [decimal.Decimal("1.50"), decimal.Decimal("3.00")]
+
+
+def test_csv_buffer_hex_encodes_binary_and_keeps_nulls_apart_from_empty_strings():
+    batch = pa.record_batch([pa.array([b"\x00\x01", b"", None]), pa.array(["", "x", None])], names=["data", "name"])
+    assert to_csv_buffer(batch).getvalue() == b'"\\x0001",""\n"\\x","x"\n,\n'
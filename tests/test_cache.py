@@ -0,0 +1,56 @@
+# tests/test_cache.py
+import sqlite3
+
+import pytest
+
+from modules import cache
+from modules.cache import TTLCache
+from modules.validator import invalidate_schema_cache, validate_and_fetch_schema
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"value": 1000.0}
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now["value"])
+    return now
+
+
+def test_entries_expire_after_their_ttl(clock):
+    entries = TTLCache(ttl=10)
+    entries.set("a", 1)
+    clock["value"] += 9.9
+    assert entries.get("a") == 1
+    clock["value"] += 0.1
+    assert entries.get("a", "gone") == "gone"
+    assert len(entries) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(maxsize=2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+    assert (entries.get("a"), entries.get("b"), entries.get("c")) == (1, None, 3)
+
+
+def test_invalidate_drops_only_matching_keys():
+    entries = TTLCache()
+    for key in [("SQLite", 1), ("SQLite", 2), ("MySQL", 1)]:
+        entries.set(key, key)
+    entries.invalidate(lambda key: key[0] == "SQLite")
+    assert len(entries) == 1 and entries.get(("MySQL", 1)) == ("MySQL", 1)
+
+
+def test_schema_preview_is_cached_until_invalidated(tmp_path):
+    creds = {"file_path": str(tmp_path / "cached.db"), "table": "items"}
+    with sqlite3.connect(creds["file_path"]) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER)")
+        connection.execute("INSERT INTO items VALUES (1)")
+    _, preview, _ = validate_and_fetch_schema("SQLite", creds)
+    with sqlite3.connect(creds["file_path"]) as connection:
+        connection.execute("DELETE FROM items")
+        connection.execute("INSERT INTO items VALUES (2)")
+    assert validate_and_fetch_schema("SQLite", creds)[1] == preview == [(1,)]
+    invalidate_schema_cache("SQLite", creds)
+    assert validate_and_fetch_schema("SQLite", creds)[1] == [(2,)]
@@ -0,0 +1,71 @@
+# tests/test_checkpoint.py
+import sqlite3
+
+import pytest
+
+from modules.checkpoint import read_target_checkpoint, run_checkpointed
+from modules.state import StateStore, pipeline_id
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / "state.sqlite"))
+
+
+@pytest.fixture
+def sqlite_pair(tmp_path):
+    source, target = str(tmp_path / "source.db"), str(tmp_path / "target.db")
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany("INSERT INTO items VALUES (?, ?)", [(i, f"item {i}") for i in range(1, 7)])
+    with sqlite3.connect(target) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    return {"file_path": source, "table": "items"}, {"file_path": target, "table": "items"}
+
+
+def count(creds):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {creds['table']}").fetchone()[0]
+
+
+def interrupt_after(rows):
+    def progress(done):
+        if done >= rows:
+            raise Interrupted()
+    return progress
+
+
+def test_interrupted_run_resumes_after_the_last_committed_chunk(sqlite_pair, store):
+    source, target = sqlite_pair
+    with pytest.raises(Interrupted):
+        run_checkpointed("SQLite", source, "SQLite", target, "id", batch_size=2, store=store,
+                         progress=interrupt_after(2))
+    assert count(target) == 2
+    loaded, checkpoint = run_checkpointed("SQLite", source, "SQLite", target, "id", batch_size=2, store=store)
+    assert loaded == 4
+    assert (checkpoint["rows"], checkpoint["last_key"]) == (6, 6)
+    assert count(target) == 6
+
+
+def test_finished_run_clears_its_checkpoint(sqlite_pair, store):
+    source, target = sqlite_pair
+    run_checkpointed("SQLite", source, "SQLite", target, "id", batch_size=4, store=store)
+    pipeline = pipeline_id("SQLite", source, "SQLite", target, "id")
+    assert read_target_checkpoint("SQLite", target, pipeline) is None
+    assert store.get_checkpoint(pipeline) is None
+
+
+def test_restart_forgets_an_interrupted_run(sqlite_pair, store):
+    source, target = sqlite_pair
+    with pytest.raises(Interrupted):
+        run_checkpointed("SQLite", source, "SQLite", target, "id", batch_size=2, store=store,
+                         progress=interrupt_after(2))
+    with sqlite3.connect(target["file_path"]) as connection:
+        connection.execute("DELETE FROM items")
+    loaded, _ = run_checkpointed("SQLite", source, "SQLite", target, "id", batch_size=2, store=store, restart=True)
+    assert loaded == 6
+    assert count(target) == 6
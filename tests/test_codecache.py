@@ -0,0 +1,105 @@
+# tests/test_codecache.py
+import itertools
+
+import pytest
+
+from modules import codecache
+from modules.codecache import CodeCache, cache_key, fill_credentials, placeholder
+from modules.prompt import credential_placeholders
+
+SOURCE = {"host": "db1", "port": "5432", "user": "etl", "password": "s3cret", "database": "shop", "table": "orders"}
+TARGET = {"file_path": "/data/warehouse.db", "table": "orders"}
+
+
+def key_for(source_creds, target_creds, transformations="keep all rows"):
+    return cache_key("model", "PostgreSQL", source_creds, "SQLite", target_creds, transformations,
+                     [(1, "a")], [], [{"name": "id", "type": 23}], [])
+
+
+@pytest.mark.parametrize("password", [
+    "it's",
+    'say "hi"',
+    "back\\slash\\",
+    "two\nlines",
+    "all of ' \" \\ \n \t them",
+])
+def test_fill_credentials_keeps_the_script_valid(password):
+    code = (f"password = '{placeholder('SOURCE', 'password')}'\n"
+            f'again = "{placeholder("SOURCE", "password")}"\n')
+    namespace = {}
+    exec(fill_credentials(code, dict(SOURCE, password=password), TARGET), namespace)
+    assert namespace["password"] == namespace["again"] == password
+
+
+def test_fill_credentials_replaces_a_password_containing_the_username_whole():
+    creds = dict(SOURCE, user="etl", password="etl-etl")
+    code = f"user, password = '{placeholder('SOURCE', 'user')}', '{placeholder('SOURCE', 'password')}'"
+    namespace = {}
+    exec(fill_credentials(code, creds, TARGET), namespace)
+    assert (namespace["user"], namespace["password"]) == ("etl", "etl-etl")
+
+
+def test_credential_placeholders_hide_every_secret():
+    rendered = credential_placeholders("SOURCE", "PostgreSQL", dict(SOURCE, user=None, username="legacy"))
+    assert rendered["user"] == placeholder("SOURCE", "username")
+    assert rendered["password"] == placeholder("SOURCE", "password")
+    assert rendered["table"] == "orders"
+    assert "s3cret" not in repr(rendered) and "legacy" not in repr(rendered)
+
+
+def test_cache_key_ignores_credentials_but_not_the_tables():
+    other = dict(SOURCE, host="db2", user="admin", password="other")
+    assert key_for(SOURCE, TARGET) == key_for(other, dict(TARGET, file_path="/tmp/copy.db"))
+    assert key_for(SOURCE, TARGET) != key_for(dict(SOURCE, table="customers"), TARGET)
+    assert key_for(SOURCE, TARGET) != key_for(SOURCE, TARGET, "drop nulls")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # every put/get is one tick later, so last_used orders them exactly
+    ticks = itertools.count(1)
+    monkeypatch.setattr(codecache.time, "time", lambda: next(ticks))
+
+
+def test_cache_evicts_the_least_recently_used_entry(tmp_path, clock):
+    cache = CodeCache(str(tmp_path / "code.sqlite"), max_entries=2)
+    cache.put("a", "print('a')")
+    cache.put("b", "print('b')")
+    assert cache.get("a") == "print('a')"
+    cache.put("c", "print('c')")
+    assert cache.get("b") is None
+    assert cache.get("a") == "print('a')"
+    assert cache.get("c") == "print('c')"
+
+
+def test_cache_evicts_down_to_max_bytes(tmp_path, clock):
+    cache = CodeCache(str(tmp_path / "code.sqlite"), max_bytes=25)
+    for key in "abc":
+        cache.put(key, key * 10)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] == 20
+    assert cache.get("a") is None
+
+
+def test_cache_counts_hits_and_misses(tmp_path):
+    cache = CodeCache(str(tmp_path / "code.sqlite"))
+    cache.put("a", "print('a')")
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 1, "bytes": len("print('a')")}
+
+
+def test_stream_etl_code_bypasses_the_cache(tmp_path, monkeypatch):
+    generator = pytest.importorskip("modules.generator")
+    cache = CodeCache(str(tmp_path / "code.sqlite"))
+    monkeypatch.setattr(generator, "code_cache", cache)
+    monkeypatch.setattr(generator, "stream_llm", lambda prompt: iter(["print('fresh')"]))
+    args = ("PostgreSQL", SOURCE, "SQLite", TARGET, "keep all rows", [], [(1,)], [{"name": "id", "type": 23}],
+            [{"name": "id", "type": "INTEGER"}])
+    key = cache_key(generator.LLM_MODEL, *args, generator.PROMPT_TOKEN_BUDGET)
+    cache.put(key, "print('cached')")
+
+    assert list(generator.stream_etl_code(*args))[-1] == "print('cached')"
+    assert list(generator.stream_etl_code(*args, use_cache=False))[-1] == "print('fresh')"
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,31 @@
+# tests/test_connections.py
+import sqlite3
+
+import pytest
+
+from modules.connections import borrow_connection, close_all_pools, get_pool
+
+
+@pytest.fixture
+def creds(tmp_path):
+    yield {"file_path": str(tmp_path / "pool.db"), "table": "items"}
+    close_all_pools()
+
+
+def test_borrowed_connection_goes_back_to_the_pool(creds):
+    with borrow_connection("SQLite", creds) as connection:
+        pass
+    with borrow_connection("SQLite", creds) as again:
+        assert again is connection
+
+
+def test_connection_that_saw_an_exception_is_discarded(creds):
+    with pytest.raises(RuntimeError):
+        with borrow_connection("SQLite", creds) as connection:
+            raise RuntimeError("query failed")
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.execute("SELECT 1")
+    assert get_pool("SQLite", creds)._in_use == 0
+    with borrow_connection("SQLite", creds) as fresh:
+        assert fresh is not connection
+        assert fresh.execute("SELECT 1").fetchone() == (1,)
@@ -0,0 +1,84 @@
+# tests/test_connectors.py
+import pytest
+
+from modules.connectors import get_connector
+
+
+@pytest.mark.parametrize("db_type, key, bounds, expected", [
+    ("PostgreSQL", "id", {"lower": 10, "upper": 20, "ordered": True},
+     ("SELECT * FROM items WHERE id >= %s AND id < %s ORDER BY id", [10, 20])),
+    ("MSSQL", "id", {"after": 5}, ("SELECT * FROM items WHERE id > ?", [5])),
+    ("SQLite", None, {"lower": 10}, ("SELECT * FROM items", [])),
+])
+def test_select_bounds_the_scan_with_the_driver_placeholder(db_type, key, bounds, expected):
+    assert get_connector(db_type).select("items", key, **bounds) == expected
+
+
+def test_mongo_connector_streams_documents():
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    client["shop"]["orders"].insert_many([{"_id": i, "n": i} for i in range(5)])
+    creds = {"database": "shop", "collection": "orders"}
+    bounds = {"key": "_id", "lower": 1, "upper": None, "after": None, "ordered": True}
+    batches = list(get_connector("MongoDB").stream(client, creds, 3, bounds))
+    assert [(columns, [doc["_id"] for doc in docs]) for columns, docs in batches] == [(None, [1, 2, 3]), (None, [4])]
+
+
+class SessionCursor:
+    """Answers SELECT/SET on the session variables a server knows, like PyMySQL does."""
+
+    def __init__(self, variables):
+        self.variables = variables
+        self.row = None
+
+    def execute(self, statement):
+        name = statement.split("@@SESSION.")[-1] if statement.startswith("SELECT") else statement.split()[2]
+        if name not in self.variables:
+            from pymysql.err import OperationalError
+
+            raise OperationalError(1193, f"Unknown system variable '{name}'")
+        if statement.startswith("SET"):
+            self.variables[name] = statement.split(" = ")[1]
+        else:
+            self.row = (self.variables[name],)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def mysql():
+    pytest.importorskip("pymysql")
+    return get_connector("MySQL")
+
+
+class SessionConnection:
+    def __init__(self, **variables):
+        self.variables = variables
+
+    def cursor(self):
+        return SessionCursor(self.variables)
+
+
+def test_mysql_timeout_is_set_and_restored(mysql):
+    connection = SessionConnection(MAX_EXECUTION_TIME=250)
+    restore = mysql.set_query_timeout(connection, 5)
+    assert connection.variables["MAX_EXECUTION_TIME"] == "5000"
+    restore()
+    assert connection.variables["MAX_EXECUTION_TIME"] == "250"
+
+
+def test_mariadb_timeout_falls_back_to_max_statement_time(mysql):
+    connection = SessionConnection(max_statement_time="0.000000")
+    restore = mysql.set_query_timeout(connection, 5)
+    assert connection.variables["max_statement_time"] == "5.0"
+    restore()
+    assert connection.variables["max_statement_time"] == "0.0"
+
+
+def test_mysql_timeout_is_skipped_when_the_server_has_neither_variable(mysql):
+    restore = mysql.set_query_timeout(SessionConnection(), 5)
+    restore()
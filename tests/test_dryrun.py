@@ -0,0 +1,106 @@
+# tests/test_dryrun.py
+import sqlite3
+import uuid
+
+import pytest
+
+from modules.codecache import placeholder
+from modules.dryrun import dry_run
+
+SQLITE_TO_SQLITE = f"""
+import sqlite3
+
+source = sqlite3.connect("{placeholder('SOURCE', 'file_path')}")
+target = sqlite3.connect("{placeholder('TARGET', 'file_path')}")
+rows = source.execute("SELECT id, name FROM people").fetchall()
+target.execute("DELETE FROM people WHERE id = 100")
+target.executemany("INSERT INTO people (id, name) VALUES (?, ?)", rows)
+target.commit()
+print("ATOA_PROGRESS", len(rows))
+"""
+
+
+@pytest.fixture
+def databases(tmp_path):
+    source = {"file_path": str(tmp_path / "source.db"), "table": "people"}
+    target = {"file_path": str(tmp_path / "target.db"), "table": "people"}
+    with sqlite3.connect(source["file_path"]) as connection:
+        connection.execute("CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany("INSERT INTO people VALUES (?, ?)", [(1, "ada"), (2, "bob"), (3, "cy")])
+    with sqlite3.connect(target["file_path"]) as connection:
+        connection.execute("CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.execute("INSERT INTO people VALUES (100, 'old')")
+    return source, target
+
+
+def target_rows(creds):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return connection.execute("SELECT id, name FROM people ORDER BY id").fetchall()
+
+
+def test_dry_run_reports_the_rows_the_script_changed(databases):
+    source, target = databases
+    report = dry_run(SQLITE_TO_SQLITE, "SQLite", source, "SQLite", target)
+    assert report["ok"], report["error"]
+    assert report["sample_rows"] == 3
+    assert (report["target_rows_before"], report["target_rows_after"]) == (1, 3)
+    assert (report["added_count"], report["removed_count"]) == (3, 1)
+    assert sorted(report["added"]) == [[1, "ada"], [2, "bob"], [3, "cy"]]
+    assert report["removed"] == [[100, "old"]]
+    # only the replica was written
+    assert target_rows(target) == [(100, "old")]
+
+
+def test_dry_run_with_a_script_that_changes_nothing_is_not_ok(databases):
+    source, target = databases
+    report = dry_run("print('nothing to do')", "SQLite", source, "SQLite", target)
+    assert report["status"] == 0
+    assert not report["ok"]
+    assert report["warnings"] == ["The script finished but didn't change the target."]
+
+
+@pytest.mark.parametrize("code, error", [
+    ("import socket\nsocket.create_connection(('example.com', 80), timeout=5)", "network connections are blocked"),
+    ("import urllib.request\nurllib.request.urlopen('http://example.com', timeout=5)", "network connections are blocked"),
+])
+def test_dry_run_blocks_the_network(databases, code, error):
+    source, target = databases
+    report = dry_run(code, "SQLite", source, "SQLite", target)
+    assert not report["ok"]
+    assert report["status"] != 0
+    assert error in report["stderr"]
+
+
+def test_dry_run_refuses_the_real_database_file(databases):
+    source, target = databases
+    code = f"import sqlite3\nsqlite3.connect({target['file_path']!r}).execute('DELETE FROM people')"
+    report = dry_run(code, "SQLite", source, "SQLite", target)
+    assert not report["ok"]
+    assert "is not a replica" in report["error"]
+    assert target_rows(target) == [(100, "old")]
+
+
+def test_dry_run_mongo_source_into_sqlite(monkeypatch, databases):
+    mongomock = pytest.importorskip("mongomock")
+    pymongo = pytest.importorskip("pymongo")
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: client)
+    # a fresh URI per test, so the connection pool doesn't hand back another test's client
+    source = {"uri": f"mongodb://atoa-test-{uuid.uuid4().hex}", "database": "crm", "collection": "contacts"}
+    client["crm"]["contacts"].insert_many([{"id": 7, "name": "eve"}, {"id": 8, "name": "fay"}])
+    _, target = databases
+    code = f"""
+import sqlite3
+import pymongo
+
+documents = pymongo.MongoClient("{placeholder('SOURCE', 'uri')}")["{placeholder('SOURCE', 'database')}"]["contacts"].find()
+target = sqlite3.connect("{placeholder('TARGET', 'file_path')}")
+target.executemany("INSERT INTO people (id, name) VALUES (?, ?)", [(doc["id"], doc["name"]) for doc in documents])
+target.commit()
+"""
+    report = dry_run(code, "MongoDB", source, "SQLite", target)
+    assert report["ok"], report["error"]
+    assert report["sample_rows"] == 2
+    assert (report["added_count"], report["removed_count"]) == (2, 0)
+    assert sorted(report["added"]) == [[7, "eve"], [8, "fay"]]
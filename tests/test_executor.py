@@ -0,0 +1,43 @@
+# tests/test_executor.py
+import os
+
+import pytest
+
+from modules.executor import WorkerPool
+
+SCRIPT = "import os\nprint(os.getpid(), __file__)"
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(size=1, max_jobs=2)
+    yield pool
+    pool.close()
+
+
+def run(pool, code=SCRIPT, **kwargs):
+    out, err, status = pool.execute(code, **kwargs)
+    assert status == 0, err
+    pid, path = out.split()
+    return int(pid), path
+
+
+def test_worker_is_recycled_after_max_jobs(pool):
+    pids = [run(pool)[0] for _ in range(3)]
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
+
+
+def test_temp_script_is_removed_after_each_run(pool):
+    _, path = run(pool)
+    assert os.path.basename(path).startswith("atoa_etl_")
+    assert not os.path.exists(path)
+
+
+def test_timed_out_script_is_removed_and_its_worker_replaced(pool):
+    code = "import os, time\nprint(os.getpid(), __file__, flush=True)\ntime.sleep(30)"
+    out, err, status = pool.execute(code, timeout=2)
+    assert (status, err) == (-1, "❌ Script timed out after 2s")
+    pid, path = out.split()
+    assert not os.path.exists(path)
+    assert run(pool)[0] != int(pid)
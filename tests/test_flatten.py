@@ -0,0 +1,97 @@
+# tests/test_flatten.py
+import json
+import sqlite3
+
+from modules.flatten import (EXTRA_COLUMN, FLATTEN_MAX_DEPTH, compile_plan, create_tables, create_tables_sql,
+                             flatten_batch, load_flattened, table_columns, tables)
+from modules.mongo_schema import infer_schema
+
+ORDERS = [
+    {"_id": 1, "name": "first", "address": {"city": "Oslo", "geo": {"lat": 59.9}},
+     "tags": ["new", "gift"], "items": [{"sku": "A", "qty": 2, "serials": ["x1", "x2"]}, {"sku": "B", "qty": 1}]},
+    {"_id": 2, "name": "second", "address": {"city": "Rome"}, "tags": [], "items": [{"sku": "C", "qty": 5}]},
+]
+
+
+def plan_for(documents, table="orders"):
+    return compile_plan(infer_schema(documents), table)
+
+
+def flattened(documents, batch=None):
+    return flatten_batch(plan_for(documents), batch if batch is not None else documents)
+
+
+def test_subdocuments_become_columns_named_after_their_path():
+    columns, rows = flattened(ORDERS)["orders"]
+    assert columns == ["_id", "name", "address_city", "address_geo_lat", EXTRA_COLUMN]
+    assert rows == [(1, "first", "Oslo", 59.9, None), (2, "second", "Rome", None, None)]
+
+
+def test_subdocuments_past_the_max_depth_stay_json():
+    nested = {"leaf": 1}
+    for level in reversed(range(FLATTEN_MAX_DEPTH)):
+        nested = {f"l{level}": nested}
+    columns, rows = flattened([{"_id": 1, **nested}])["orders"]
+    deepest = "_".join(f"l{level}" for level in range(FLATTEN_MAX_DEPTH))
+    assert columns == ["_id", deepest, EXTRA_COLUMN]
+    assert json.loads(rows[0][1]) == {"leaf": 1}
+
+
+def test_arrays_of_scalars_get_a_value_child_table():
+    columns, rows = flattened(ORDERS)["orders_tags"]
+    assert columns == ["orders_id", "tags_idx", "value"]
+    assert rows == [(1, 0, "new"), (1, 1, "gift")]
+
+
+def test_arrays_of_documents_get_a_child_table_keyed_by_position():
+    out = flattened(ORDERS)
+    assert out["orders_items"] == (["orders_id", "items_idx", "sku", "qty"],
+                                   [(1, 0, "A", 2), (1, 1, "B", 1), (2, 0, "C", 5)])
+    # an array inside an element inherits the element's whole key
+    assert out["orders_items_serials"] == (["orders_id", "items_idx", "serials_idx", "value"],
+                                           [(1, 0, 0, "x1"), (1, 0, 1, "x2")])
+
+
+def test_stray_scalars_in_an_array_of_documents_get_an_empty_row():
+    plan = plan_for(ORDERS)
+    out = flatten_batch(plan, [{"_id": 3, "items": ["oops"]}])
+    assert out["orders_items"][1] == [(3, 0, None, None)]
+
+
+def test_unknown_fields_are_kept_in_extra():
+    plan = plan_for(ORDERS)
+    _, rows = flatten_batch(plan, [{"_id": 3, "name": "third", "coupon": {"code": "X"}}])["orders"]
+    assert rows[0][:2] == (3, "third")
+    assert json.loads(rows[0][-1]) == {"coupon": {"code": "X"}}
+
+
+def test_colliding_column_names_get_a_suffix():
+    plan = plan_for([{"_id": 1, "a": {"b": 1}, "a_b": 2, "A_B": 3}])
+    assert table_columns(plan) == ["_id", "a_b", "a_b_2", "A_B_3", EXTRA_COLUMN]
+    assert flatten_batch(plan, [{"_id": 1, "a": {"b": 1}, "a_b": 2, "A_B": 3}])["orders"][1] == [(1, 1, 2, 3, None)]
+
+
+def test_child_keys_never_collide_with_element_fields():
+    plan = plan_for([{"_id": 1, "lines": [{"orders_id": 7, "lines_idx": 8}]}])
+    child = plan["children"][0]
+    assert table_columns(child) == ["orders_id", "lines_idx", "orders_id_2", "lines_idx_2"]
+
+
+def test_create_tables_sql_links_children_to_their_parents():
+    statements = create_tables_sql(plan_for(ORDERS), "SQLite")
+    assert [statement.split()[2] for statement in statements] == [table["name"] for table in tables(plan_for(ORDERS))]
+    assert "PRIMARY KEY (_id)" in statements[0]
+    serials = statements[-1]
+    assert "PRIMARY KEY (orders_id, items_idx, serials_idx)" in serials
+    assert "FOREIGN KEY (orders_id, items_idx) REFERENCES orders_items (orders_id, items_idx)" in serials
+
+
+def test_load_flattened_into_sqlite(tmp_path):
+    creds = {"file_path": str(tmp_path / "target.db"), "table": "orders"}
+    plan = plan_for(ORDERS)
+    create_tables("SQLite", creds, plan)
+    counts = load_flattened("SQLite", creds, plan, [(None, ORDERS)])
+    assert counts == {"orders": 2, "orders_tags": 2, "orders_items": 3, "orders_items_serials": 2}
+    with sqlite3.connect(creds["file_path"]) as connection:
+        assert connection.execute("SELECT sku FROM orders_items ORDER BY orders_id, items_idx").fetchall() == [
+            ("A",), ("B",), ("C",)]
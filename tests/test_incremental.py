@@ -0,0 +1,113 @@
+# tests/test_incremental.py
+import sqlite3
+import uuid
+
+import pytest
+
+from modules.incremental import run_incremental
+from modules.state import StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / "state.sqlite"))
+
+
+@pytest.fixture
+def sqlite_pair(tmp_path):
+    source, target = str(tmp_path / "source.db"), str(tmp_path / "target.db")
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany("INSERT INTO events VALUES (?, ?)", [(i, f"event {i}") for i in range(1, 6)])
+    with sqlite3.connect(target) as connection:
+        connection.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, name TEXT)")
+    return {"file_path": source, "table": "events"}, {"file_path": target, "table": "events"}
+
+
+def target_rows(creds):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return connection.execute(f"SELECT id, name FROM {creds['table']} ORDER BY id").fetchall()
+
+
+def test_initial_load_copies_everything_and_sets_watermark(sqlite_pair, store):
+    source, target = sqlite_pair
+    rows, watermark = run_incremental("SQLite", source, "SQLite", target, "id", batch_size=2, store=store)
+    assert rows == 5
+    assert watermark == 5
+    assert target_rows(target) == [(i, f"event {i}") for i in range(1, 6)]
+
+
+def test_rerun_without_new_rows_loads_nothing(sqlite_pair, store):
+    source, target = sqlite_pair
+    run_incremental("SQLite", source, "SQLite", target, "id", store=store)
+    rows, watermark = run_incremental("SQLite", source, "SQLite", target, "id", store=store)
+    assert rows == 0
+    assert watermark == 5
+    assert len(target_rows(target)) == 5
+
+
+def test_delta_loads_new_rows_and_advances_watermark(sqlite_pair, store):
+    source, target = sqlite_pair
+    run_incremental("SQLite", source, "SQLite", target, "id", store=store)
+    with sqlite3.connect(source["file_path"]) as connection:
+        connection.executemany("INSERT INTO events VALUES (?, ?)", [(6, "event 6"), (7, "event 7")])
+    rows, watermark = run_incremental("SQLite", source, "SQLite", target, "id", store=store)
+    assert rows == 2
+    assert watermark == 7
+    assert target_rows(target)[-2:] == [(6, "event 6"), (7, "event 7")]
+
+
+def test_transform_sees_rows_but_watermark_comes_from_source(sqlite_pair, store):
+    source, target = sqlite_pair
+
+    def shout(columns, rows):
+        return columns, [(row[0], row[1].upper()) for row in rows]
+
+    rows, watermark = run_incremental("SQLite", source, "SQLite", target, "id", transform=shout, store=store)
+    assert (rows, watermark) == (5, 5)
+    assert target_rows(target)[0] == (1, "EVENT 1")
+
+
+def test_mongo_object_id_watermark(monkeypatch, store):
+    mongomock = pytest.importorskip("mongomock")
+    pymongo = pytest.importorskip("pymongo")
+    from bson import ObjectId
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: client)
+    # a fresh URI per test, so the connection pool doesn't hand back another test's client
+    uri = f"mongodb://atoa-test-{uuid.uuid4().hex}"
+    source = {"uri": uri, "database": "shop", "collection": "orders"}
+    target = {"uri": uri, "database": "warehouse", "collection": "orders"}
+    first = [{"_id": ObjectId(), "total": i} for i in range(3)]
+    client["shop"]["orders"].insert_many(first)
+
+    rows, watermark = run_incremental("MongoDB", source, "MongoDB", target, "_id", store=store)
+    assert rows == 3
+    assert watermark == first[-1]["_id"]
+
+    later = [{"_id": ObjectId(), "total": i} for i in range(3, 5)]
+    client["shop"]["orders"].insert_many(later)
+    rows, watermark = run_incremental("MongoDB", source, "MongoDB", target, "_id", store=store)
+    assert rows == 2
+    assert watermark == later[-1]["_id"]
+    assert client["warehouse"]["orders"].count_documents({}) == 5
+
+    assert run_incremental("MongoDB", source, "MongoDB", target, "_id", store=store) == (0, later[-1]["_id"])
+
+
+def test_updated_rows_are_upserted_instead_of_appended(tmp_path, store):
+    source, target = str(tmp_path / "source.db"), str(tmp_path / "target.db")
+    for path in (source, target):
+        with sqlite3.connect(path) as connection:
+            connection.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, name TEXT, updated_at INTEGER)")
+    with sqlite3.connect(source) as connection:
+        connection.executemany("INSERT INTO events VALUES (?, ?, ?)", [(1, "one", 10), (2, "two", 20)])
+    source, target = {"file_path": source, "table": "events"}, {"file_path": target, "table": "events"}
+    run_incremental("SQLite", source, "SQLite", target, "updated_at", store=store, upsert_key="id")
+
+    with sqlite3.connect(source["file_path"]) as connection:
+        connection.execute("UPDATE events SET name = 'uno', updated_at = 30 WHERE id = 1")
+    rows, watermark = run_incremental("SQLite", source, "SQLite", target, "updated_at", store=store, upsert_key="id")
+    assert (rows, watermark) == (1, 30)
+    assert target_rows(target) == [(1, "uno"), (2, "two")]
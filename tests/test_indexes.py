@@ -0,0 +1,66 @@
+# tests/test_indexes.py
+import sqlite3
+
+import pytest
+
+from modules.indexes import deferred_indexes, drop_secondary_indexes, rebuild_indexes, restore_dropped_indexes
+from modules.state import StateStore, table_id
+
+
+class Crashed(Exception):
+    pass
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / "state.sqlite"))
+
+
+@pytest.fixture
+def target(tmp_path):
+    path = str(tmp_path / "target.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, price REAL)")
+        connection.execute("CREATE INDEX items_name ON items (name)")
+        connection.execute("CREATE INDEX items_price ON items (price)")
+    return {"file_path": path, "table": "items"}
+
+
+def index_names(creds):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall()
+    return sorted(name for (name,) in rows)
+
+
+def test_dropped_indexes_are_saved_until_rebuilt(target, store):
+    saved = drop_secondary_indexes("SQLite", target, store)
+    assert index_names(target) == []
+    assert store.get_dropped_indexes(table_id("SQLite", target)) == saved
+    rebuild_indexes("SQLite", target, saved, store)
+    assert index_names(target) == ["items_name", "items_price"]
+    assert store.get_dropped_indexes(table_id("SQLite", target)) is None
+
+
+def test_next_run_restores_what_a_crashed_run_dropped(target, store):
+    # the process dies mid-load: no rebuild, only the saved statements survive
+    drop_secondary_indexes("SQLite", target, store)
+    assert restore_dropped_indexes("SQLite", target, store) == 2
+    assert index_names(target) == ["items_name", "items_price"]
+    assert store.get_dropped_indexes(table_id("SQLite", target)) is None
+
+
+def test_restore_skips_indexes_a_crashed_rebuild_already_made(target, store):
+    saved = drop_secondary_indexes("SQLite", target, store)
+    with sqlite3.connect(target["file_path"]) as connection:
+        connection.execute(saved[0])
+    with deferred_indexes("SQLite", target, store):
+        assert index_names(target) == []
+    assert index_names(target) == ["items_name", "items_price"]
+
+
+def test_failed_load_still_rebuilds(target, store):
+    with pytest.raises(Crashed):
+        with deferred_indexes("SQLite", target, store):
+            raise Crashed()
+    assert index_names(target) == ["items_name", "items_price"]
+    assert store.get_dropped_indexes(table_id("SQLite", target)) is None
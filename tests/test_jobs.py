@@ -0,0 +1,71 @@
+# tests/test_jobs.py
+import threading
+import time
+
+import pytest
+
+from modules.jobs import JobManager
+
+DB_A = ("SQLite", {"file_path": "a.db"})
+DB_B = ("SQLite", {"file_path": "b.db"})
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=4, per_db_limit=1)
+    yield manager
+    manager.shutdown()
+
+
+def wait(jobs, timeout=10):
+    deadline = time.monotonic() + timeout
+    while any(job.finished_at is None for job in jobs):
+        assert time.monotonic() < deadline, "jobs didn't finish"
+        time.sleep(0.01)
+
+
+def test_jobs_on_one_database_run_up_to_the_limit(manager):
+    running, peak, lock = {"a": 0, "b": 0}, {"a": 0, "b": 0}, threading.Lock()
+
+    def work(name):
+        def run(job):
+            with lock:
+                running[name] += 1
+                peak[name] = max(peak[name], running[name])
+            time.sleep(0.1)
+            with lock:
+                running[name] -= 1
+        return run
+
+    jobs = [manager.submit("a", work("a"), [DB_A]) for _ in range(3)]
+    jobs.append(manager.submit("b", work("b"), [DB_B]))
+    wait(jobs)
+    assert [job.status for job in jobs] == ["succeeded"] * 4
+    assert peak == {"a": 1, "b": 1}
+    # the job on the other database didn't queue behind the three on the first
+    assert jobs[3].started_at < jobs[2].started_at
+
+
+def test_job_is_cancelled_once_it_runs_past_its_timeout(manager):
+    def run(job):
+        while True:
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    job = manager.submit("slow", run, [DB_A], timeout=0.2)
+    wait([job])
+    assert job.status == "timed out"
+    assert job.finished_at - job.started_at < 5
+
+
+def test_queued_job_can_be_cancelled_before_it_starts(manager):
+    release = threading.Event()
+    first = manager.submit("first", lambda job: release.wait(10), [DB_A])
+    queued = manager.submit("queued", lambda job: None, [DB_A])
+    time.sleep(0.1)
+    assert queued.status == "queued"
+    queued.cancel()
+    release.set()
+    wait([first, queued])
+    assert (first.status, queued.status) == ("succeeded", "cancelled")
+    assert queued.started_at is None
@@ -0,0 +1,101 @@
+# tests/test_migrate.py
+import sqlite3
+
+import pytest
+
+from modules import migrate
+from modules.migrate import MigrationStopped, dependency_levels, plan_migration, run_migration
+
+
+def test_dependency_levels_put_parents_first():
+    levels, cyclic = dependency_levels(["orders", "customers", "items", "products"],
+                                       [("orders", "customers"), ("items", "orders"), ("items", "products")])
+    assert levels == [["customers", "products"], ["orders"], ["items"]]
+    assert cyclic == set()
+
+
+def test_dependency_levels_ignore_self_references_and_unknown_tables():
+    levels, cyclic = dependency_levels(["employees", "teams"],
+                                       [("employees", "employees"), ("employees", "teams"), ("teams", "offices")])
+    assert levels == [["teams"], ["employees"]]
+    assert cyclic == set()
+
+
+def test_dependency_levels_break_cycles():
+    levels, cyclic = dependency_levels(["a", "b", "c", "d"], [("a", "b"), ("b", "a"), ("c", "a"), ("d", "c")])
+    assert levels == [["a", "b"], ["c"], ["d"]]
+    assert cyclic == {"a", "b"}
+
+
+def test_dependency_levels_load_what_a_cycle_references_first():
+    levels, cyclic = dependency_levels(["a", "b", "c", "root"],
+                                       [("a", "b"), ("b", "c"), ("c", "a"), ("b", "root")])
+    assert levels == [["root"], ["a", "b", "c"]]
+    assert cyclic == {"a", "b", "c"}
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    # run reports land under the working directory
+    monkeypatch.chdir(tmp_path)
+    source, target = str(tmp_path / "source.db"), str(tmp_path / "target.db")
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE authors (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, author_id INTEGER REFERENCES authors(id), "
+                           "sequel_of INTEGER REFERENCES books(id))")
+        connection.execute("CREATE TABLE reviews (id INTEGER PRIMARY KEY, book_id INTEGER REFERENCES books(id))")
+        connection.execute("CREATE TABLE tags (id INTEGER PRIMARY KEY, label TEXT)")
+        connection.executemany("INSERT INTO authors VALUES (?, ?)", [(1, "Ann"), (2, "Bo")])
+        connection.executemany("INSERT INTO books VALUES (?, ?, ?)", [(1, 1, None), (2, 1, 1), (3, 2, None)])
+        connection.executemany("INSERT INTO reviews VALUES (?, ?)", [(1, 1), (2, 3)])
+        connection.executemany("INSERT INTO tags VALUES (?, ?)", [(1, "new"), (2, "old")])
+    sqlite3.connect(target).close()
+    return {"file_path": source}, {"file_path": target}
+
+
+def count(creds, table):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_run_migration_copies_every_table(databases):
+    source, target = databases
+    migration = plan_migration("SQLite", source, "SQLite")
+    assert migration.levels == [["authors", "tags"], ["books"], ["reviews"]]
+    run_migration(migration, source, target)
+    assert migration.snapshot()["counts"] == {"done": 4}
+    assert [count(target, table) for table in ("authors", "books", "reviews", "tags")] == [2, 3, 2, 2]
+
+
+def test_failed_parent_skips_its_children(databases, monkeypatch):
+    source, target = databases
+    transfer_table = migrate.transfer_table
+
+    def failing_transfer(source_type, source_creds, *args, **kwargs):
+        if source_creds["table"] == "authors":
+            raise RuntimeError("boom")
+        return transfer_table(source_type, source_creds, *args, **kwargs)
+
+    monkeypatch.setattr(migrate, "transfer_table", failing_transfer)
+    migration = plan_migration("SQLite", source, "SQLite")
+    report = run_migration(migration, source, target)
+    tables = migration.tables
+    assert tables["authors"]["status"] == "failed"
+    assert tables["authors"]["error"] == "boom"
+    assert tables["tags"]["status"] == "done"
+    assert tables["books"]["status"] == tables["reviews"]["status"] == "skipped"
+    assert "authors" in tables["books"]["error"]
+    assert report["error"] == "1 table(s) failed: authors"
+
+
+def test_progress_can_stop_the_migration(databases):
+    source, target = databases
+    migration = plan_migration("SQLite", source, "SQLite")
+
+    def progress(rows):
+        raise MigrationStopped("stopped by the user")
+
+    with pytest.raises(MigrationStopped):
+        run_migration(migration, source, target, progress=progress)
+    assert migration.tables["reviews"]["status"] == "skipped"
+    assert migration.tables["reviews"]["error"] == "migration stopped"
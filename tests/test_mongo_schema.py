@@ -0,0 +1,68 @@
+# tests/test_mongo_schema.py
+import pytest
+
+from modules.mongo_schema import infer_schema, merged_type, sample_documents
+
+mongomock = pytest.importorskip("mongomock")
+
+DOCUMENTS = [
+    {"_id": 1, "name": "ada", "score": 3, "address": {"city": "Paris", "zip": "75001"},
+     "tags": ["a", "b"], "orders": [{"sku": "x1", "qty": 2}]},
+    {"_id": 2, "name": "bob", "score": 4.5, "address": {"city": "Lyon"}, "tags": []},
+    {"_id": 3, "name": None, "score": "n/a", "orders": [{"sku": "y22", "qty": 1.5}, {"sku": "z", "qty": 1}]},
+    {"_id": 4, "name": "eve", "score": 7},
+]
+
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient()["crm"]["contacts"]
+    collection.insert_many([dict(doc) for doc in DOCUMENTS])
+    return collection
+
+
+def fields(schema):
+    return {field["name"]: field for field in schema}
+
+
+@pytest.mark.parametrize("types, expected", [
+    ({"int": 3, "NoneType": 1}, "int"),
+    ({"int": 3, "float": 1}, "float"),
+    ({"int": 3, "Int64": 1}, "Int64"),
+    ({"float": 1, "Decimal128": 1}, "Decimal128"),
+    ({"int": 1, "str": 1}, "mixed"),
+    ({"NoneType": 2}, "NoneType"),
+])
+def test_merged_type_widens_numbers_and_marks_other_unions_mixed(types, expected):
+    assert merged_type(types) == expected
+
+
+def test_infer_schema_types_and_frequencies(collection):
+    schema = infer_schema(list(collection.find()))
+    assert schema[0]["name"] == "_id"
+    by_name = fields(schema)
+    assert by_name["score"]["type"] == "mixed"
+    assert by_name["score"]["types"] == {"int": 2, "float": 1, "str": 1}
+    assert (by_name["name"]["type"], by_name["name"]["nullable"], by_name["name"]["max_length"]) == ("str", True, 3)
+    assert (by_name["address"]["frequency"], by_name["address"]["nullable"]) == (0.5, True)
+    assert by_name["_id"]["frequency"] == 1.0 and not by_name["_id"]["nullable"]
+
+
+def test_infer_schema_nested_paths(collection):
+    by_name = fields(infer_schema(list(collection.find())))
+    address = fields(by_name["address"]["fields"])
+    assert address["city"]["path"] == "address.city"
+    # frequencies inside a subdocument are relative to the documents that have it
+    assert (address["city"]["frequency"], address["zip"]["frequency"]) == (1.0, 0.5)
+    assert by_name["tags"]["items"] == {"type": "str", "types": {"str": 2}}
+    orders = by_name["orders"]["items"]
+    assert orders["type"] == "dict"
+    qty = fields(orders["fields"])["qty"]
+    assert (qty["path"], qty["type"], qty["frequency"]) == ("orders.qty", "float", 1.0)
+    assert fields(orders["fields"])["sku"]["max_length"] == 3
+
+
+def test_sample_documents_is_bounded(collection):
+    sample = sample_documents(collection, size=2)
+    assert len(sample) == 2
+    assert {doc["_id"] for doc in sample} <= {doc["_id"] for doc in DOCUMENTS}
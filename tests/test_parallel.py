@@ -0,0 +1,66 @@
+# tests/test_parallel.py
+import sqlite3
+import time
+
+import pytest
+
+from modules.jobs import JobCancelled
+from modules.parallel import plan_partitions, run_parallel_transfer
+
+ROWS = 2000
+
+
+def slow_copy(columns, rows):
+    # module level, so the worker processes can unpickle it
+    time.sleep(0.05)
+    return columns, rows
+
+
+@pytest.fixture
+def sqlite_pair(tmp_path):
+    source, target = str(tmp_path / "source.db"), str(tmp_path / "target.db")
+    with sqlite3.connect(source) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        connection.executemany("INSERT INTO items VALUES (?, ?)", [(i, f"item {i}") for i in range(1, ROWS + 1)])
+    with sqlite3.connect(target) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    return {"file_path": source, "table": "items"}, {"file_path": target, "table": "items"}
+
+
+def count(creds):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {creds['table']}").fetchone()[0]
+
+
+def test_cancel_stops_the_workers(sqlite_pair):
+    source, target = sqlite_pair
+
+    def cancel(index, done):
+        raise JobCancelled("cancelled")
+
+    started = time.monotonic()
+    with pytest.raises(JobCancelled):
+        # 200 batches of 0.05s each: a worker left running would take 10s to finish
+        run_parallel_transfer("SQLite", source, "SQLite", target, key="id", transform=slow_copy,
+                              batch_size=10, progress=cancel)
+    assert time.monotonic() - started < 8
+    # the load is one transaction per partition, so a stopped worker leaves nothing behind
+    time.sleep(1)
+    assert count(target) < ROWS
+
+
+def test_parallel_transfer_copies_every_row(sqlite_pair):
+    source, target = sqlite_pair
+    assert sum(run_parallel_transfer("SQLite", source, "SQLite", target, key="id", batch_size=500)) == ROWS
+    assert count(target) == ROWS
+
+
+def test_plan_partitions_splits_the_integer_key_range(sqlite_pair):
+    source, _ = sqlite_pair
+    assert plan_partitions("SQLite", source, 4, "id") == [(None, 501), (501, 1001), (1001, 1501), (1501, None)]
+
+
+def test_plan_partitions_rejects_a_non_integer_key(sqlite_pair):
+    source, _ = sqlite_pair
+    with pytest.raises(ValueError, match="Partition key 'name' must be an integer column; its values are str"):
+        plan_partitions("SQLite", source, 4, "name")
@@ -0,0 +1,85 @@
+# tests/test_planner.py
+import json
+
+import pytest
+
+from modules import planner
+from modules.planner import PLAN_MAX_BATCH, PLAN_MIN_BATCH, observed_throughput, plan_transfer
+
+SCHEMA = [{"name": "id", "type": "integer", "primary_key": True}, {"name": "name", "type": "text"}]
+PG = {"host": "db", "database": "shop", "table": "orders"}
+
+
+@pytest.fixture(autouse=True)
+def no_history(monkeypatch):
+    monkeypatch.setattr(planner, "observed_throughput", lambda source_type, target_type: (None, 0))
+    monkeypatch.setattr(planner.os, "cpu_count", lambda: 4)
+
+
+def plan(rows, row_bytes=100, target_type="MySQL", **kwargs):
+    stats = {"rows": rows, "bytes": None if rows is None else rows * row_bytes, "row_bytes": row_bytes,
+             "sampled_rows": 200}
+    return plan_transfer("PostgreSQL", PG, target_type, PG, schema=SCHEMA, stats=stats, **kwargs)
+
+
+def test_small_table_streams_in_one_batch():
+    result = plan(5_000)
+    assert (result["strategy"], result["parallelism"], result["partition_key"]) == ("stream", 1, None)
+    assert result["batch_size"] == 5_000
+    assert not result["defer_indexes"]
+
+
+def test_big_table_runs_in_parallel_on_the_integer_primary_key():
+    result = plan(2_000_000)
+    assert (result["strategy"], result["parallelism"], result["partition_key"]) == ("parallel", 4, "id")
+    assert result["defer_indexes"]
+    assert PLAN_MIN_BATCH <= result["batch_size"] <= PLAN_MAX_BATCH
+    assert result["batch_size"] % 1000 == 0
+
+
+def test_parallelism_is_capped_by_the_rows_per_partition():
+    assert plan(600_000)["parallelism"] == 3
+
+
+def test_without_an_integer_key_the_plan_streams():
+    stats = {"rows": 2_000_000, "bytes": None, "row_bytes": 100, "sampled_rows": 200}
+    result = plan_transfer("PostgreSQL", PG, "MySQL", PG, schema=[{"name": "name", "type": "text"}], stats=stats)
+    assert (result["strategy"], result["parallelism"]) == ("stream", 1)
+
+
+@pytest.mark.parametrize("kwargs, strategy", [
+    ({"target_type": "SQLite"}, "stream"),
+    ({"checkpoint_key": "id"}, "checkpointed"),
+])
+def test_single_worker_strategies(kwargs, strategy):
+    result = plan(2_000_000, **kwargs)
+    assert (result["strategy"], result["parallelism"]) == (strategy, 1)
+
+
+def test_wide_rows_get_smaller_batches_within_the_memory_budget():
+    narrow, wide = plan(50_000, row_bytes=100), plan(50_000, row_bytes=20_000)
+    assert wide["batch_size"] < narrow["batch_size"]
+    assert wide["predicted_memory_mb"] <= planner.PLAN_MEMORY_MB
+
+
+def test_rows_are_estimated_from_the_size_when_the_catalog_has_no_count():
+    stats = {"rows": None, "bytes": 1_000_000, "row_bytes": 100, "sampled_rows": 200}
+    result = plan_transfer("PostgreSQL", PG, "MySQL", PG, schema=SCHEMA, stats=stats)
+    assert (result["source_rows"], result["rows_from_catalog"]) == (10_000, False)
+
+
+def test_observed_throughput_is_the_median_per_worker_rate(tmp_path):
+    reports = [
+        {"rows": 100_000, "rows_per_sec": 1_000, "context": {"source_type": "PostgreSQL", "target_type": "MySQL"}},
+        {"rows": 100_000, "rows_per_sec": 3_000, "context": {"source_type": "PostgreSQL", "target_type": "MySQL"}},
+        # twice as fast on three workers: 1 + 2 * 0.75 = 2.5x one worker
+        {"rows": 100_000, "rows_per_sec": 5_000,
+         "context": {"source_type": "PostgreSQL", "target_type": "MySQL", "parallelism": 3}},
+        {"rows": 100_000, "rows_per_sec": 9_999, "error": "boom",
+         "context": {"source_type": "PostgreSQL", "target_type": "MySQL"}},
+        {"rows": 10, "rows_per_sec": 9_999, "context": {"source_type": "PostgreSQL", "target_type": "MySQL"}},
+        {"rows": 100_000, "rows_per_sec": 9_999, "context": {"source_type": "MySQL", "target_type": "MySQL"}},
+    ]
+    for index, report in enumerate(reports):
+        (tmp_path / f"{index}.json").write_text(json.dumps(report))
+    assert observed_throughput("PostgreSQL", "MySQL", str(tmp_path)) == (2_000, 3)
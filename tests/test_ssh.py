@@ -0,0 +1,179 @@
+# tests/test_ssh.py
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+paramiko = pytest.importorskip("paramiko")
+
+from modules import ssh  # noqa: E402
+
+USER, PASSWORD = "atoa", "secret"
+
+
+class LocalServer(paramiko.ServerInterface):
+    """Accepts one password and runs exec requests with the local shell."""
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if (username, password) == (USER, PASSWORD) else paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == "session" else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=run_command, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+def run_command(channel, command):
+    process = subprocess.Popen(["sh", "-c", command], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def pump(stream, send):
+        for chunk in iter(lambda: stream.read1(4096), b""):
+            send(chunk)
+
+    pumps = [threading.Thread(target=pump, args=(process.stdout, channel.sendall)),
+             threading.Thread(target=pump, args=(process.stderr, channel.sendall_stderr))]
+    for thread in pumps:
+        thread.start()
+    for thread in pumps:
+        thread.join()
+    status = process.wait()
+    # a shell reports death by signal N as 128 + N
+    channel.send_exit_status(status if status >= 0 else 128 - status)
+    channel.close()
+
+
+class LocalSFTP(paramiko.SFTPServerInterface):
+    """Just enough SFTP for uploads: write, stat and remove local files."""
+
+    def open(self, path, flags, attr):
+        handle = paramiko.SFTPHandle(flags)
+        handle.filename = path
+        handle.writefile = open(path, "wb")
+        return handle
+
+    def stat(self, path):
+        return paramiko.SFTPAttributes.from_stat(os.stat(path))
+
+    lstat = stat
+
+    def remove(self, path):
+        os.remove(path)
+        return paramiko.SFTP_OK
+
+
+@pytest.fixture(scope="module")
+def server():
+    key = paramiko.ECDSAKey.generate()
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    transports = []
+
+    def accept():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(connection)
+            transport.add_server_key(key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, LocalSFTP)
+            transport.start_server(server=LocalServer())
+            transports.append(transport)
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield {"host": "127.0.0.1", "user": USER, "password": PASSWORD, "port": listener.getsockname()[1]}
+    ssh.ssh_pool.close()
+    listener.close()
+    for transport in transports:
+        transport.close()
+
+
+def session(server):
+    return ssh.ssh_pool.get(server["host"], server["user"], server["password"], server["port"])
+
+
+def test_pool_reuses_the_transport(server):
+    assert session(server) is session(server)
+
+
+def test_stream_decodes_characters_split_across_reads(server, monkeypatch):
+    # one byte per read splits every multi-byte character
+    monkeypatch.setattr(ssh, "READ_CHUNK", 1)
+    chunks = []
+    out, err, status = session(server).stream(
+        "sh -c \"printf 'h\\303\\251llo \\342\\202\\254'; printf '\\303\\274' >&2\"",
+        on_output=lambda stream, text: chunks.append((stream, text)))
+    assert (out, err, status) == ("héllo €", "ü", 0)
+    assert "".join(text for stream, text in chunks if stream == "stdout") == "héllo €"
+
+
+def test_timeout_kills_the_remote_process(server):
+    started = time.monotonic()
+    out, err, status = session(server).stream("sleep 30", timeout=0.5)
+    assert status == -1
+    assert "timed out" in err
+    assert time.monotonic() - started < 10
+
+
+def test_running_count_is_exact_under_concurrency(server):
+    shared = session(server)
+    threads = [threading.Thread(target=shared.stream, args=("true",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.running == 0
+    assert shared.idle_for(time.monotonic()) >= 0
+
+
+def test_run_remote_script_uploads_runs_and_cleans_up(server, monkeypatch):
+    monkeypatch.setattr(ssh, "REMOTE_PYTHON", sys.executable)
+    code = "import os, sys\nprint(os.environ['ATOA_GREETING'])\nprint(sys.argv[0])\n"
+    out, err, status = ssh.run_remote_script(code, server["host"], server["user"], server["password"],
+                                             server["port"], env={"ATOA_GREETING": "hello"})
+    assert status == 0, err
+    greeting, path = out.split()
+    assert greeting == "hello"
+    assert not os.path.exists(path)
+
+
+def test_run_partitioned_remote_gives_each_run_its_bounds(server, monkeypatch):
+    monkeypatch.setattr(ssh, "REMOTE_PYTHON", sys.executable)
+    code = ("import os\n"
+            "print(os.environ['ATOA_PARTITION_INDEX'], os.environ['ATOA_PARTITION_LOWER'] or '-',"
+            " os.environ['ATOA_PARTITION_UPPER'] or '-')\n")
+    partitions = [(None, 10), (10, 20), (20, None)]
+    results = ssh.run_partitioned_remote(code, partitions, [server, server])
+    assert [out.strip() for _, out, _, _ in results] == ["0 - 10", "1 10 20", "2 20 -"]
+    assert all(status == 0 for _, _, _, status in results)
+
+
+def test_run_partitioned_remote_limits_channels_per_host(server, monkeypatch):
+    monkeypatch.setattr(ssh, "REMOTE_PYTHON", sys.executable)
+    monkeypatch.setattr(ssh, "SSH_MAX_CHANNELS", 2)
+    # a fresh pool, so the session is opened with the lower limit
+    pool = ssh.SSHSessionPool()
+    monkeypatch.setattr(ssh, "ssh_pool", pool)
+    code = "import time\nstart = time.time()\ntime.sleep(0.3)\nprint(start, time.time())\n"
+    try:
+        results = ssh.run_partitioned_remote(code, [(None, None)] * 6, [server])
+    finally:
+        pool.close()
+    assert all(status == 0 for _, _, _, status in results)
+    spans = [tuple(map(float, out.split())) for _, out, _, _ in results]
+    events = sorted([(start, 1) for start, _ in spans] + [(end, -1) for _, end in spans])
+    running = peak = 0
+    for _, change in events:
+        running += change
+        peak = max(peak, running)
+    assert peak <= 2
@@ -0,0 +1,89 @@
+# tests/test_transform.py
+import re
+
+import pyarrow as pa
+import pytest
+
+from modules.transform import apply_plan, make_transform, to_frame, validate_plan
+
+
+@pytest.mark.parametrize("plan, message", [
+    ({"op": "rename"}, "must be a list"),
+    ([{"op": "explode"}], "unknown op 'explode'"),
+    (["rename"], "unknown op None"),
+    ([{"op": "date_format", "column": "created_at"}], "missing format"),
+    ([{"op": "cast", "columns": {"salary": "money"}}], "unknown types ['money']"),
+    ([{"op": "cast", "columns": ["salary"]}], "columns must map"),
+    ([{"op": "lookup", "column": "country", "mapping": ["IN"]}], "mapping must be an object"),
+])
+def test_validate_plan_rejects(plan, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        validate_plan(plan)
+
+
+def test_validate_plan_accepts_every_op():
+    plan = [
+        {"op": "rename", "columns": {"name": "username"}},
+        {"op": "cast", "columns": {"salary": "float"}},
+        {"op": "date_format", "column": "created_at", "format": "%Y-%m-%d"},
+        {"op": "filter", "expr": "salary > 1000"},
+        {"op": "drop_nulls"},
+        {"op": "derive", "column": "total", "expr": "price * qty"},
+        {"op": "lookup", "column": "country", "mapping": {"IN": "India"}},
+    ]
+    assert validate_plan(plan) is plan
+
+
+def test_empty_plan_is_no_transform():
+    assert make_transform([]) is None
+
+
+def test_to_frame_keeps_nullable_integers_integral():
+    df = to_frame(["id", "score", "ratio"], [(1, 10, 0.5), (2, None, None)])
+    assert str(df["id"].dtype) == "int64"
+    assert str(df["score"].dtype) == "Int64"
+    assert str(df["ratio"].dtype) == "float64"
+
+
+def test_to_frame_documents_with_missing_integer_field():
+    df = to_frame(None, [{"id": 1, "qty": 3}, {"id": 2}])
+    assert str(df["qty"].dtype) == "Int64"
+
+
+def test_apply_plan_round_trips_nullable_ints_as_python_ints():
+    columns, rows = apply_plan([{"op": "rename", "columns": {"score": "points"}}],
+                               ["id", "score"], [(1, 10), (2, None)])
+    assert columns == ["id", "points"]
+    assert rows == [(1, 10), (2, None)]
+    assert type(rows[0][1]) is int
+
+
+def test_apply_plan_steps():
+    plan = [
+        {"op": "cast", "columns": {"price": "float"}},
+        {"op": "derive", "column": "total", "expr": "price * qty"},
+        {"op": "filter", "expr": "total > 5"},
+        {"op": "lookup", "column": "country", "mapping": {"IN": "India"}, "target": "country_name", "default": "?"},
+        {"op": "date_format", "column": "day", "format": "%d/%m/%Y"},
+    ]
+    rows = [("2", 2, "IN", "2024-01-31"), ("10", 1, "FR", "2024-02-01"), ("1", 1, "IN", "2024-02-02")]
+    columns, out = apply_plan(plan, ["price", "qty", "country", "day"], rows)
+    assert columns == ["price", "qty", "country", "day", "total", "country_name"]
+    assert out == [(10.0, 1, "FR", "01/02/2024", 10.0, "?")]
+
+
+def test_cast_int_turns_bad_values_into_nulls():
+    _, rows = apply_plan([{"op": "cast", "columns": {"n": "int"}}], ["n"], [("7",), ("x",), (None,)])
+    assert rows == [(7,), (None,), (None,)]
+
+
+def test_cast_int_turns_fractions_into_nulls():
+    _, rows = apply_plan([{"op": "cast", "columns": {"n": "int"}}], ["n"], [("1.5",), ("2.0",), (3.25,), (4,)])
+    assert rows == [(None,), (2,), (None,), (4,)]
+
+
+def test_apply_plan_on_record_batch_returns_record_batch():
+    batch = pa.RecordBatch.from_pydict({"a": [1, 2, 3]})
+    result = apply_plan([{"op": "filter", "expr": "a >= 2"}], batch)
+    assert isinstance(result, pa.RecordBatch)
+    assert result.to_pydict() == {"a": [2, 3]}
@@ -0,0 +1,172 @@
+# tests/test_upsert.py
+import sqlite3
+import uuid
+
+import pytest
+
+from modules.metrics import RunMetrics
+from modules.upsert import (ROW_HASH_COLUMN, _create_staging, prune_equal_rows_sql, prune_unchanged_sql,
+                            upsert_batches, upsert_sql)
+
+COLUMNS = ["id", "name", "qty"]
+
+
+def test_upsert_sql_postgres():
+    assert upsert_sql("PostgreSQL", "items", "stage", COLUMNS, ["id"]) == (
+        "INSERT INTO items (id, name, qty) SELECT id, name, qty FROM stage "
+        "ON CONFLICT (id) DO UPDATE SET name = excluded.name, qty = excluded.qty")
+
+
+def test_upsert_sql_sqlite_disambiguates_the_conflict_clause():
+    assert upsert_sql("SQLite", "items", "stage", COLUMNS, ["id"]) == (
+        "INSERT INTO items (id, name, qty) SELECT id, name, qty FROM stage WHERE true "
+        "ON CONFLICT (id) DO UPDATE SET name = excluded.name, qty = excluded.qty")
+
+
+def test_upsert_sql_key_only_columns_do_nothing():
+    assert upsert_sql("PostgreSQL", "items", "stage", ["id"], ["id"]).endswith("ON CONFLICT (id) DO NOTHING")
+
+
+def test_upsert_sql_mysql():
+    assert upsert_sql("MySQL", "items", "stage", COLUMNS, ["id"]) == (
+        "INSERT INTO items (id, name, qty) SELECT * FROM (SELECT id, name, qty FROM stage) AS atoa_new "
+        "ON DUPLICATE KEY UPDATE name = atoa_new.name, qty = atoa_new.qty")
+
+
+def test_upsert_sql_mysql_key_only_columns_assign_the_key():
+    assert upsert_sql("MySQL", "items", "stage", ["id"], ["id"]).endswith("ON DUPLICATE KEY UPDATE id = atoa_new.id")
+
+
+def test_upsert_sql_mssql_composite_key():
+    assert upsert_sql("MSSQL", "items", "#stage", COLUMNS, ["id", "name"]) == (
+        "MERGE items AS t USING #stage AS s ON t.id = s.id AND t.name = s.name "
+        "WHEN MATCHED THEN UPDATE SET t.qty = s.qty "
+        "WHEN NOT MATCHED THEN INSERT (id, name, qty) VALUES (s.id, s.name, s.qty);")
+
+
+def test_upsert_sql_mssql_identity_key_turns_identity_insert_on():
+    assert upsert_sql("MSSQL", "items", "#stage", COLUMNS, ["id"], identity="ID") == (
+        "SET IDENTITY_INSERT items ON; "
+        "MERGE items AS t USING #stage AS s ON t.id = s.id "
+        "WHEN MATCHED THEN UPDATE SET t.name = s.name, t.qty = s.qty "
+        "WHEN NOT MATCHED THEN INSERT (id, name, qty) VALUES (s.id, s.name, s.qty); "
+        "SET IDENTITY_INSERT items OFF;")
+
+
+def test_upsert_sql_mssql_never_updates_an_identity_column_outside_the_key():
+    sql = upsert_sql("MSSQL", "items", "#stage", COLUMNS, ["name"], identity="id")
+    assert "UPDATE SET t.qty = s.qty " in sql
+    assert sql.startswith("SET IDENTITY_INSERT items ON; ")
+
+
+def test_upsert_sql_mssql_without_the_identity_column_leaves_identity_insert_alone():
+    assert "IDENTITY_INSERT" not in upsert_sql("MSSQL", "items", "#stage", ["name", "qty"], ["name"], identity="id")
+
+
+class RecordingCursor:
+    """Records statements; SELECT ... WHERE 1 = 0 describes the target's columns."""
+
+    def __init__(self, columns):
+        self.statements = []
+        self.description = [(column,) for column in columns]
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement)
+
+    def fetchall(self):
+        return []
+
+
+def test_mssql_staging_drops_the_identity_property():
+    cursor = RecordingCursor(COLUMNS)
+    _create_staging("MSSQL", cursor, "items", "#stage", ("id", "bigint"))
+    assert cursor.statements[-1] == "SELECT TOP 0 CAST(id AS bigint) AS id, name, qty INTO #stage FROM items"
+
+
+def test_upsert_sql_rejects_unknown_dialects():
+    with pytest.raises(ValueError, match="Unsupported database type"):
+        upsert_sql("Oracle", "items", "stage", COLUMNS, ["id"])
+
+
+def test_prune_unchanged_sql_matches_key_and_hash():
+    assert prune_unchanged_sql("items", "stage", ["id", "name"], "row_hash") == (
+        "DELETE FROM stage WHERE EXISTS (SELECT 1 FROM items WHERE items.id = stage.id "
+        "AND items.name = stage.name AND items.row_hash = stage.row_hash)")
+
+
+def test_prune_equal_rows_sql_compares_every_column_null_safely():
+    assert prune_equal_rows_sql("PostgreSQL", "items", "stage", ["id"], COLUMNS) == (
+        "DELETE FROM stage WHERE EXISTS (SELECT 1 FROM items WHERE items.id = stage.id "
+        "AND items.name IS NOT DISTINCT FROM stage.name AND items.qty IS NOT DISTINCT FROM stage.qty)")
+    assert "(items.qty = stage.qty OR (items.qty IS NULL AND stage.qty IS NULL))" in (
+        prune_equal_rows_sql("MSSQL", "items", "stage", ["id"], COLUMNS))
+
+
+@pytest.fixture
+def target(tmp_path):
+    creds = {"file_path": str(tmp_path / "target.db"), "table": "items"}
+    with sqlite3.connect(creds["file_path"]) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT, qty INTEGER)")
+        connection.execute("INSERT INTO items VALUES (1, 'old', 1)")
+    return creds
+
+
+def rows(creds, columns="id, name, qty"):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return connection.execute(f"SELECT {columns} FROM items ORDER BY id").fetchall()
+
+
+def columns_of(creds):
+    with sqlite3.connect(creds["file_path"]) as connection:
+        return [row[1] for row in connection.execute("PRAGMA table_info(items)")]
+
+
+def test_upsert_batches_inserts_and_updates_and_adds_the_hash_column(target):
+    batch = (COLUMNS, [(1, "new", 2), (2, "two", 3)])
+    assert upsert_batches("SQLite", target, [batch], "id", add_hash_column=True) == 2
+    assert rows(target) == [(1, "new", 2), (2, "two", 3)]
+    assert all(digest for _, digest in rows(target, f"id, {ROW_HASH_COLUMN}"))
+
+
+def test_upsert_batches_skips_unchanged_rows_by_hash(target):
+    upsert_batches("SQLite", target, [(COLUMNS, [(1, "new", 2), (2, "two", 3)])], "id", add_hash_column=True)
+    metrics = RunMetrics()
+    upsert_batches("SQLite", target, [(COLUMNS, [(1, "new", 2), (2, "two", 4)])], "id", metrics=metrics)
+    assert metrics.stages["unchanged"]["rows"] == 1
+    assert rows(target) == [(1, "new", 2), (2, "two", 4)]
+
+
+def test_upsert_batches_compares_values_without_touching_the_schema(target):
+    upsert_batches("SQLite", target, [(COLUMNS, [(1, "new", None), (2, "two", 3)])], "id")
+    metrics = RunMetrics()
+    upsert_batches("SQLite", target, [(COLUMNS, [(1, "new", None), (2, "two", 4)])], "id", metrics=metrics)
+    assert metrics.stages["unchanged"]["rows"] == 1
+    assert rows(target) == [(1, "new", None), (2, "two", 4)]
+    assert columns_of(target) == COLUMNS
+
+
+def test_upsert_batches_plain_upsert_without_hash(target):
+    upsert_batches("SQLite", target, [(COLUMNS, [(1, "new", 2)])], ["id"], hash_column=None)
+    assert rows(target) == [(1, "new", 2)]
+    assert columns_of(target) == COLUMNS
+
+
+def test_upsert_batches_needs_the_key_in_the_batch(target):
+    with pytest.raises(ValueError, match="Upsert key"):
+        upsert_batches("SQLite", target, [(["name"], [("x",)])], "id")
+
+
+def test_mongo_upsert_compares_documents_without_adding_the_hash(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    pymongo = pytest.importorskip("pymongo")
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda *args, **kwargs: client)
+    creds = {"uri": f"mongodb://atoa-test-{uuid.uuid4().hex}", "database": "shop", "collection": "items"}
+    client["shop"]["items"].insert_many([{"id": 1, "name": "one"}, {"id": 2, "name": "two"}])
+
+    metrics = RunMetrics()
+    upsert_batches("MongoDB", creds, [(["id", "name"], [(1, "one"), (2, "TWO")])], "id", metrics=metrics)
+    assert metrics.stages["unchanged"]["rows"] == 1
+    docs = sorted(client["shop"]["items"].find({}, {"_id": 0}), key=lambda doc: doc["id"])
+    assert docs == [{"id": 1, "name": "one"}, {"id": 2, "name": "TWO"}]